@@ -7,6 +7,7 @@ from openai import OpenAI  # Import OpenAI API client for interacting with the O
 from langchain.prompts.chat import ChatPromptTemplate  # Import ChatPromptTemplate for creating structured chat prompts
 from langchain_openai import ChatOpenAI  # Import ChatOpenAI to initialize a connection to the OpenAI API using Langchain
 import tools.embeddings as user  # Import user-defined tool functions for downloading files
+import tools.rateLimiter as rate_limiter  # Process-wide rate limits for OpenAI calls
 
 # Load .env file
 load_dotenv()
@@ -36,6 +37,9 @@ assistant_prompt = ChatPromptTemplate.from_messages(
             "Before calling tools, ask for an access token"
             "You are capable of using the following tools to accomplish tasks when required:"
             "\n- agent_get_embeddings(): Converts user input into embeddings and retuns a file href url if a matching file is found."
+            " If the user mentions a hub, project, folder or file type, pass it as hub_name, project_name, folder_path or extension so only that part of the index is searched."
+            " Results are the latest version of each file, if the user asks for an older version pass its number as version."
+            " Always pass the access token, so only files the user is allowed to open are returned."
             "\n- agent_get_url(): Generate a signed URL for downloading a specific file."
             "\n\nProcess Overview for File Download:\n"
             "1. **Get File Name**: Obtain the file name or identifying details from the user. The file name may be similar or exactly the same as the target file."
@@ -72,7 +76,11 @@ class Assistant:
 
     # Execute the tool chain and return the response in the required format.
     async def __call__(self, state: dict, config: RunnableConfig):
-        result = await self.runnable.ainvoke(state)  # Invoke the runnable asynchronously
+        # Chat completions share the process-wide OpenAI chat quota with the tools
+        bucket = rate_limiter.get_bucket("openai:chat")
+        await bucket.acquire()
+        async with bucket.semaphore:
+            result = await self.runnable.ainvoke(state)  # Invoke the runnable asynchronously
         return {"messages": result}  # Return the result as a dictionary with messages
 
 # Combine prompt and tools with LLM
@@ -7,6 +7,7 @@ from openai import OpenAI  # Import OpenAI API client for interacting with the O
 from langchain.prompts.chat import ChatPromptTemplate  # Import ChatPromptTemplate for creating structured chat prompts
 from langchain_openai import ChatOpenAI  # Import ChatOpenAI to initialize a connection to the OpenAI API using Langchain
 import tools.downloadFiles as user  # Import user-defined tool functions for downloading files
+import tools.rateLimiter as rate_limiter  # Process-wide rate limits for OpenAI calls
 
 # Load .env file
 load_dotenv()
@@ -36,15 +37,19 @@ assistant_prompt = ChatPromptTemplate.from_messages(
             "\n- agent_get_hubdata(): Retrieve the projects under a specific hub."
             "\n- agent_get_rootfolder(): Retrieve the root folder of a specific project."
             "\n- agent_get_foldercontents(): Retrieve the contents of a folder in a project."
+            "\n- agent_find_path(): Jump directly to a folder or file when the user gives a full or partial path, e.g. Project/Folder/Subfolder."
             "\n- agent_get_url(): Generate a signed URL for downloading a specific file."
+            "\n- agent_download_folder(): Download everything inside a folder and its subfolders, optionally as one zip archive."
             "\n\nProcess Overview for File Download:\n"
             "1. **Get File Name**: Obtain the file name or identifying details from the user. The file name may be similar or exactly the same as the target file."
+            "   If the user gives a path or a folder name, try `agent_find_path()` first and skip steps 2 to 5 when it finds the folder."
             "2. **Locate Hub**: Use `agent_get_hubs()` to retrieve a list of hubs, and confirm with the user which hub contains the file if multiple hubs are found."
             "3. **Identify Project**: Use `agent_get_hubdata()` to retrieve the contents of the specified hub. Confirm with the user which project might contain the target file."
             "4. **Access the Root Folder**: Use `agent_get_rootfolder()` to get the root folder for the selected project."
             "5. **Search Through Folders**: Navigate through folder contents using `agent_get_foldercontents()` to find the target file."
             "   - If multiple files match the user's query, confirm with the user before proceeding."
             "6. **Download File**: Once the file is identified and confirmed with the user, use `agent_get_url()` to generate the download link."
+            "   If the user wants every file under a folder, use `agent_download_folder()` with the listing that contains that folder instead."
             "\n\nGuidelines During Interaction:\n"
             "- **Clarify Before Tool Execution**: Always confirm with the user before running tools unless explicitly instructed."
             "- **Show Tool Outputs**: After running a tool, display its output or any relevant results for user confirmation."
@@ -67,7 +72,9 @@ tools = [
     user.agent_get_hubdata,
     user.agent_get_rootfolder,
     user.agent_get_foldercontents,
-    user.agent_get_url
+    user.agent_find_path,
+    user.agent_get_url,
+    user.agent_download_folder
 ]
 
 # Define the Assistant class, which encapsulates the logic for running the tools and generating responses
@@ -79,7 +86,11 @@ class Assistant:
 
     # Execute the tool chain and return the response in the required format.
     async def __call__(self, state: dict, config: RunnableConfig):
-        result = await self.runnable.ainvoke(state)  # Invoke the runnable asynchronously
+        # Chat completions share the process-wide OpenAI chat quota with the tools
+        bucket = rate_limiter.get_bucket("openai:chat")
+        await bucket.acquire()
+        async with bucket.semaphore:
+            result = await self.runnable.ainvoke(state)  # Invoke the runnable asynchronously
         return {"messages": result}  # Return the result as a dictionary with messages
 
 # Combine prompt and tools with LLM
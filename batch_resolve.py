@@ -0,0 +1,146 @@
+# Import statements
+import argparse  # For reading the batch settings from the command line
+import asyncio  # To resolve many files concurrently
+import csv  # For reading queries from a CSV file, e.g. an exported transmittal
+import json  # For reading JSONL queries and writing JSONL results
+import time  # For measuring throughput
+import tools.authentication as auth  # Authentication module to get access tokens
+import tools.embeddings  # Query embedding and index search, used without the chat assistant
+import tools.httpSession  # Shared HTTP connection pool, closed on exit
+import tools.searchIndex  # Embedding index searched for every query
+import tools.searchExecutor  # Worker processes scanning the embedding index in parallel
+import tools.signedUrlCache  # Signed download URLs, reused for files that appear in several queries
+
+# Queries embedded per OpenAI call
+EMBEDDING_BATCH = 100
+
+# Optional filter columns of the input, named like the arguments of agent_get_embeddings()
+FILTERS = ("hub_name", "project_name", "folder_path", "extension", "version")
+
+
+# Function to read the queries, one per CSV row (a "query" column, else the first column) or one JSON object per line
+# Rows that cannot be used (unreadable JSON, no query, a version that is not a number) are skipped with a message
+def read_queries(path):
+    rows = []
+    with open(path, "r", newline="", encoding="utf-8-sig") as file:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rows.append((number, json.loads(line)))
+                except ValueError as e:
+                    print(f"Skipping line {number}: not valid JSON ({e})")
+        else:
+            reader = csv.DictReader(file)
+            # Line 1 is the header
+            rows = [(number, dict(row, query=row.get("query") or row[reader.fieldnames[0]])) for number, row in enumerate(reader, 2)]
+
+    queries = []
+    for number, row in rows:
+        if not isinstance(row, dict) or not isinstance(row.get("query"), str) or not row["query"].strip():
+            print(f"Skipping line {number}: no query")
+            continue
+        filters = {name: row[name] for name in FILTERS if row.get(name)}
+        if any(not isinstance(value, str) for name, value in filters.items() if name != "version"):
+            print(f"Skipping line {number}: the {', '.join(FILTERS[:-1])} filters must be text")
+            continue
+        if "version" in filters:
+            version = str(filters["version"]).strip()
+            if not version.isdigit() or int(version) < 1:
+                print(f"Skipping line {number}: version {filters['version']!r} is not a version number")
+                continue
+            filters["version"] = int(version)
+        queries.append({"query": row["query"].strip(), "filters": filters})
+    return queries
+
+
+# Function to resolve one query: search the index, then get a signed URL for every match
+# A query that fails is reported with its error instead of stopping the whole batch
+async def resolve(access_token, query, embedding, args, semaphore):
+    try:
+        matches = await tools.embeddings.find_files(query["query"], top_k=args.top_k, threshold=args.threshold,
+                                                    embedding=embedding, access_token=access_token, **query["filters"])
+        async with semaphore:
+            urls = await asyncio.gather(*[tools.signedUrlCache.get_signed_url(access_token, match["href"]) for match in matches],
+                                        return_exceptions=True)
+    except Exception as e:
+        return {"query": query["query"], "filters": query["filters"], "error": f"{type(e).__name__}: {e}"}
+
+    results = []
+    for match, url in zip(matches, urls):
+        result = {field: match[field] for field in ("file_name", "project_name", "folder_path", "version", "similarity")}
+        if isinstance(url, Exception) or url[1] is None:
+            result["error"] = str(url) if isinstance(url, Exception) else f"Failed to generate signed download URL: {url[0]}"
+        else:
+            result["url"] = url[1]
+        results.append(result)
+    return {"query": query["query"], "filters": query["filters"], "matches": results}
+
+
+# Function to resolve every query and stream the results to a JSONL file as they complete
+async def main(access_token, args):
+    tools.searchIndex.get_snapshot()
+    tools.searchExecutor.start()
+    # The workers and the connection pool are released even when the batch stops on an error or Ctrl+C
+    try:
+        queries = read_queries(args.input)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        start = time.perf_counter()
+        resolved, unmatched, failed = 0, 0, 0
+        with open(args.output, "w", encoding="utf-8") as output:
+            for offset in range(0, len(queries), EMBEDDING_BATCH):
+                batch = queries[offset:offset + EMBEDDING_BATCH]
+                try:
+                    embeddings = await tools.embeddings.embed_queries([query["query"] for query in batch])
+                except Exception as e:
+                    # Without embeddings no query of the batch can be searched, the next batch is tried anyway
+                    error = f"Failed to embed the queries: {type(e).__name__}: {e}"
+                    for query in batch:
+                        output.write(json.dumps({"query": query["query"], "filters": query["filters"], "error": error}) + "\n")
+                    output.flush()
+                    failed += len(batch)
+                    print(error)
+                    continue
+
+                tasks = [resolve(access_token, query, embedding, args, semaphore) for query, embedding in zip(batch, embeddings)]
+                for task in asyncio.as_completed(tasks):
+                    result = await task
+                    output.write(json.dumps(result) + "\n")
+                    output.flush()
+                    if "error" in result:
+                        failed += 1
+                    elif not result["matches"]:
+                        unmatched += 1
+                    elif all("url" in match for match in result["matches"]):
+                        resolved += 1
+                    else:
+                        failed += 1
+
+                elapsed = time.perf_counter() - start
+                done = offset + len(batch)
+                print(f"{done}/{len(queries)} queries, {done / elapsed:.1f} files/s")
+
+    finally:
+        tools.searchExecutor.shutdown()
+        await tools.httpSession.close_session()
+    elapsed = time.perf_counter() - start
+    print(f"Resolved {resolved}, unmatched {unmatched}, failed {failed} of {len(queries)} queries "
+          f"in {elapsed:.1f}s ({len(queries) / elapsed if elapsed else 0:.1f} files/s), results in {args.output}")
+
+
+# Main execution point, resolves a list of files to signed URLs without the chat assistant
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve a CSV or JSONL list of file names to signed download URLs")
+    parser.add_argument("input", help="CSV with a 'query' column (or the query in the first column) or JSONL with a 'query' field; "
+                                      "optional hub_name, project_name, folder_path, extension and version columns restrict the search")
+    parser.add_argument("--output", default="batch_results.jsonl")
+    parser.add_argument("--top-k", type=int, default=1, help="Matches returned per query")
+    parser.add_argument("--threshold", type=float, default=0.3, help="Minimum similarity of a match")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries whose signed URLs are requested at the same time")
+    arguments = parser.parse_args()
+
+    # Authentication to get the token
+    access_token = auth.get_authorization_code()
+    asyncio.run(main(access_token, arguments))
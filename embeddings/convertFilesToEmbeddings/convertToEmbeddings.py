@@ -2,7 +2,9 @@ from dotenv import load_dotenv
 import json
 from openai import OpenAI
 import os
-import aiohttp
+import re
+import sys
+from extractFolderData import record_key, collapse_versions
 
 # Load environment variables from .env file
 load_dotenv()
@@ -11,12 +13,8 @@ load_dotenv()
 openai_api_key = os.getenv('OPENAI_API_KEY')
 client = OpenAI(api_key=openai_api_key)
 
-# Load JSON file containing file names and hrefs
-with open('file_info_with_hrefs.json', 'r') as file:
-    data = json.load(file)
-
-# Extract file names to embed
-file_names = [item['file_name'] for item in data]  # We'll convert the file names to embeddings
+# Directory the sharded index is written to, read by tools/searchIndex.py
+index_dir = os.getenv('EMBEDDINGS_DIR', '..')
 
 # Function to get embeddings from OpenAI API
 def get_embeddings(file_names):
@@ -32,19 +30,107 @@ def get_embeddings(file_names):
         embeddings.append(embedding)
     return embeddings
 
-# Get embeddings for the file names
-embeddings = get_embeddings(file_names)
+# Function to attach embeddings to catalog records
+def embed_records(data):
+    # Get embeddings for the file names
+    embeddings = get_embeddings([item['file_name'] for item in data])
+
+    # Prepare the data with embeddings and file names
+    embeddings_data = []
+    for i, item in enumerate(data):
+        # Keep every catalog field (hub, project, folder path, version, extension) next to the embedding
+        record = dict(item)
+        record['file_name_embedding'] = embeddings[i]  # Save the embedding for the file name
+        embeddings_data.append(record)
+    return embeddings_data
+
+# Function to build the shard file name of a project
+def shard_name(project_id):
+    return 'shards/' + re.sub(r'[^A-Za-z0-9_.-]', '_', project_id or 'unscoped') + '.json'
+
+# Function to write the shards of the given projects (all projects when None) and the manifest describing every shard
+def write_index(embeddings_data, project_ids=None):
+    # Save the embeddings data with file names and hrefs to a new JSON file
+    with open('embeddings.json', 'w') as outfile:
+        json.dump(embeddings_data, outfile, indent=4)
+
+    # Split the index into one shard per project so that scoped searches only open the shards they need
+    shards = {}
+    for record in embeddings_data:
+        shards.setdefault(record.get('project_id'), []).append(record)
+
+    shard_dir = os.path.join(index_dir, 'shards')
+    os.makedirs(shard_dir, exist_ok=True)
+
+    # Only shards of changed projects are rewritten, a project that lost all its files loses its shard
+    for project_id in (shards.keys() if project_ids is None else project_ids):
+        path = os.path.join(index_dir, shard_name(project_id))
+        if project_id in shards:
+            # Replace the shard atomically so a running agent never reads a partially written file
+            with open(path + '.tmp', 'w') as outfile:
+                json.dump(shards[project_id], outfile)
+            os.replace(path + '.tmp', path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    manifest = []
+    for project_id, records in shards.items():
+        # The manifest carries enough metadata to prune shards without opening them
+        manifest.append({
+            'shard': shard_name(project_id),
+            'hub_id': records[0].get('hub_id'),
+            'hub_name': records[0].get('hub_name'),
+            'project_id': records[0].get('project_id'),
+            'project_name': records[0].get('project_name'),
+            'file_count': len(records),
+            'extensions': sorted({record.get('extension') or os.path.splitext(record['file_name'])[1].lstrip('.').lower() for record in records})
+        })
+
+    # The manifest is replaced last, a running agent picks up the new index once it changes
+    manifest_path = os.path.join(index_dir, 'manifest.json')
+    with open(manifest_path + '.tmp', 'w') as outfile:
+        json.dump({'shards': manifest}, outfile, indent=4)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+# Function to apply the add, update and delete records of a delta sync, only added or renamed files are embedded again
+def apply_changes(changes):
+    with open('embeddings.json', 'r') as file:
+        embeddings_data = {record_key(record): record for record in json.load(file)}
+
+    touched_projects = set()
+    to_embed = []
+    for change in changes:
+        record = change['record']
+        key = record_key(record)
+        previous = embeddings_data.pop(key, None)
+        if previous:
+            touched_projects.add(previous.get('project_id'))
+        if change['op'] == 'delete':
+            continue
+        touched_projects.add(record.get('project_id'))
+
+        # An update with an unchanged file name (new version, moved folder) reuses the stored embedding
+        if previous and previous['file_name'] == record['file_name']:
+            embeddings_data[key] = dict(record, file_name_embedding=previous['file_name_embedding'])
+        else:
+            to_embed.append(record)
+
+    for record in embed_records(to_embed):
+        embeddings_data[record_key(record)] = record
+
+    write_index(list(embeddings_data.values()), touched_projects)
+    print(f"Applied {len(changes)} changes, embedded {len(to_embed)} files, rewrote {len(touched_projects)} shards.")
 
-# Prepare the data with embeddings and file names
-embeddings_data = []
-for i, item in enumerate(data):
-    embeddings_data.append({
-        'file_name': item['file_name'],  # Save the file name
-        'file_name_embedding': embeddings[i],  # Save the embedding for the file name
-        'href': item['href']  # Save the href for each file
-    })
 
-# Save the embeddings data with file names and hrefs to a new JSON file
-with open('embeddings.json', 'w') as outfile:
-    json.dump(embeddings_data, outfile, indent=4)
+if __name__ == '__main__':
+    if '--changes' in sys.argv:
+        # Incremental update from the records emitted by syncCatalog.py
+        with open('catalog_changes.json', 'r') as file:
+            apply_changes(json.load(file))
+    else:
+        # Load JSON file containing file names and hrefs
+        with open('file_info_with_hrefs.json', 'r') as file:
+            data = json.load(file)
 
+        # Catalogs written before versions were collapsed still list every version, only the tips are embedded
+        write_index(embed_records(collapse_versions(data)))
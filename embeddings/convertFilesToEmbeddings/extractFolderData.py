@@ -1,5 +1,6 @@
 import requests
 import json
+import os
 
 #hardcoded function to navigate to certain folder within ACC and convert get a json response containing all the items in the folder
 def get_hubs(access_token):
@@ -120,51 +121,272 @@ def getfoldercontents(access_token):
     else:
         print('failed')
 
-def extractFileInfo():
-    with open("../folder_contents.json", "r") as file:
+# Function to build the identity of a catalog record, the item lineage id survives new versions and moves
+def record_key(record):
+    return record.get("item_id") or record["href"]
+
+# Function to collapse the versions of each item into one record for its tip version
+# Older versions are kept on the tip record as a small "versions" list, so only distinct documents are embedded and indexed
+def collapse_versions(records):
+    items = {}
+    for record in records:
+        items.setdefault(record_key(record), []).append(record)
+
+    collapsed = []
+    for versions in items.values():
+        versions.sort(key=lambda record: record.get("version") or 0, reverse=True)
+        tip = dict(versions[0])
+        older = [
+            {"version": record.get("version"), "file_name": record["file_name"], "href": record["href"]}
+            for record in versions[1:] if record["href"] != tip["href"]
+        ]
+        if older:
+            tip["versions"] = older
+        collapsed.append(tip)
+    return collapsed
+
+# Function to fetch a Data Management endpoint, following the "next" links so that paged listings are read completely
+def get_all_pages(access_token, endpoint):
+    headers = {
+        'Authorization': f'Bearer {access_token}'
+    }
+    data, included = [], []
+    complete, status = True, 200
+    while endpoint:
+        response = requests.get(endpoint, headers=headers)
+        if response.status_code != 200:
+            print('failed', endpoint, response.status_code)
+            complete, status = False, response.status_code
+            break
+        page = response.json()
+        data.extend(page.get("data", []))
+        included.extend(page.get("included", []))
+        endpoint = page.get("links", {}).get("next", {}).get("href")
+
+    # complete is False when a page failed, callers must not treat the missing entries as deleted; status is that of the failed page
+    return {"data": data, "included": included, "complete": complete, "status": status}
+
+# Append-only journal of a crawl in progress: discovered projects, then one line per listed folder with its subfolders and file records
+JOURNAL_FILE = 'crawl_journal.jsonl'
+
+# Journal lines written between two fsyncs, a power loss costs at most this many folder listings
+JOURNAL_SYNC_EVERY = 50
+
+# Consecutive failed folder listings after which the crawl stops (expired token, throttling storm), a rerun resumes it
+MAX_CONSECUTIVE_FAILURES = 5
+
+# Function to read the journal of an unfinished crawl; a last line cut off by a crash is dropped and truncated away
+def read_journal(path=JOURNAL_FILE):
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    valid = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+            valid += len(line)
+    with open(path, 'r+b') as file:
+        file.truncate(valid)
+    return entries
+
+# Journal writer, every line is flushed at once so a crashed process loses nothing, and fsynced in batches
+class CrawlJournal:
+    def __init__(self, path=JOURNAL_FILE, sync_every=JOURNAL_SYNC_EVERY):
+        self.file = open(path, 'a')
+        self.sync_every = sync_every
+        self.unsynced = 0
+
+    def append(self, entry):
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+# Function to walk every hub, project and folder the user can access and extract the file records of each folder
+# Progress is journalled, so a crawl stopped by a crash, an expired token or throttling resumes where it stopped when rerun
+def crawl_tenant(access_token, resume=True):
+    entries = read_journal() if resume else []
+    if not resume and os.path.exists(JOURNAL_FILE):
+        os.remove(JOURNAL_FILE)
+
+    # Replay the journal: the projects found and the folders already listed
+    projects, visited, discovered = {}, {}, False
+    for entry in entries:
+        if entry["type"] == "project":
+            projects[entry["project_id"]] = entry
+        elif entry["type"] == "discovered":
+            discovered = True
+        elif entry["type"] == "folder":
+            visited[entry["folder_id"]] = entry
+    if entries:
+        print(f"Resuming crawl: {len(projects)} projects and {len(visited)} folders already in '{JOURNAL_FILE}'.")
+
+    journal = CrawlJournal()
+    try:
+        # Hubs and projects are listed once, the journal remembers them once all of them are known
+        if not discovered:
+            hubs = get_all_pages(access_token, 'https://developer.api.autodesk.com/project/v1/hubs')
+            if not hubs["complete"]:
+                print(f"Crawl stopped: the hubs could not be listed (status {hubs['status']}). Run it again once the token is valid.")
+                return None
+            for hub in hubs["data"]:
+                projects_listing = get_all_pages(access_token, f'https://developer.api.autodesk.com/project/v1/hubs/{hub["id"]}/projects')
+                if not projects_listing["complete"]:
+                    print(f"Crawl stopped: the projects of hub {hub.get('attributes', {}).get('name') or hub['id']} could not be listed "
+                          f"(status {projects_listing['status']}). Run it again to resume from '{JOURNAL_FILE}'.")
+                    return None
+                for project in projects_listing["data"]:
+                    root_folder_id = project.get("relationships", {}).get("rootFolder", {}).get("data", {}).get("id")
+                    if not root_folder_id or project["id"] in projects:
+                        continue
+                    entry = {"type": "project", "hub_id": hub["id"], "hub_name": hub.get("attributes", {}).get("name"),
+                             "project_id": project["id"], "project_name": project.get("attributes", {}).get("name"),
+                             "root_folder_id": root_folder_id}
+                    journal.append(entry)
+                    projects[project["id"]] = entry
+            journal.append({"type": "discovered"})
+            journal.sync()
+
+        # Folders still to list: project roots and the subfolders of listed folders that were not listed themselves
+        pending = [(project["root_folder_id"], "", project_id) for project_id, project in projects.items()]
+        for entry in visited.values():
+            pending.extend((child_id, child_path, entry["project_id"]) for child_id, child_path in entry["children"])
+        pending = [folder for folder in pending if folder[0] not in visited]
+
+        # Depth-first walk of the folder tree, the root folder itself is not part of the displayed path
+        failed, consecutive_failures = 0, 0
+        while pending:
+            folder_id, folder_path, project_id = pending.pop()
+            if folder_id in visited:
+                continue
+            endpoint = f'https://developer.api.autodesk.com/data/v1/projects/{project_id}/folders/{folder_id}/contents'
+            folder_contents = get_all_pages(access_token, endpoint)
+
+            # A folder that could not be listed completely is not journalled, a rerun lists it again
+            if not folder_contents["complete"]:
+                failed += 1
+                consecutive_failures += 1
+                if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                    break
+                continue
+            consecutive_failures = 0
+
+            project = projects[project_id]
+            context = {"hub_id": project["hub_id"], "hub_name": project["hub_name"], "project_id": project_id,
+                       "project_name": project["project_name"], "folder_id": folder_id, "folder_path": folder_path}
+            children = []
+            for item in folder_contents["data"]:
+                if item["type"] == "folders":
+                    name = item.get("attributes", {}).get("name", "Unnamed Folder")
+                    children.append((item["id"], f"{folder_path}/{name}" if folder_path else name))
+
+            # The folder, its subfolders and its records go into one journal line, so they are kept or lost together
+            entry = {"type": "folder", "project_id": project_id, "folder_id": folder_id, "folder_path": folder_path,
+                     "context": context, "children": children, "files": extractFileInfo(folder_contents, context, save=False)}
+            journal.append(entry)
+            visited[folder_id] = entry
+            pending.extend((child_id, child_path, project_id) for child_id, child_path in children)
+
+        if failed:
+            print(f"Crawl stopped after {failed} failed folder listings, {len(visited)} folders are journalled. "
+                  f"Run it again to resume from '{JOURNAL_FILE}'.")
+            return None
+    finally:
+        journal.close()
+
+    file_info = [record for entry in visited.values() for record in entry["files"]]
+    folder_info = [entry["context"] for entry in visited.values()]
+
+    with open('file_info_with_hrefs.json', 'w') as f:
+        json.dump(file_info, f, indent=4)
+
+    # Every visited folder, including empty ones, seeds the folder tree used for path navigation (tools/folderTree.py)
+    with open('folder_info.json', 'w') as f:
+        json.dump(folder_info, f, indent=4)
+
+    # The crawl is complete, the next one starts from scratch
+    os.remove(JOURNAL_FILE)
+
+    print(f"Crawled and saved {len(file_info)} unique files with hrefs to 'file_info_with_hrefs.json'.")
+    return file_info
+
+# Function to extract file records from one folder listing, tagged with the hub, project and folder they belong to
+def extractFileInfo(data=None, context=None, save=True):
+    # Without an explicit listing the single folder saved by getfoldercontents() is used
+    if data is None:
         with open("../folder_contents.json", "r") as file:
             data = json.load(file)
-            # Access the 'included' key directly
-            included_items = data.get("included", [])
-
-            # Use a set to track unique combinations of file names and hrefs
-            unique_files = set()
-
-            # List to store the final output
-            file_info = []
-
-            # Iterate over 'included' items
-            for item in included_items:
-                # Ensure the item contains 'attributes' and 'extension' (where 'sourceFileName' resides)
-                attributes = item.get("attributes", {})
-                extension = attributes.get("extension", {})
-
-                # Extract file name
-                file_name = None
-                if "sourceFileName" in extension.get("data", {}):
-                    file_name = extension["data"]["sourceFileName"]
-
-                # Extract href link from the 'storage' relationship
-                href = None
-                storage_data = item.get("relationships", {}).get("storage", {}).get("meta", {})
-                href = storage_data.get("link", {}).get("href")
-
-                # Add to file_info only if both file_name and href exist
-                if file_name and href:
-                    # Use a tuple to track uniqueness
-                    file_tuple = (file_name, href)
-                    if file_tuple not in unique_files:
-                        unique_files.add(file_tuple)
-                        file_info.append({
-                            "file_name": file_name,
-                            "href": href
-                        })
-
-            # Save the unique file info to a JSON file
-            with open('file_info_with_hrefs.json', 'w') as f:
-                json.dump(file_info, f, indent=4)
-
-            print(f"Extracted and saved {len(file_info)} unique files with hrefs to 'file_info_with_hrefs.json'.")
+    context = context or {}
+
+    # Access the 'included' key directly
+    included_items = data.get("included", [])
+
+    # Use a set to track unique combinations of file names and hrefs
+    unique_files = set()
+
+    # List to store the final output
+    file_info = []
+
+    # Iterate over 'included' items
+    for item in included_items:
+        # Ensure the item contains 'attributes' and 'extension' (where 'sourceFileName' resides)
+        attributes = item.get("attributes", {})
+        extension = attributes.get("extension", {})
+
+        # Extract file name
+        file_name = None
+        if "sourceFileName" in extension.get("data", {}):
+            file_name = extension["data"]["sourceFileName"]
+
+        # Extract href link from the 'storage' relationship
+        href = None
+        storage_data = item.get("relationships", {}).get("storage", {}).get("meta", {})
+        href = storage_data.get("link", {}).get("href")
+
+        # Add to file_info only if both file_name and href exist
+        if file_name and href:
+            # Use a tuple to track uniqueness
+            file_tuple = (file_name, href)
+            if file_tuple not in unique_files:
+                unique_files.add(file_tuple)
+                file_info.append({
+                    "file_name": file_name,
+                    "href": href,
+                    "hub_id": context.get("hub_id"),
+                    "hub_name": context.get("hub_name"),
+                    "project_id": context.get("project_id"),
+                    "project_name": context.get("project_name"),
+                    "folder_id": context.get("folder_id"),
+                    "folder_path": context.get("folder_path", ""),
+                    "item_id": item.get("relationships", {}).get("item", {}).get("data", {}).get("id"),
+                    "version": attributes.get("versionNumber"),
+                    "extension": os.path.splitext(file_name)[1].lstrip('.').lower()
+                })
+
+    # One record per item, carrying its older versions
+    file_info = collapse_versions(file_info)
+
+    if save:
+        # Save the unique file info to a JSON file
+        with open('file_info_with_hrefs.json', 'w') as f:
+            json.dump(file_info, f, indent=4)
+
+        print(f"Extracted and saved {len(file_info)} unique files with hrefs to 'file_info_with_hrefs.json'.")
+    return file_info
 
 
 # if __name__ == '__main__':
@@ -178,4 +400,7 @@ def extractFileInfo():
     # get_projectfiles(access_token)
     # getfolder(access_token)
     # getfoldercontents(access_token)
-    # extractFileInfo()
\ No newline at end of file
+    # extractFileInfo()
+
+    # Alternatively, crawl every hub and project the user can access
+    # crawl_tenant(access_token)
\ No newline at end of file
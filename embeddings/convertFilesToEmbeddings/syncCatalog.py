@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+from extractFolderData import get_all_pages, extractFileInfo, record_key
+
+# Per-folder state remembered between runs (fingerprints, subfolders and the file records of each folder)
+STATE_FILE = 'sync_state.json'
+
+# Add, update and delete records produced by the last sync, consumed by convertToEmbeddings.py --changes
+CHANGES_FILE = 'catalog_changes.json'
+
+# Full catalog, kept current so that a full rebuild is still possible
+CATALOG_FILE = 'file_info_with_hrefs.json'
+
+# Function to load the state of the previous sync, an empty state means every folder is listed
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {"folders": {}}
+    with open(STATE_FILE, "r") as file:
+        return json.load(file)
+
+# Function to save the sync state, written to a temporary file first so a crash never leaves a truncated state
+def save_state(state):
+    with open(STATE_FILE + ".tmp", "w") as file:
+        json.dump(state, file)
+    os.replace(STATE_FILE + ".tmp", STATE_FILE)
+
+# Function to fingerprint a subfolder from its entry in the parent listing
+# lastModifiedTimeRollup changes whenever anything below the folder changes, so an equal fingerprint means an unchanged subtree
+def folder_fingerprint(item):
+    attributes = item.get("attributes", {})
+    modified = attributes.get("lastModifiedTimeRollup") or attributes.get("lastModifiedTime")
+    if not modified:
+        return None
+    return f"{modified}|{attributes.get('objectCount')}"
+
+# Function to fingerprint the file records of one folder listing (item ids and versions)
+def listing_fingerprint(records):
+    entries = sorted(f"{record_key(record)}@{record.get('version')}" for record in records)
+    return hashlib.sha1("\n".join(entries).encode("utf-8")).hexdigest()
+
+# Function to copy an unchanged folder and all its descendants from the previous state without listing them
+def carry_over(folder_id, old_folders, new_folders):
+    copied = 0
+    pending = [folder_id]
+    while pending:
+        current = pending.pop()
+        if current in new_folders or current not in old_folders:
+            continue
+        new_folders[current] = old_folders[current]
+        copied += 1
+        pending.extend(old_folders[current].get("children", []))
+    return copied
+
+# Function to list only the changed parts of the tenant and emit add, update and delete records
+def sync_tenant(access_token):
+    state = load_state()
+    old_folders = state.get("folders", {})
+    new_folders = {}
+    listed, skipped = 0, 0
+
+    # A failed hub or project listing would look like every file in it was deleted, so the sync is aborted instead
+    hubs = get_all_pages(access_token, 'https://developer.api.autodesk.com/project/v1/hubs')
+    if not hubs["complete"]:
+        raise RuntimeError("Failed to list hubs, sync aborted.")
+    for hub in hubs["data"]:
+        hub_context = {"hub_id": hub["id"], "hub_name": hub.get("attributes", {}).get("name")}
+        projects = get_all_pages(access_token, f'https://developer.api.autodesk.com/project/v1/hubs/{hub["id"]}/projects')
+        if not projects["complete"]:
+            raise RuntimeError(f"Failed to list projects of hub {hub['id']}, sync aborted.")
+        for project in projects["data"]:
+            project_context = dict(hub_context, project_id=project["id"], project_name=project.get("attributes", {}).get("name"))
+            root_folder_id = project.get("relationships", {}).get("rootFolder", {}).get("data", {}).get("id")
+            if not root_folder_id:
+                continue
+
+            # The root folder has no parent listing to fingerprint it, so it is always listed (one call per project)
+            pending = [(root_folder_id, "", None)]
+            while pending:
+                folder_id, folder_path, fingerprint = pending.pop()
+                previous = old_folders.get(folder_id)
+
+                # Skip the whole subtree when its fingerprint and location are unchanged
+                if fingerprint and previous and previous.get("fingerprint") == fingerprint and previous.get("folder_path") == folder_path:
+                    skipped += carry_over(folder_id, old_folders, new_folders)
+                    continue
+
+                endpoint = f'https://developer.api.autodesk.com/data/v1/projects/{project["id"]}/folders/{folder_id}/contents'
+                folder_contents = get_all_pages(access_token, endpoint)
+                listed += 1
+
+                # Keep the previous state of a folder that could not be listed, it is retried on the next sync
+                if not folder_contents["complete"]:
+                    if previous:
+                        carry_over(folder_id, old_folders, new_folders)
+                    continue
+
+                context = dict(project_context, folder_id=folder_id, folder_path=folder_path)
+                records = extractFileInfo(folder_contents, context, save=False)
+
+                # Queue the subfolders with the fingerprint seen in this listing
+                children = []
+                for item in folder_contents["data"]:
+                    if item["type"] == "folders":
+                        name = item.get("attributes", {}).get("name", "Unnamed Folder")
+                        children.append(item["id"])
+                        pending.append((item["id"], f"{folder_path}/{name}" if folder_path else name, folder_fingerprint(item)))
+
+                new_folders[folder_id] = {
+                    "fingerprint": fingerprint,
+                    "folder_path": folder_path,
+                    "listing": listing_fingerprint(records),
+                    "children": children,
+                    "files": records
+                }
+
+    # Diff the records of the previous and the current state, moves and new versions show up as updates
+    old_records = {record_key(record): record for folder in old_folders.values() for record in folder["files"]}
+    new_records = {record_key(record): record for folder in new_folders.values() for record in folder["files"]}
+
+    changes = []
+    for key, record in new_records.items():
+        if key not in old_records:
+            changes.append({"op": "add", "record": record})
+        elif old_records[key] != record:
+            changes.append({"op": "update", "record": record})
+    for key, record in old_records.items():
+        if key not in new_records:
+            changes.append({"op": "delete", "record": record})
+
+    with open(CHANGES_FILE, "w") as file:
+        json.dump(changes, file, indent=4)
+    with open(CATALOG_FILE, "w") as file:
+        json.dump(list(new_records.values()), file, indent=4)
+    save_state({"folders": new_folders})
+
+    print(f"Listed {listed} folders, skipped {skipped} unchanged folders, "
+          f"{sum(change['op'] == 'add' for change in changes)} added, "
+          f"{sum(change['op'] == 'update' for change in changes)} updated, "
+          f"{sum(change['op'] == 'delete' for change in changes)} deleted.")
+    return changes
+
+
+# if __name__ == '__main__':
+    # access_token = auth.get_authorization_code()
+
+    # Nightly refresh: list only changed folders, then apply the changes to the index
+    # sync_tenant(access_token)
+    # python convertToEmbeddings.py --changes
@@ -0,0 +1,56 @@
+# Import statements
+import argparse  # For reading the load test settings from the command line
+import asyncio  # To drive many sessions concurrently
+import time  # For measuring turn latency
+import aiohttp  # Import aiohttp for talking to the server
+
+
+# Function to simulate one user: open a session and send a number of chat turns, returning the latency of each turn
+async def run_user(http, base_url, access_token, mode, turns, message):
+    async with http.post(f"{base_url}/sessions", json={"access_token": access_token, "mode": mode}) as response:
+        session_id = (await response.json())["session_id"]
+
+    latencies, errors = [], 0
+    for _ in range(turns):
+        start = time.perf_counter()
+        async with http.post(f"{base_url}/sessions/{session_id}/messages", json={"content": message}) as response:
+            if response.status != 200:
+                errors += 1
+            await response.read()
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+# Function to run the load test and report sessions per process and turn latency percentiles
+async def main(args):
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=0)) as http:
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            run_user(http, args.url, args.token, args.mode, args.turns, args.message)
+            for _ in range(args.sessions)
+        ])
+        elapsed = time.perf_counter() - start
+
+        async with http.get(f"{args.url}/stats") as response:
+            sessions = (await response.json())["sessions"]
+
+    latencies = sorted(latency for user_latencies, _ in results for latency in user_latencies)
+    errors = sum(user_errors for _, user_errors in results)
+
+    print(f"Sessions held by the server process: {sessions}")
+    print(f"Turns: {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:.1f} turns/s), errors: {errors}")
+    print(f"Turn latency p50: {latencies[len(latencies) // 2]:.2f}s, "
+          f"p95: {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.2f}s, max: {latencies[-1]:.2f}s")
+
+
+# Main execution point, expects server.py to be running
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test for the multi-session assistant server")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--token", required=True, help="Access token used by every simulated session")
+    parser.add_argument("--mode", default="embeddings", choices=["embeddings", "manual"])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--message", default="find the pavement report pdf")
+    asyncio.run(main(parser.parse_args()))
@@ -1,15 +1,22 @@
 # Import statements
 import os
 import asyncio
+import argparse  # For the --profile option
 import json
 from agents.agent_embeddings import Assistant, assistant_runnable  # Importing Assistant for interaction
+import tools.httpSession  # Shared HTTP connection pool, closed on exit
 import tools.authentication as auth  # Authentication module to get access tokens
 import tools.embeddings  # Module to generate embeddings and download files
+import tools.searchIndex  # Embedding index that is refreshed in the background
+import tools.searchExecutor  # Worker processes scanning the embedding index in parallel
+import tools.signedUrlCache  # Cached download links, reported on exit
 import pyperclip  # To copy access token to clipboard
+import tools.queryRouter  # Answers direct lookups and downloads without the chat LLM
+import tools.profiler  # Sampling profiler and event-loop stall detector of the --profile mode
 import tools.formatting as format  # Formatting helper functions for tool outputs
 
 # Main asynchronous function for running the assistant
-async def main(access_token):
+async def main(access_token, profile=False, stall_ms=None):
     print("Access token: "+access_token)
 
     # Copy the access token to clipboard for easy access
@@ -18,6 +25,15 @@ async def main(access_token):
     print("Access token has been copied to the clipboard!")
     print("\n")
 
+    # Load the embedding index and keep it current in the background
+    tools.searchIndex.get_snapshot()
+    tools.searchExecutor.start()
+    refresher = asyncio.create_task(tools.searchIndex.run_refresher())
+
+    # Profile every turn and report callbacks that hold the event loop
+    if profile:
+        tools.profiler.start(stall_ms)
+
     # Initialize the assistant
     assistant = Assistant(assistant_runnable)
     state = {
@@ -28,17 +44,37 @@ async def main(access_token):
 
     while True:
         # User input from the terminal
-        user_input = input("You > ")
+        # Read in a worker thread so the index refresher keeps running while waiting for input
+        user_input = await asyncio.to_thread(input, "You > ")
 
         # Exit condition to break the loop
         if user_input.lower() in {"exit", "quit"}:
             print("Goodbye!")
+            tools.profiler.stop()
+            print(tools.signedUrlCache.report())
+            print(tools.queryRouter.report())
+            refresher.cancel()
+            tools.searchExecutor.shutdown()
+            await tools.httpSession.close_session()
             break
 
         # Add user input to the state for tracking purposes
         state["messages"].append({"role": "user", "content": user_input})
+        tools.profiler.begin_turn(user_input)
+        decision = None
 
         try:
+            # Direct lookups and downloads are answered right away, only ambiguous or conversational input goes to the assistant
+            # The fast path is only a shortcut, when it fails (embedding or search errors) the assistant answers the turn
+            try:
+                decision = await tools.queryRouter.answer(user_input, access_token)
+            except Exception as e:
+                decision = tools.queryRouter.new_decision(user_input, reason=f"router failed: {e}")
+            if decision["answer"] is not None:
+                print(f"Assistant > {decision['answer']}")
+                state["messages"].append({"role": "assistant", "content": decision["content"]})
+                continue
+
             # Get response from the assistant by passing the current state
             response = await assistant(state, config={})
 
@@ -55,6 +91,10 @@ async def main(access_token):
                     # Parse arguments to pass to the tool
                     args = json.loads(tool_arguments)
 
+                    # Searches are scoped to the projects of the signed-in user even when the LLM left out the token
+                    if tool_name == "agent_get_embeddings" and not args.get("access_token"):
+                        args["access_token"] = access_token
+
                     # Debug statement to verify tool execution
                     # print(f"\n\n [DEBUG] Executing tool: {tool_name} with args: {tool_arguments}")
 
@@ -86,14 +126,23 @@ async def main(access_token):
 
         except Exception as e:
             print(f"Error during assistant interaction: {e}")
+        finally:
+            tools.queryRouter.log(decision)
+            tools.profiler.end_turn()
 
 # Main execution point, calling the authorization function to get the access token
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="File download assistant (embeddings)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write a flame graph profile (collapsed stacks) of every turn and report event-loop stalls with their stack")
+    parser.add_argument("--stall-ms", type=int, default=None, help="Milliseconds a callback may hold the event loop before it is reported")
+    arguments = parser.parse_args()
+
     # Authentication to get the token
     access_token = auth.get_authorization_code()
 
     # Run the main async function with the token
-    asyncio.run(main(access_token))
+    asyncio.run(main(access_token, arguments.profile, arguments.stall_ms))
 
 
 
@@ -1,15 +1,22 @@
 # Import statements
 import os  # For accessing environment variables and interacting with the operating system
 import asyncio  # Importing the asyncio module to handle asynchronous operations and event loops in Python.
+import argparse  # For the --profile option
 import json  # Importing the json module for working with JSON
 from agents.agent_manual import Assistant, assistant_runnable  # Importing Assistant for interaction
+import tools.httpSession  # Shared HTTP connection pool, closed on exit
 import tools.authentication as auth  # Authentication module to get access tokens
 import tools.downloadFiles  # Module to download files
+import tools.folderTree  # Locally cached folder tree, written to disk on exit
+import tools.prefetch  # Background prefetching of listings, stopped on exit
+import tools.promptCache  # Cached answers of the id lookups, written to disk on exit
+import tools.signedUrlCache  # Cached download links, reported on exit
 import pyperclip  # To copy access token to clipboard
+import tools.profiler  # Sampling profiler and event-loop stall detector of the --profile mode
 import tools.formatting as format  # Formatting helper functions for tool outputs
 
 # Main asynchronous function for running the assistant
-async def main(access_token):
+async def main(access_token, profile=False, stall_ms=None):
     print("Access token: " + access_token)
 
     # Copy the access token to clipboard for easy access
@@ -18,6 +25,10 @@ async def main(access_token):
     print("Access token has been copied to the clipboard!")
     print("\n")
 
+    # Profile every turn and report callbacks that hold the event loop
+    if profile:
+        tools.profiler.start(stall_ms)
+
     # Initialize the assistant
     assistant = Assistant(assistant_runnable)
     state = {
@@ -28,15 +39,25 @@ async def main(access_token):
 
     while True:
         # User input from the terminal
-        user_input = input("You > ")
+        # Read in a worker thread so background prefetching keeps running while waiting for input
+        user_input = await asyncio.to_thread(input, "You > ")
 
         # Exit condition to break the loop
         if user_input.lower() in {"exit", "quit"}:
             print("Goodbye!")
+            tools.profiler.stop()
+            print(tools.prefetch.report())
+            print(tools.promptCache.report())
+            print(tools.signedUrlCache.report())
+            tools.promptCache.save_cache(force=True)
+            tools.prefetch.cancel_all()
+            tools.folderTree.save_tree(force=True)
+            await tools.httpSession.close_session()
             break
 
         # Add user input to the state for tracking purposes
         state["messages"].append({"role": "user", "content": user_input})
+        tools.profiler.begin_turn(user_input)
 
         try:
             # Get response from the assistant by passing the current state
@@ -86,11 +107,19 @@ async def main(access_token):
 
         except Exception as e:
             print(f"Error during assistant interaction: {e}")
+        finally:
+            tools.profiler.end_turn()
 
 # Main execution point, calling the authorization function to get the access token
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="File download assistant (manual)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write a flame graph profile (collapsed stacks) of every turn and report event-loop stalls with their stack")
+    parser.add_argument("--stall-ms", type=int, default=None, help="Milliseconds a callback may hold the event loop before it is reported")
+    arguments = parser.parse_args()
+
     # Authentication to get the token
     access_token = auth.get_authorization_code()
 
     # Run the main async function with the token
-    asyncio.run(main(access_token))
+    asyncio.run(main(access_token, arguments.profile, arguments.stall_ms))
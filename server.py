@@ -0,0 +1,232 @@
+# Import statements
+import os  # For reading the server host and port from environment variables
+import asyncio  # To run many chat sessions on one event loop
+import json  # Importing the json module for parsing tool arguments and request bodies
+import time  # For tracking when a session was last used
+import uuid  # For generating session ids
+from aiohttp import web, WSMsgType  # aiohttp web server for the HTTP and WebSocket endpoints
+from agents import agent_embeddings, agent_manual  # Both assistants, chosen per session
+import tools.downloadFiles  # Module to download files (manual mode)
+import tools.embeddings  # Module to generate embeddings and download files (embeddings mode)
+import tools.folderTree  # Folder tree learned from manual-mode listings, written to disk on shutdown
+import tools.httpSession  # Shared HTTP connection pool for all sessions
+import tools.prefetch  # Background prefetching of manual-mode listings
+import tools.promptCache  # Cached answers of the manual-mode id lookups, written to disk on shutdown
+import tools.accessScope  # Per-user access maps of the embedding index
+import tools.searchIndex  # Embedding index shared by all sessions and refreshed in the background
+import tools.searchExecutor  # Worker processes scanning the embedding index, keeping searches off the event loop
+import tools.signedUrlCache  # Signed download URLs shared by all sessions
+import tools.singleFlight  # Counters of upstream calls saved by coalescing identical requests
+import tools.webhookIngest  # Catalog and index updates from Autodesk webhook events
+import tools.formatting as format  # Formatting helper functions for tool outputs
+
+# Host and port the server listens on
+SERVER_HOST = os.getenv('SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8080'))
+
+# Sessions idle for longer than this many seconds are removed
+SESSION_IDLE_TIMEOUT = int(os.getenv('SESSION_IDLE_TIMEOUT', '3600'))
+
+# Placeholder the assistant passes as access_token, replaced by the session's own token before a tool runs
+TOKEN_PLACEHOLDER = "SESSION_TOKEN"
+
+# The assistant and tool module used by each mode
+MODES = {
+    "manual": (agent_manual.Assistant(agent_manual.assistant_runnable), tools.downloadFiles),
+    "embeddings": (agent_embeddings.Assistant(agent_embeddings.assistant_runnable), tools.embeddings),
+}
+
+# All open chat sessions, keyed by session id
+sessions = {}
+
+
+# Function to create a chat session with its own conversation state and access token
+def create_session(access_token, mode="embeddings"):
+    session_id = uuid.uuid4().hex
+    sessions[session_id] = {
+        "mode": mode,
+        "access_token": access_token,
+        "state": {
+            # The token itself never goes to the LLM, tools receive it from the session
+            "messages": [{"role": "user", "content": f"My access token is {TOKEN_PLACEHOLDER}."}]
+        },
+        "lock": asyncio.Lock(),  # Turns of one session run one at a time
+        "last_used": time.monotonic()
+    }
+    return session_id
+
+
+# Function to run one chat turn of a session, mirrors the loop in main_manual.py and main_embeddings.py
+async def run_turn(session, user_input):
+    assistant, tool_module = MODES[session["mode"]]
+    state = session["state"]
+
+    async with session["lock"]:
+        session["last_used"] = time.monotonic()
+
+        # Add user input to the state for tracking purposes
+        state["messages"].append({"role": "user", "content": user_input})
+
+        # Get response from the assistant by passing the current state
+        response = await assistant(state, config={})
+
+        # Extract the assistant's message from the response
+        message = response["messages"]
+        assistant_message = message.content
+
+        # Check if tool calls are present in the assistant's response
+        if "tool_calls" in message.additional_kwargs:
+            for tool_call in message.additional_kwargs["tool_calls"]:
+                tool_name = tool_call["function"]["name"]
+
+                # Dynamically fetch tool function
+                tool_function = getattr(tool_module, tool_name, None)
+                if not callable(tool_function):
+                    raise ValueError(f"Tool '{tool_name}' not found or not callable.")
+
+                # Parse arguments to pass to the tool, the session token always replaces whatever token the LLM passed
+                # and is added when the LLM left out an optional token, e.g. the one scoping a search to the user's projects
+                args = json.loads(tool_call["function"]["arguments"])
+                if "access_token" in args or "access_token" in tool_function.args:
+                    args["access_token"] = session["access_token"]
+
+                # Call the tool with the provided arguments asynchronously
+                tool_result = await tool_function.ainvoke(args)
+
+                # Format the result for display
+                assistant_message = f"Here is the {format.get_first_n_lines(tool_result, n=4)}\n"
+
+                # Add the tool result to the assistant's message for the next conversation
+                state["messages"].append({"role": "assistant", "content": tool_result})
+
+        # After processing tool calls, add the assistant's message to the state
+        state["messages"].append({"role": "assistant", "content": assistant_message})
+        session["last_used"] = time.monotonic()
+        return assistant_message
+
+
+# Function to look up the session named in the request path
+def get_request_session(request):
+    session = sessions.get(request.match_info["session_id"])
+    if session is None:
+        raise web.HTTPNotFound(text="Unknown session")
+    return session
+
+
+# POST /sessions {"access_token": ..., "mode": "embeddings" | "manual"}
+async def handle_create_session(request):
+    body = await request.json()
+    mode = body.get("mode", "embeddings")
+    if not body.get("access_token") or mode not in MODES:
+        raise web.HTTPBadRequest(text="access_token and a mode of 'manual' or 'embeddings' are required")
+    return web.json_response({"session_id": create_session(body["access_token"], mode)})
+
+
+# POST /sessions/{session_id}/messages {"content": ...}
+async def handle_message(request):
+    session = get_request_session(request)
+    body = await request.json()
+    try:
+        reply = await run_turn(session, body["content"])
+    except Exception as e:
+        return web.json_response({"error": f"Error during assistant interaction: {e}"}, status=500)
+    return web.json_response({"reply": reply})
+
+
+# GET /sessions/{session_id}/ws, every text frame is one user message and is answered with one reply frame
+async def handle_websocket(request):
+    session = get_request_session(request)
+    websocket = web.WebSocketResponse(heartbeat=30)
+    await websocket.prepare(request)
+
+    async for frame in websocket:
+        if frame.type != WSMsgType.TEXT:
+            continue
+        try:
+            await websocket.send_json({"reply": await run_turn(session, frame.data)})
+        except Exception as e:
+            await websocket.send_json({"error": f"Error during assistant interaction: {e}"})
+    return websocket
+
+
+# DELETE /sessions/{session_id}
+async def handle_delete_session(request):
+    get_request_session(request)
+    del sessions[request.match_info["session_id"]]
+    return web.json_response({"deleted": True})
+
+
+# POST /webhooks/autodesk, Data Management webhook events (one event, or a list of them from webhook_sender.py)
+# Events are acknowledged at once and applied in batches by the ingester, Autodesk retries calls that are not acknowledged quickly
+async def handle_webhook(request):
+    body = await request.read()
+    if not tools.webhookIngest.verify_signature(body, request.headers.get("x-adsk-signature")):
+        # Without WEBHOOK_SECRET every call is rejected, unless unsigned calls were allowed for local testing
+        raise web.HTTPUnauthorized(text="invalid webhook signature" if tools.webhookIngest.WEBHOOK_SECRET
+                                   else "webhooks are disabled until WEBHOOK_SECRET is set")
+    try:
+        events = json.loads(body)
+    except ValueError:
+        raise web.HTTPBadRequest(text="the body must be a JSON webhook event")
+    queued = tools.webhookIngest.accept(events if isinstance(events, list) else [events])
+    return web.json_response({"queued": queued})
+
+
+# GET /stats, number of sessions served by this process, upstream calls saved by request coalescing, prefetch hits,
+# LLM lookups answered from the prompt cache, download links answered from the signed URL cache, access maps built
+# and webhook events applied with their freshness latency
+async def handle_stats(request):
+    return web.json_response({"sessions": len(sessions), "single_flight": tools.singleFlight.stats,
+                              "prefetch": tools.prefetch.stats, "prompt_cache": tools.promptCache.stats,
+                              "signed_urls": tools.signedUrlCache.stats, "access": tools.accessScope.stats,
+                              "ingest": tools.webhookIngest.stats})
+
+
+# Background task removing sessions that have been idle for too long
+async def expire_sessions():
+    while True:
+        await asyncio.sleep(60)
+        now = time.monotonic()
+        for session_id, session in list(sessions.items()):
+            if now - session["last_used"] > SESSION_IDLE_TIMEOUT and not session["lock"].locked():
+                del sessions[session_id]
+
+
+# Start the shared background tasks when the server starts and stop them on shutdown
+async def on_startup(app):
+    tools.searchIndex.get_snapshot()
+    tools.searchExecutor.start()
+    app["background_tasks"] = [
+        asyncio.create_task(tools.searchIndex.run_refresher()),
+        asyncio.create_task(tools.webhookIngest.run_ingester()),
+        asyncio.create_task(expire_sessions())
+    ]
+
+
+async def on_cleanup(app):
+    for task in app["background_tasks"]:
+        task.cancel()
+    tools.prefetch.cancel_all()
+    tools.folderTree.save_tree(force=True)
+    tools.promptCache.save_cache(force=True)
+    tools.searchExecutor.shutdown()
+    await tools.httpSession.close_session()
+
+
+# Function to build the web application
+def create_app():
+    app = web.Application()
+    app.router.add_post("/sessions", handle_create_session)
+    app.router.add_post("/sessions/{session_id}/messages", handle_message)
+    app.router.add_get("/sessions/{session_id}/ws", handle_websocket)
+    app.router.add_delete("/sessions/{session_id}", handle_delete_session)
+    app.router.add_post("/webhooks/autodesk", handle_webhook)
+    app.router.add_get("/stats", handle_stats)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+# Main execution point, every user authenticates separately and creates a session with their own token
+if __name__ == "__main__":
+    web.run_app(create_app(), host=SERVER_HOST, port=SERVER_PORT)
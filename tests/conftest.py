@@ -0,0 +1,6 @@
+# Import statements
+import os  # For finding the repository root
+import sys  # For putting the repository root on the import path
+
+# The tests import the tools and embeddings packages from the repository root, also when pytest is run from elsewhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
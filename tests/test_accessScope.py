@@ -0,0 +1,95 @@
+# Import statements
+import asyncio  # For running the listing coroutines
+import pytest  # For resetting the cached users around every test
+import tools.accessScope as access_scope  # Module under test
+
+# Hub listing with two hubs, and the projects of each
+HUBS = {"data": [{"id": "b.hub-1"}, {"id": "b.hub-2"}]}
+PROJECTS = {"b.hub-1": {"data": [{"id": "b.project-1"}]}, "b.hub-2": {"data": [{"id": "b.project-2"}]}}
+
+# Snapshot without shards, enough for the access checks that happen before any map is built
+SNAPSHOT = type("Snapshot", (), {"version": "v1", "shards": []})()
+
+
+# Fixture: no cached users, and Autodesk answering with the statuses of responses (endpoint part -> status)
+@pytest.fixture
+def autodesk(monkeypatch):
+    monkeypatch.setattr(access_scope, "users", {})
+    monkeypatch.setattr(access_scope, "stats", dict.fromkeys(access_scope.stats, 0))
+    responses = {}
+
+    async def get_json(group, endpoint, access_token):
+        for part, status in responses.items():
+            if part in endpoint:
+                return status, None
+        if endpoint.endswith("/hubs"):
+            return 200, HUBS
+        return 200, PROJECTS[endpoint.split("/hubs/")[1].split("/")[0]]
+    monkeypatch.setattr(access_scope.single_flight, "get_json", get_json)
+    return responses
+
+
+# Function to get the projects of a token
+def projects(token="token"):
+    return asyncio.run(access_scope.get_projects(token))
+
+
+# Test: the projects of every hub are collected
+def test_lists_projects_of_every_hub(autodesk):
+    assert projects() == {"b.project-1", "b.project-2"}
+
+
+# Test: a rejected token can open nothing
+@pytest.mark.parametrize("status", [401, 403])
+def test_rejected_token_fails_closed(autodesk, status):
+    autodesk["/hubs"] = status
+    assert projects() == set()
+
+
+# Test: throttling and server errors say nothing about the user, they are not cached
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_failures_are_not_cached(autodesk, status):
+    autodesk["b.hub-2/projects"] = status
+    assert projects() is None
+    del autodesk["b.hub-2/projects"]
+    assert projects() == {"b.project-1", "b.project-2"}
+
+
+# Test: a throttled listing of a user never listed before refuses the search instead of leaving it unrestricted
+def test_get_access_refused_while_throttled(autodesk):
+    autodesk["/hubs"] = 429
+    with pytest.raises(PermissionError, match="could not be verified"):
+        asyncio.run(access_scope.get_access("token", SNAPSHOT))
+    assert access_scope.stats["unverified"] == 1
+
+
+# Test: when listing again after ACCESS_TTL is throttled the last project list is used, and listed again on the next search
+def test_stale_projects_used_while_throttled(autodesk, monkeypatch):
+    assert projects() == {"b.project-1", "b.project-2"}
+    monkeypatch.setattr(access_scope, "ACCESS_TTL", -1)
+    autodesk["b.hub-1/projects"] = 429
+    assert projects() == {"b.project-1", "b.project-2"}
+    assert access_scope.stats["stale"] == 1
+    del autodesk["b.hub-1/projects"]
+    autodesk["b.hub-2/projects"] = 403
+    assert projects() == {"b.project-1"}
+
+
+# Test: a search without a token can open nothing
+def test_get_access_without_token(autodesk):
+    assert asyncio.run(access_scope.get_access("", SNAPSHOT)) == {}
+
+
+# Test: a hub whose projects the user may not list contributes none, a 401 on any hub rejects the token
+def test_forbidden_hub_is_left_out(autodesk):
+    autodesk["b.hub-2/projects"] = 403
+    assert projects() == {"b.project-1"}
+    autodesk["b.hub-2/projects"] = 401
+    assert projects("other token") == set()
+
+
+# Test: a rejected token gets an empty access map instead of an unrestricted search
+def test_get_access_of_rejected_token(autodesk):
+    autodesk["/hubs"] = 401
+    assert asyncio.run(access_scope.get_access("token", SNAPSHOT)) == {}
+    assert access_scope.stats["denied"] == 1
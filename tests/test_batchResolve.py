@@ -0,0 +1,44 @@
+# Import statements
+import pytest  # For skipping without the browser login dependencies
+
+# batch_resolve signs in through tools.authentication, which needs selenium
+pytest.importorskip("selenium")
+import batch_resolve  # Module under test
+
+
+# Test: JSONL queries skip blank lines, unreadable JSON, rows without a query and versions that are not numbers
+def test_read_jsonl_queries(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text('{"query": " A-101 floor plan ", "extension": "pdf"}\n'
+                    '\n'
+                    '   \n'
+                    '{"query": "A-102", "version": "3", "hub_name": ""}\n'
+                    '{"query": \n'
+                    '{"extension": "dwg"}\n'
+                    '["A-103"]\n'
+                    '{"query": "A-104", "version": "latest"}\n'
+                    '{"query": "A-105", "project_name": 7}\n', encoding="utf-8")
+    assert batch_resolve.read_queries(str(path)) == [
+        {"query": "A-101 floor plan", "filters": {"extension": "pdf"}},
+        {"query": "A-102", "filters": {"version": 3}},
+    ]
+
+
+# Test: CSV queries come from the "query" column, with the other columns as filters and blank rows skipped
+def test_read_csv_queries(tmp_path):
+    path = tmp_path / "queries.csv"
+    path.write_text("query,project_name,version\nA-101 floor plan,Tower,\n\n,Tower,2\nA-102,,1\n", encoding="utf-8")
+    assert batch_resolve.read_queries(str(path)) == [
+        {"query": "A-101 floor plan", "filters": {"project_name": "Tower"}},
+        {"query": "A-102", "filters": {"version": 1}},
+    ]
+
+
+# Test: a plain list of file names, one per line, uses the first column and its header line as the column name
+def test_read_plain_text_queries(tmp_path):
+    path = tmp_path / "queries.txt"
+    path.write_text("file name\nA-101.pdf\n\nA-102.dwg\n", encoding="utf-8-sig")
+    assert batch_resolve.read_queries(str(path)) == [
+        {"query": "A-101.pdf", "filters": {}},
+        {"query": "A-102.dwg", "filters": {}},
+    ]
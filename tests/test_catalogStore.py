@@ -0,0 +1,57 @@
+# Import statements
+import pytest  # For the parametrised records
+from tools.catalogStore import CatalogStore  # Module under test
+
+# Records in the dict format of the catalog files: an OSS href with project scopes, one without scopes, and values without UUIDs
+RECORDS = [
+    {"file_name": "A-101 Floor Plan.pdf",
+     "href": "https://developer.api.autodesk.com/oss/v2/buckets/wip.dm.prod/objects/0f8fad5b-d9cb-469f-a165-70867728950e.pdf"
+             "?scopes=b360project.7c9e6679-7425-40de-944b-e07fc1f90ae7,O2tenant.34579194",
+     "hub_id": "b.34579194", "hub_name": "Sunway Property", "project_id": "b.7c9e6679-7425-40de-944b-e07fc1f90ae7", "project_name": "Tower A",
+     "folder_id": "urn:adsk.wipprod:fs.folder:co.Q04kD3-uT-usBOiCTSKggA", "folder_path": "Project Files/Drawings",
+     "item_id": "urn:adsk.wipprod:dm.lineage:6ba7b810-9dad-11d1-80b4-00c04fd430c8", "version": 3, "extension": "pdf"},
+    {"file_name": "S-201 Beam Schedule.XLSX",
+     "href": "https://developer.api.autodesk.com/oss/v2/buckets/wip.dm.prod/objects/1b4e28ba-2fa1-11d2-883f-0016d3cca427.xlsx",
+     "hub_id": "b.34579194", "hub_name": "Sunway Property", "project_id": "b.7c9e6679-7425-40de-944b-e07fc1f90ae7", "project_name": "Tower A",
+     "folder_id": "urn:adsk.wipprod:fs.folder:co.Q04kD3-uT-usBOiCTSKggA", "folder_path": "Project Files/Drawings",
+     "item_id": "urn:adsk.wipprod:dm.lineage:9a8b7c6d-1234-4abc-8def-0123456789ab", "version": 1, "extension": "xlsx"},
+    {"file_name": "Legacy.dwg", "href": "https://example.com/files/legacy.dwg", "hub_id": None, "hub_name": None, "project_id": None,
+     "project_name": None, "folder_id": None, "folder_path": None, "item_id": "legacy-item", "version": None, "extension": "dwg"},
+]
+
+
+# Fixture: a store holding the records, row i is record i
+@pytest.fixture
+def store():
+    store = CatalogStore()
+    for row_id, record in enumerate(RECORDS):
+        assert store.append(record) == row_id
+    return store
+
+
+# Test: every field reads back as it was appended, hrefs are rebuilt from prefix, key and scopes
+@pytest.mark.parametrize("row_id", range(len(RECORDS)))
+def test_round_trip(store, row_id):
+    assert store.row(row_id).to_dict() == RECORDS[row_id]
+    assert store.row(row_id).href == RECORDS[row_id]["href"]
+
+
+# Test: repeated values are kept once, the rows only hold codes
+def test_repeated_values_are_shared(store):
+    assert len(store) == 3
+    assert len(store.columns["scope"].strings) == 3
+    assert len(store.columns["folder"].strings) == 2
+    assert store.columns["object_key"].text == {2: "https://example.com/files/legacy.dwg"}
+
+
+# Test: the extension is derived from the file name when the record carries none
+def test_extension_from_file_name():
+    store = CatalogStore()
+    store.append(dict(RECORDS[1], extension=None))
+    assert store.get(0, "extension") == "xlsx"
+
+
+# Test: only catalog fields are attributes of a row
+def test_unknown_field(store):
+    with pytest.raises(AttributeError):
+        store.row(0).size
@@ -0,0 +1,64 @@
+# Import statements
+import embeddings.convertFilesToEmbeddings.extractFolderData as extract_folder_data  # Module under test
+
+
+# Function to build a catalog record of one file version
+def version(item_id, number, file_name, href):
+    return {"item_id": item_id, "version": number, "file_name": file_name, "href": href, "project_id": "b.1"}
+
+
+# Test: the versions of an item collapse into its tip, older versions newest first
+def test_collapse_keeps_the_tip_and_lists_older_versions():
+    records = [version("lineage-1", 1, "A-101.pdf", "href-1"), version("lineage-1", 3, "A-101 rev C.pdf", "href-3"),
+               version("lineage-1", 2, "A-101 rev B.pdf", "href-2"), version("lineage-2", 1, "S-201.pdf", "href-4")]
+    collapsed = extract_folder_data.collapse_versions(records)
+    assert [record["href"] for record in collapsed] == ["href-3", "href-4"]
+    assert collapsed[0]["versions"] == [{"version": 2, "file_name": "A-101 rev B.pdf", "href": "href-2"},
+                                        {"version": 1, "file_name": "A-101.pdf", "href": "href-1"}]
+    assert "versions" not in collapsed[1]
+
+
+# Test: a version listed twice with the same href is not kept as an older version, and the input records are not modified
+def test_collapse_drops_repeated_tips():
+    records = [version("lineage-1", 2, "A-101.pdf", "href-2"), version("lineage-1", 2, "A-101.pdf", "href-2")]
+    collapsed = extract_folder_data.collapse_versions(records)
+    assert collapsed == [records[0]] and "versions" not in records[0]
+
+
+# Test: records without an item id are keyed by their href
+def test_collapse_without_item_ids():
+    records = [{"file_name": "a.pdf", "href": "href-a"}, {"file_name": "b.pdf", "href": "href-b"}]
+    assert extract_folder_data.collapse_versions(records) == records
+
+
+# Test: complete journal lines are read, a last line cut off by a crash is dropped and truncated away
+def test_read_journal_drops_a_torn_last_line(tmp_path):
+    path = tmp_path / "crawl_journal.jsonl"
+    path.write_bytes(b'{"type": "project", "project_id": "b.1"}\n{"type": "discovered"}\n{"type": "folder", "folder_')
+    assert extract_folder_data.read_journal(str(path)) == [{"type": "project", "project_id": "b.1"}, {"type": "discovered"}]
+    assert path.read_bytes() == b'{"type": "project", "project_id": "b.1"}\n{"type": "discovered"}\n'
+
+
+# Test: a complete line that is not valid JSON ends the journal there, as a torn line does
+def test_read_journal_stops_at_a_corrupt_line(tmp_path):
+    path = tmp_path / "crawl_journal.jsonl"
+    path.write_bytes(b'{"type": "discovered"}\n{"type": \n{"type": "discovered"}\n')
+    assert extract_folder_data.read_journal(str(path)) == [{"type": "discovered"}]
+    assert path.read_bytes() == b'{"type": "discovered"}\n'
+
+
+# Test: without a journal there is nothing to resume
+def test_read_journal_without_a_file(tmp_path):
+    assert extract_folder_data.read_journal(str(tmp_path / "missing.jsonl")) == []
+
+
+# Test: lines appended after a torn line was truncated away are read on the next resume
+def test_journal_appends_after_truncation(tmp_path):
+    path = str(tmp_path / "crawl_journal.jsonl")
+    with open(path, "w") as file:
+        file.write('{"type": "discovered"}\n{"type": "fol')
+    extract_folder_data.read_journal(path)
+    journal = extract_folder_data.CrawlJournal(path)
+    journal.append({"type": "folder", "folder_id": "f1"})
+    journal.close()
+    assert extract_folder_data.read_journal(path) == [{"type": "discovered"}, {"type": "folder", "folder_id": "f1"}]
@@ -0,0 +1,28 @@
+# Import statements
+import pytest  # For resetting the module-level tree around every test
+import tools.folderTree as folder_tree  # Module under test
+
+
+# Fixture: an in-memory tree with the same folder in two projects, nothing is read from or written to disk
+@pytest.fixture(autouse=True)
+def two_projects(monkeypatch):
+    monkeypatch.setattr(folder_tree, "tree", folder_tree.make_node("", "", "root", None))
+    monkeypatch.setattr(folder_tree, "nodes_by_id", {})
+    monkeypatch.setattr(folder_tree, "nodes_by_name", {})
+    monkeypatch.setattr(folder_tree, "save_tree", lambda force=False: None)
+    for project_id, project_name in (("b.1", "Tower A"), ("b.2", "Tower B")):
+        project = folder_tree.add_project(project_id, project_name, f"root-{project_id}")
+        folder_tree.add_folder_path(project, "Project Files/Structural", f"structural-{project_id}")
+
+
+# Test: partial and misspelt paths resolve from any level
+def test_partial_and_fuzzy_paths():
+    assert [node["path"] for _, node in folder_tree.resolve("project files/structural")] == \
+        ["Tower A/Project Files/Structural", "Tower B/Project Files/Structural"]
+    assert folder_tree.resolve("Tower A/Project Files/Strucural")[0][1]["id"] == "structural-b.1"
+
+
+# Test: only paths in the caller's projects are offered
+def test_projects_restrict_the_matches():
+    assert [node["path"] for _, node in folder_tree.resolve("structural", projects={"b.2"})] == ["Tower B/Project Files/Structural"]
+    assert folder_tree.resolve("Tower", projects=set()) == []
@@ -0,0 +1,91 @@
+# Import statements
+import asyncio  # For running the streaming parser
+import json  # For encoding the sample listing
+import pytest  # For the parametrised parse paths
+import tools.jsonStream as json_stream  # Module under test
+
+# Folder listing in the shape of the Data Management API: a subfolder, an item without attributes, versions with and without
+# storage, a version with null storage and one missing its size and link, and a link to the next page
+LISTING = {
+    "jsonapi": {"version": "1.0"},
+    "links": {"self": {"href": "https://example.com/contents"}, "next": {"href": "https://example.com/contents?page[number]=1"}},
+    "data": [
+        {"type": "folders", "id": "urn:folder-1", "attributes": {"name": "Drawings", "displayName": "Drawings", "objectCount": 3},
+         "relationships": {"parent": {"data": {"type": "folders", "id": "urn:root"}}}},
+        {"type": "items", "id": "urn:item-1", "attributes": {"displayName": "A-101.pdf", "extension": {"data": {"nested": [1, 2]}}},
+         "relationships": {"parent": {"data": {"type": "folders", "id": "urn:root"}}}},
+        {"type": "items", "id": "urn:item-2"},
+    ],
+    "included": [
+        {"type": "versions", "id": "urn:version-1", "attributes": {"name": "A-101.pdf", "versionNumber": 2, "storageSize": 123456},
+         "relationships": {"item": {"data": {"type": "items", "id": "urn:item-1"}},
+                           "storage": {"data": {"type": "objects"}, "meta": {"link": {"href": "https://example.com/objects/a-101.pdf"}}}}},
+        {"type": "versions", "id": "urn:version-2", "attributes": {"name": "No storage.rvt", "versionNumber": 1},
+         "relationships": {"item": {"data": {"type": "items", "id": "urn:item-2"}}}},
+        {"type": "versions", "id": "urn:version-3", "attributes": {"name": "Uploading.dwg"},
+         "relationships": {"storage": {"data": {"type": "objects"}}}},
+        {"type": "versions", "id": "urn:version-4", "attributes": {"name": "Null storage.pdf"}, "relationships": {"storage": None}},
+    ],
+}
+
+# Projection expected from both paths
+EXPECTED = {
+    "data": [
+        {"type": "folders", "id": "urn:folder-1", "name": "Drawings", "display_name": "Drawings", "parent_id": "urn:root"},
+        {"type": "items", "id": "urn:item-1", "name": None, "display_name": "A-101.pdf", "parent_id": "urn:root"},
+        {"type": "items", "id": "urn:item-2", "name": None, "display_name": None, "parent_id": None},
+    ],
+    "included": [
+        {"id": "urn:version-1", "file_name": "A-101.pdf", "version": 2, "size": 123456, "item_id": "urn:item-1",
+         "href": "https://example.com/objects/a-101.pdf"},
+        {"id": "urn:version-3", "file_name": "Uploading.dwg", "version": None, "size": None, "item_id": None, "href": None},
+        {"id": "urn:version-4", "file_name": "Null storage.pdf", "version": None, "size": None, "item_id": None, "href": None},
+    ],
+    "next": "https://example.com/contents?page[number]=1",
+}
+
+
+# Stand-in for aiohttp's response.content, handing out the payload in small chunks so values are split between reads
+class ChunkedStream:
+    def __init__(self, payload, chunk_size=7):
+        self.payload, self.position, self.chunk_size = payload, 0, chunk_size
+
+    async def read(self, size=-1):
+        size = self.chunk_size if size is None or size < 0 else min(size, self.chunk_size)
+        chunk = self.payload[self.position:self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+
+# Stand-in for an aiohttp response, content_length None as for a chunked transfer
+class Response:
+    def __init__(self, payload, content_length):
+        self.content = ChunkedStream(payload)
+        self.content_length = content_length
+        self.payload = payload
+
+    async def read(self):
+        return self.payload
+
+
+# Test: the full decode and the streaming projection return the same listing, read_listing() picks the path by size
+@pytest.mark.parametrize("listing", [LISTING, {key: value for key, value in LISTING.items() if key != "links"}, {"data": [], "included": []}])
+@pytest.mark.parametrize("content_length, streamed", [(None, True), (10, False)])
+def test_both_paths_project_the_same(listing, content_length, streamed, monkeypatch):
+    if streamed and json_stream.ijson is None:
+        pytest.skip("ijson is not installed")
+    payload = json.dumps(listing).encode("utf-8")
+    expected = json_stream.project_listing(json.loads(payload))
+    assert asyncio.run(json_stream.stream_listing(ChunkedStream(payload))) == expected
+
+    calls = []
+    monkeypatch.setattr(json_stream, "stream_listing", lambda stream, parse=json_stream.stream_listing: calls.append(stream) or parse(stream))
+    assert asyncio.run(json_stream.read_listing(Response(payload, content_length))) == expected
+    assert bool(calls) == streamed
+
+
+# Test: the projection keeps the listed fields, drops versions without storage and reads the next page
+def test_projection_of_the_sample_listing():
+    assert json_stream.project_listing(LISTING) == EXPECTED
+    if json_stream.ijson is not None:
+        assert asyncio.run(json_stream.stream_listing(ChunkedStream(json.dumps(LISTING).encode("utf-8")))) == EXPECTED
@@ -0,0 +1,109 @@
+# Import statements
+import asyncio  # For running the prefetches and the real requests
+import pytest  # For the fixture isolating the prefetch state
+import tools.prefetch as prefetch  # Module under test
+
+# Endpoint of the folder listing of folder n
+ENDPOINT = "https://developer.api.autodesk.com/data/v1/projects/b.project/folders/{}/contents"
+
+
+# Fixture: empty prefetch state and an Autodesk stand-in; fetch_json answers the prefetches, get_json the real requests
+# Returns the settings of the stand-in: endpoints that fail, whether fetches wait for "release", and the endpoints requested
+@pytest.fixture
+def autodesk(monkeypatch):
+    for name in ("cache", "batches", "history", "spent"):
+        monkeypatch.setattr(prefetch, name, {})
+    monkeypatch.setattr(prefetch, "stats", dict.fromkeys(prefetch.stats, 0))
+    monkeypatch.setattr(prefetch, "semaphore", None)
+    monkeypatch.setattr(prefetch, "PREFETCH_TOP_N", 3)
+    settings = {"failing": set(), "release": None, "prefetched": [], "requested": []}
+
+    async def fetch_json(endpoint, access_token, parse=None):
+        settings["prefetched"].append(endpoint)
+        if settings["release"] is not None:
+            await settings["release"].wait()
+        if endpoint in settings["failing"]:
+            raise ConnectionError("connection reset")
+        return 200, {"data": [endpoint]}
+
+    async def get_json(group, endpoint, access_token, parse=None):
+        settings["requested"].append(endpoint)
+        return 200, {"data": [endpoint]}
+    monkeypatch.setattr(prefetch.single_flight, "fetch_json", fetch_json)
+    monkeypatch.setattr(prefetch.single_flight, "get_json", get_json)
+    return settings
+
+
+# Function to list the candidates of folders first .. first+n-1
+def candidates(n, first=0):
+    return [("folder_listing", ENDPOINT.format(number), None) for number in range(first, first + n)]
+
+
+# Test: a finished prefetch answers the real request without another request
+def test_prefetched_listing_is_a_hit(autodesk):
+    async def run():
+        prefetch.schedule("token", candidates(2))
+        await asyncio.sleep(0)
+        return await prefetch.get_json("folder_listing", ENDPOINT.format(1), "token")
+    assert asyncio.run(run()) == (200, {"data": [ENDPOINT.format(1)]})
+    assert prefetch.stats["hits"] == 1 and autodesk["requested"] == []
+
+
+# Test: a request joining a prefetch in flight gets its result, the other prefetches of the list are cancelled
+def test_request_joins_prefetch_and_cancels_the_rest(autodesk):
+    async def run():
+        autodesk["release"] = asyncio.Event()
+        prefetch.schedule("token", candidates(3))
+        await asyncio.sleep(0)
+        batch = prefetch.batches[prefetch.single_flight.token_fingerprint("token")]
+        others = [task for key, task in batch.items() if key[1] != ENDPOINT.format(0)]
+        request = asyncio.ensure_future(prefetch.get_json("folder_listing", ENDPOINT.format(0), "token"))
+        await asyncio.sleep(0)
+        autodesk["release"].set()
+        result = await request
+        await asyncio.sleep(0)
+        return result, others
+    result, others = asyncio.run(run())
+    assert result == (200, {"data": [ENDPOINT.format(0)]})
+    assert prefetch.stats["joined"] == 1 and prefetch.stats["cancelled"] == 2 and all(task.cancelled() for task in others)
+    assert autodesk["requested"] == []
+
+
+# Test: a request joining a prefetch that fails makes its own request instead of returning no result
+def test_failed_prefetch_falls_back_to_a_request(autodesk):
+    async def run():
+        autodesk["release"] = asyncio.Event()
+        autodesk["failing"].add(ENDPOINT.format(0))
+        prefetch.schedule("token", candidates(1))
+        await asyncio.sleep(0)
+        request = asyncio.ensure_future(prefetch.get_json("folder_listing", ENDPOINT.format(0), "token"))
+        await asyncio.sleep(0)
+        autodesk["release"].set()
+        return await request
+    assert asyncio.run(run()) == (200, {"data": [ENDPOINT.format(0)]})
+    assert prefetch.stats["joined"] == 0 and prefetch.stats["misses"] == 1 and autodesk["requested"] == [ENDPOINT.format(0)]
+
+
+# Test: a user cannot start more than PREFETCH_BUDGET prefetches a minute
+def test_budget_per_user(autodesk, monkeypatch):
+    monkeypatch.setattr(prefetch, "PREFETCH_BUDGET", 4)
+
+    async def run():
+        for token, first in (("token", 0), ("token", 3), ("other token", 0)):
+            prefetch.schedule(token, candidates(3, first))
+            await asyncio.sleep(0)
+    asyncio.run(run())
+    assert prefetch.stats["scheduled"] == 7 and prefetch.stats["over_budget"] == 1
+
+
+# Test: the folders a user opened before are prefetched first for that user only
+def test_history_is_per_user(autodesk, monkeypatch):
+    monkeypatch.setattr(prefetch, "PREFETCH_TOP_N", 1)
+
+    async def run():
+        await prefetch.get_json("folder_listing", ENDPOINT.format(4), "token")
+        for token in ("token", "other token"):
+            prefetch.schedule(token, candidates(5))
+            await asyncio.sleep(0)
+    asyncio.run(run())
+    assert autodesk["prefetched"] == [ENDPOINT.format(4), ENDPOINT.format(0)]
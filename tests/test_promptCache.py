@@ -0,0 +1,66 @@
+# Import statements
+import json  # For reading the persisted cache
+import pytest  # For the fixture isolating the cache
+import tools.promptCache as prompt_cache  # Module under test
+
+
+# Fixture: an empty cache persisted to a temporary file
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(prompt_cache, "CACHE_FILE", str(tmp_path / "prompt_cache.json"))
+    monkeypatch.setattr(prompt_cache, "entries", None)
+    monkeypatch.setattr(prompt_cache, "scopes", {})
+    monkeypatch.setattr(prompt_cache, "stats", dict.fromkeys(prompt_cache.stats, 0))
+    monkeypatch.setattr(prompt_cache, "dirty", False)
+    monkeypatch.setattr(prompt_cache, "last_saved", 0.0)
+
+
+# Function to build the key of the question about a folder name in a listing, as downloadFiles.ask_llm() does
+def key(folder_name, listing_text):
+    return prompt_cache.make_key("gpt-4o-mini", 300, f"{listing_text}\nFind the folder with the name {folder_name}")
+
+
+# Test: an answer is served from the cache once stored, and the tokens it saved are counted
+def test_hit_and_miss():
+    assert prompt_cache.get(key("Drawings", "listing v1")) is None
+    prompt_cache.put(key("Drawings", "listing v1"), "folder_id", "Drawings", "folder:root", "urn:drawings", tokens=120)
+    assert prompt_cache.get(key("Drawings", "listing v1")) == "urn:drawings"
+    assert prompt_cache.get(key("Drawings", "listing v2")) is None
+    assert prompt_cache.stats == {"hits": 1, "misses": 2, "tokens_saved": 120, "forgotten": 0}
+
+
+# Test: the least recently used answers make room once CACHE_SIZE answers are kept
+def test_lru_bound(monkeypatch):
+    monkeypatch.setattr(prompt_cache, "CACHE_SIZE", 2)
+    for name in ("A", "B"):
+        prompt_cache.put(key(name, "listing"), "folder_id", name, "folder:root", f"urn:{name}")
+    prompt_cache.get(key("A", "listing"))
+    prompt_cache.put(key("C", "listing"), "folder_id", "C", "folder:root", "urn:C")
+    assert list(prompt_cache.entries) == [key("A", "listing"), key("C", "listing")]
+    assert set(prompt_cache.scopes.values()) == set(prompt_cache.entries)
+
+
+# Test: the same question about a changed version of the same listing replaces the previous answer
+def test_changed_listing_invalidates():
+    prompt_cache.put(key("Drawings", "listing v1"), "folder_id", "Drawings", "folder:root", "urn:old")
+    prompt_cache.put(key("Drawings", "listing v2"), "folder_id", "Drawings", "folder:root", "urn:new")
+    assert list(prompt_cache.entries) == [key("Drawings", "listing v2")]
+
+
+# Test: the same question about different listings, e.g. "Drawings" in two projects or a hub name of two users, keeps both answers
+def test_different_listings_do_not_evict_each_other():
+    prompt_cache.put(key("Drawings", "project 1 root"), "folder_id", "Drawings", "folder:root-1", "urn:drawings-1")
+    prompt_cache.put(key("Drawings", "project 2 root"), "folder_id", "Drawings", "folder:root-2", "urn:drawings-2")
+    assert prompt_cache.get(key("Drawings", "project 1 root")) == "urn:drawings-1"
+    assert prompt_cache.get(key("Drawings", "project 2 root")) == "urn:drawings-2"
+
+
+# Test: a forgotten answer is asked again, other answers are kept and the cache is persisted
+def test_forget_and_persist():
+    prompt_cache.put(key("A", "listing"), "folder_id", "A", "folder:root", "urn:A")
+    prompt_cache.put(key("B", "listing"), "folder_id", "B", "folder:root", "urn:B")
+    prompt_cache.forget(key("A", "listing"))
+    assert prompt_cache.get(key("A", "listing")) is None and prompt_cache.stats["forgotten"] == 1
+    prompt_cache.save_cache(force=True)
+    with open(prompt_cache.CACHE_FILE) as file:
+        assert list(json.load(file)) == [key("B", "listing")]
@@ -0,0 +1,40 @@
+# Import statements
+import pytest  # For the table of routed requests
+import tools.queryRouter as query_router  # Module under test
+
+
+# Test: direct requests naming a file are parsed into intent, query, version and project
+@pytest.mark.parametrize("text, intent, query, version, project_name", [
+    ("get me A-101 floor plan.pdf", "download", "A-101 floor plan.pdf", 0, ""),
+    ("Please download the fire strategy report", "download", "fire strategy report", 0, ""),
+    ("give me the S201 drawing", "download", "S201 drawing", 0, ""),
+    ('I need the "Fire Strategy" report', "download", "Fire Strategy report", 0, ""),
+    ("get the site plan dwg", "download", "site plan dwg", 0, ""),
+    ("can you send me the download link for A-101?", "download", "A-101", 0, ""),
+    ("where is the fire strategy report?", "lookup", "fire strategy report", 0, ""),
+    ("show me v2 of A-101", "lookup", "A-101", 2, ""),
+    ("find floor plan version 2 of A-101 in project Tower B", "lookup", "floor plan A-101", 2, "Tower B"),
+])
+def test_direct_requests(text, intent, query, version, project_name):
+    request, reason = query_router.parse_request(text)
+    assert reason is None
+    assert request == {"intent": intent, "query": query, "version": version, "project_name": project_name}
+
+
+# Test: conversational input and references to earlier results go to the LLM, with the reason
+@pytest.mark.parametrize("text, reason", [
+    ("I need help", "no file reference"),
+    ("I want to talk to a human", "no file reference"),
+    ("give me a summary of the project", "no file reference"),
+    ("get started", "no file reference"),
+    ("hello there", "no lookup or download verb"),
+    ("download it", "refers to earlier results"),
+    ("get me the second one", "refers to earlier results"),
+    ("show me how this works", "conversational"),
+    ("find what you found before", "conversational"),
+    ("download the file", "refers to earlier results"),
+    ("download version 2", "no file named"),
+    ("find " + "very " * 12 + "long name", "too long for a file name"),
+])
+def test_requests_for_the_llm(text, reason):
+    assert query_router.parse_request(text) == (None, reason)
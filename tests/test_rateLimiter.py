@@ -0,0 +1,63 @@
+# Import statements
+import asyncio  # For running the bucket coroutines
+import time  # For measuring how long acquiring tokens takes
+import tools.rateLimiter as rate_limiter  # Module under test
+
+
+# Function to take n tokens from a bucket and return the seconds it took
+def acquire(bucket, n):
+    async def run():
+        start = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - start
+    return asyncio.run(run())
+
+
+# Test: a full bucket hands out its burst without waiting
+def test_burst_is_served_immediately():
+    bucket = rate_limiter.TokenBucket(rate=10, capacity=5, concurrency=1)
+    assert acquire(bucket, 5) < 0.05
+
+
+# Test: past the burst, tokens come at the configured rate
+def test_rate_after_burst():
+    bucket = rate_limiter.TokenBucket(rate=50, capacity=1, concurrency=1)
+    assert 0.07 < acquire(bucket, 6) < 0.3
+
+
+# Test: a 429 halves the rate, never below a twentieth of the limit, and successes raise it back to the limit
+def test_penalise_and_reward():
+    bucket = rate_limiter.TokenBucket(rate=20, capacity=5, concurrency=1)
+    bucket.penalise()
+    assert bucket.rate == 10 and bucket.tokens == 0 and bucket.throttled == 1
+    for _ in range(10):
+        bucket.penalise()
+    assert bucket.rate == 1
+    for _ in range(50):
+        bucket.reward()
+    assert bucket.rate == 20
+
+
+# Test: a Retry-After pause holds every caller of the bucket
+def test_retry_after_blocks_the_bucket():
+    bucket = rate_limiter.TokenBucket(rate=1000, capacity=10, concurrency=1)
+    bucket.penalise(retry_after=0.2)
+    assert acquire(bucket, 1) >= 0.15
+
+
+# Test: Retry-After in seconds or as an HTTP date, anything else is ignored
+def test_parse_retry_after():
+    assert rate_limiter.parse_retry_after("3") == 3.0
+    assert rate_limiter.parse_retry_after("-1") == 0.0
+    assert rate_limiter.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert rate_limiter.parse_retry_after("soon") is None
+    assert rate_limiter.parse_retry_after(None) is None
+
+
+# Test: Autodesk URLs are classified by the quota family of their path
+def test_classify():
+    assert rate_limiter.classify("https://developer.api.autodesk.com/oss/v2/buckets/b/objects/k/signeds3download") == "autodesk:oss"
+    assert rate_limiter.classify("https://developer.api.autodesk.com/data/v1/projects/p/folders/f/contents") == "autodesk:data"
+    assert rate_limiter.classify("https://developer.api.autodesk.com/project/v1/hubs") == "autodesk:project"
+    assert rate_limiter.classify("https://developer.api.autodesk.com/authentication/v2/token") == "autodesk:other"
@@ -0,0 +1,113 @@
+# Import statements
+import asyncio  # For running the executor searches
+import json  # For writing the test index
+import numpy as np  # For the random embeddings
+import pytest  # For fixtures and the parametrised filters
+import tools.accessScope as access_scope  # Access maps restricting the search
+import tools.searchExecutor as search_executor  # Module under test
+import tools.searchIndex as search_index  # Single-process search the executor has to agree with
+
+# Rows per project shard and dimensions of the random embeddings
+ROWS = 300
+DIMS = 16
+
+# Folders, extensions and projects the rows are spread over
+FOLDERS = ["Project Files/Drawings", "Project Files/Drawings/Structural", "Project Files/Models", "Project Files/Reports"]
+EXTENSIONS = ["pdf", "dwg", "rvt", "xlsx"]
+PROJECTS = ["b.project-1", "b.project-2", "b.project-3"]
+
+
+# Function to write an index of one shard per project with random embeddings, every third row has an older version
+def write_index(index_dir, seed=0):
+    rng = np.random.default_rng(seed)
+    (index_dir / "shards").mkdir(exist_ok=True)
+    manifest = []
+    for number, project_id in enumerate(PROJECTS):
+        rows = []
+        for row_id in range(ROWS):
+            file_name = f"{project_id[-1]}-{row_id:03d}.{EXTENSIONS[row_id % 4]}"
+            rows.append({"file_name": file_name, "href": f"https://example.com/{project_id}/{row_id}", "hub_id": "b.hub", "hub_name": "Hub",
+                         "project_id": project_id, "project_name": f"Tower {number}", "folder_id": FOLDERS[row_id // 4 % 4],
+                         "folder_path": FOLDERS[row_id // 4 % 4], "item_id": f"{project_id}-{row_id}", "version": 2 if row_id % 3 else 1,
+                         "versions": [{"version": 1, "file_name": file_name, "href": "old"}] if row_id % 3 else [],
+                         "file_name_embedding": rng.standard_normal(DIMS).tolist()})
+        shard = f"shards/{project_id}.json"
+        (index_dir / shard).write_text(json.dumps(rows))
+        manifest.append({"shard": shard, "hub_id": "b.hub", "hub_name": "Hub", "project_id": project_id, "project_name": f"Tower {number}",
+                         "file_count": ROWS, "extensions": EXTENSIONS})
+    (index_dir / search_index.MANIFEST_FILE).write_text(json.dumps({"shards": manifest}))
+
+
+# Fixture: a pool of two spawned workers, shared by the tests of this file; spawned workers import this module
+# without running it, so nothing else is needed to guard the pool
+@pytest.fixture(scope="module")
+def workers():
+    search_executor.start(2)
+    yield
+    search_executor.shutdown()
+
+
+# Fixture: a published snapshot of a fresh index, every search goes to the workers
+@pytest.fixture
+def snapshot(tmp_path, workers, monkeypatch):
+    monkeypatch.setattr(search_executor, "MIN_PARALLEL_ROWS", 0)
+    write_index(tmp_path)
+    snapshot = search_index.IndexSnapshot("v1", search_index.load_manifest(str(tmp_path)), str(tmp_path))
+    search_executor.publish(snapshot)
+    return snapshot
+
+
+# Function to search with the executor and with the single-process search, returns both results
+def both(snapshot, query, **filters):
+    parallel = asyncio.run(search_executor.search(query, top_k=5, threshold=-1, snapshot=snapshot, **filters))
+    single = search_index.search(query, top_k=5, threshold=-1, snapshot=snapshot, **filters)
+    return parallel, single
+
+
+# Test: the workers find the same matches as the single-process search, with and without filters
+@pytest.mark.parametrize("filters", [
+    {},
+    {"project_name": "Tower 1"},
+    {"extension": "pdf"},
+    {"folder_path": "Project Files/Drawings", "family": "drawing"},
+    {"folder_name": "Structural", "version": 1},
+])
+def test_matches_single_process_search(snapshot, filters):
+    for query in np.random.default_rng(1).standard_normal((5, DIMS)):
+        parallel, single = both(snapshot, query, **filters)
+        assert [match["href"] for match in parallel] == [match["href"] for match in single]
+        assert [match["similarity"] for match in parallel] == pytest.approx([match["similarity"] for match in single], abs=1e-5)
+        assert len(parallel) == 5
+
+
+# Test: an access map restricts the workers to the same rows as the single-process search
+def test_matches_single_process_search_with_access(snapshot):
+    access = access_scope.build_access(snapshot, {"b.project-2"})
+    for query in np.random.default_rng(2).standard_normal((5, DIMS)):
+        parallel, single = both(snapshot, query, access=access, extension="rvt")
+        assert [match["href"] for match in parallel] == [match["href"] for match in single]
+        assert all(match["href"].startswith("https://example.com/b.project-2/") for match in parallel)
+    assert both(snapshot, np.ones(DIMS), access={}) == ([], [])
+
+
+# Test: a snapshot sharing unchanged shards with the previous one reuses their blocks, only the rewritten shard is copied
+def test_unchanged_shards_keep_their_blocks(tmp_path, workers, monkeypatch):
+    monkeypatch.setattr(search_executor, "MIN_PARALLEL_ROWS", 0)
+    write_index(tmp_path)
+    first = search_index.IndexSnapshot("v1", search_index.load_manifest(str(tmp_path)), str(tmp_path))
+    search_executor.publish(first)
+    rows = json.loads((tmp_path / "shards/b.project-2.json").read_text())
+    rows[0]["file_name"] = "renamed.pdf"
+    (tmp_path / "shards/b.project-2.json").write_text(json.dumps(rows))
+
+    second = search_index.IndexSnapshot("v2", search_index.load_manifest(str(tmp_path)), str(tmp_path), previous=first)
+    search_executor.publish(second)
+    assert [old["shared"] == new["shared"] for old, new in zip(first.shards, second.shards)] == [True, False, True]
+
+    # Blocks are unlinked only when no snapshot using them is alive
+    old_block = first.shards[1]["shared"][0]
+    del first
+    assert old_block not in search_executor.blocks
+    assert all(name in search_executor.blocks for name in second.shared)
+    parallel, single = both(second, np.random.default_rng(3).standard_normal(DIMS))
+    assert [match["href"] for match in parallel] == [match["href"] for match in single]
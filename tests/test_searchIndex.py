@@ -0,0 +1,222 @@
+# Import statements
+import json  # For writing the test index
+from types import SimpleNamespace  # Stand-in for an index snapshot
+import numpy as np  # For the shard matrices and comparing the returned row ids
+import pytest  # For the index fixture
+from tools.catalogStore import CatalogStore  # Columnar catalog the shards hold
+import tools.facets as facets  # Facet bitmaps the filters combine
+import tools.accessScope as access_scope  # Access maps restricting the candidates
+import tools.searchIndex as search_index  # Module under test
+
+# Manifest entries of the test index: two projects of one hub and one project of another hub
+MANIFEST = [
+    {"shard": "shards/b.project-1.json", "hub_id": "b.hub-1", "hub_name": "Sunway Property", "project_id": "b.project-1",
+     "project_name": "Tower A", "extensions": ["pdf", "xlsx"]},
+    {"shard": "shards/b.project-2.json", "hub_id": "b.hub-1", "hub_name": "Sunway Property", "project_id": "b.project-2",
+     "project_name": "Tower B", "extensions": ["pdf"]},
+    {"shard": "shards/b.project-3.json", "hub_id": "b.hub-2", "hub_name": "Other Hub", "project_id": "b.project-3",
+     "project_name": "Mall", "extensions": None},
+]
+
+# Files of each shard as (file name, folder path), every file gets its own embedding direction
+FILES = {
+    "b.project-1": [("A-101 Floor Plan.pdf", "Project Files/Drawings"), ("S-201 Beam Schedule.xlsx", "Project Files/Drawings/Structural"),
+                    ("A-001 Cover.pdf", "Project Files/Drawings Archive")],
+    "b.project-2": [("B-101 Site Plan.pdf", "Project Files/Drawings")],
+    "b.project-3": [("M-101 Mall Plan.PDF", "Project Files/Drawings")],
+}
+
+
+# Fixture: a sharded index on disk, loaded the way the search serves it
+@pytest.fixture
+def snapshot(tmp_path):
+    (tmp_path / "shards").mkdir()
+    dims = sum(len(files) for files in FILES.values())
+    position = 0
+    for shard in MANIFEST:
+        rows = []
+        for file_name, folder_path in FILES[shard["project_id"]]:
+            embedding = [0.0] * dims
+            embedding[position] = 1.0
+            position += 1
+            rows.append({"file_name": file_name, "href": f"https://example.com/{file_name}", "hub_id": shard["hub_id"],
+                         "hub_name": shard["hub_name"], "project_id": shard["project_id"], "project_name": shard["project_name"],
+                         "folder_id": folder_path, "folder_path": folder_path, "file_name_embedding": embedding})
+        (tmp_path / shard["shard"]).write_text(json.dumps(rows))
+    (tmp_path / search_index.MANIFEST_FILE).write_text(json.dumps({"shards": MANIFEST}))
+    return search_index.IndexSnapshot("test", search_index.load_manifest(str(tmp_path)), str(tmp_path))
+
+
+# Function to search with a query close to every file, so the filters alone decide what is returned
+def search(snapshot, **filters):
+    query = [1.0] * sum(len(files) for files in FILES.values())
+    return sorted(match["file_name"] for match in search_index.search(query, top_k=10, threshold=0.0, snapshot=snapshot, **filters))
+
+
+# Test: paths and extensions are normalised before they are compared
+def test_normalisation():
+    assert search_index.normalise_path(" Project Files\\Drawings/ ") == "project files/drawings"
+    assert [search_index.normalise_extension(value) for value in ("*.PDF", ".pdf", " pdf")] == ["pdf", "pdf", "pdf"]
+
+
+# Test: hubs and projects match by partial name, case insensitive, or by exact id
+def test_matches_name():
+    assert search_index.matches_name("tower", "Tower A")
+    assert search_index.matches_name("B.PROJECT-1", "Tower A", "b.project-1")
+    assert not search_index.matches_name("b.project", "Tower A", "b.project-1")
+    assert not search_index.matches_name("tower", None)
+
+
+# Test: the manifest alone prunes shards of other hubs, other projects and without the extension; unknown extensions are kept
+def test_select_shards():
+    def selected(**filters):
+        return [shard["project_id"] for shard in search_index.select_shards(MANIFEST, **filters)]
+    assert selected() == ["b.project-1", "b.project-2", "b.project-3"]
+    assert selected(hub_name="sunway") == ["b.project-1", "b.project-2"]
+    assert selected(hub_name="b.hub-2") == ["b.project-3"]
+    assert selected(project_name="tower b") == ["b.project-2"]
+    assert selected(extension=".xlsx") == ["b.project-1", "b.project-3"]
+
+
+# Test: without a manifest the legacy single-file index is one unscoped shard
+def test_legacy_manifest(tmp_path):
+    assert search_index.load_manifest(str(tmp_path)) == []
+    (tmp_path / search_index.LEGACY_FILE).write_text("[]")
+    assert [shard["shard"] for shard in search_index.load_manifest(str(tmp_path))] == [search_index.LEGACY_FILE]
+
+
+# Test: hub and project filters restrict the search to their shards
+def test_search_by_hub_and_project(snapshot):
+    assert search(snapshot, hub_name="Other Hub") == ["M-101 Mall Plan.PDF"]
+    assert search(snapshot, project_name="Tower B") == ["B-101 Site Plan.pdf"]
+
+
+# Test: a folder path selects its subtree, "Drawings Archive" is not below "Drawings"
+def test_search_by_folder_path(snapshot):
+    assert search(snapshot, project_name="Tower A", folder_path="project files\\drawings\\") == \
+        ["A-101 Floor Plan.pdf", "S-201 Beam Schedule.xlsx"]
+
+
+# Test: the extension filter is normalised and matches the extensions of every shard, also of shards that did not record them
+def test_search_by_extension(snapshot):
+    assert search(snapshot, extension="*.PDF") == ["A-001 Cover.pdf", "A-101 Floor Plan.pdf", "B-101 Site Plan.pdf", "M-101 Mall Plan.PDF"]
+    assert search(snapshot, extension="xlsx", folder_path="Project Files/Drawings") == ["S-201 Beam Schedule.xlsx"]
+    assert search(snapshot, extension="docx") == []
+
+
+# Function to build an in-memory shard from catalog records, as IndexSnapshot does from a shard file
+def make_shard(records, project_id="b.project-1", project_name="Tower A"):
+    catalog = CatalogStore()
+    for record in records:
+        catalog.append(dict({"hub_id": "b.hub", "hub_name": "Hub", "project_id": project_id, "project_name": project_name}, **record))
+    meta = {"shard": f"shards/{project_id}.json", "hub_id": "b.hub", "hub_name": "Hub", "project_id": project_id,
+            "project_name": project_name, "extensions": None}
+    return {"meta": meta, "catalog": catalog, "matrix": np.zeros((len(records), 2), dtype=np.float32),
+            "facets": facets.build_facets(catalog)}
+
+
+# Function to build a catalog record with an OSS href
+def record(file_name, folder_path, version=1, versions=None):
+    return {"file_name": file_name, "href": f"https://developer.api.autodesk.com/oss/v2/buckets/wip.dm.prod/objects/{file_name}",
+            "folder_id": folder_path, "folder_path": folder_path, "version": version, "versions": versions or []}
+
+
+# Shard of one project with drawings, a spreadsheet and a model, the floor plan has two older versions
+SHARD = make_shard([
+    record("A-101 Floor Plan.pdf", "Project Files/Drawings", 3,
+           [{"version": 2, "file_name": "A-101 Floor Plan.pdf", "href": "old-2"}, {"version": 1, "file_name": "A-101.pdf", "href": "old-1"}]),
+    record("S-201 Beam Schedule.xlsx", "Project Files/Drawings/Structural", 1),
+    record("Tower.rvt", "Project Files/Models", 2),
+    record("Site.dwg", "Project Files/Drawings Archive", 1),
+])
+
+
+# Test: without any facet the whole shard is scored
+def test_unfiltered_returns_none():
+    assert search_index.filter_rows(SHARD) is None
+
+
+# Test: "*.PDF" and "pdf" select the same rows
+def test_extension_is_normalised():
+    assert search_index.filter_rows(SHARD, extension="*.PDF").tolist() == [0]
+
+
+# Test: an extension missing from the shard gives no rows instead of no filter
+def test_unknown_extension_matches_nothing():
+    assert search_index.filter_rows(SHARD, extension="docx").tolist() == []
+
+
+# Test: a family matches every extension it contains
+def test_family():
+    assert search_index.filter_rows(SHARD, family="drawing").tolist() == [0, 3]
+    assert search_index.filter_rows(SHARD, family="model").tolist() == [2]
+
+
+# Test: a folder path selects its subtree, "Drawings Archive" is not below "Drawings"
+def test_folder_subtree_excludes_siblings_sharing_a_prefix():
+    assert search_index.filter_rows(SHARD, folder_path="project files\\drawings\\").tolist() == [0, 1]
+
+
+# Test: a folder name matches the folder at any depth
+def test_folder_name_matches_any_level():
+    assert search_index.filter_rows(SHARD, folder_name="Structural").tolist() == [1]
+
+
+# Test: a version matches rows having it as tip or as an older version
+def test_version_matches_tip_and_older_versions():
+    assert search_index.filter_rows(SHARD, version=1).tolist() == [0, 1, 3]
+    assert search_index.filter_rows(SHARD, version=2).tolist() == [0, 2]
+
+
+# Test: facets are combined with and
+def test_facets_combine():
+    assert search_index.filter_rows(SHARD, folder_path="Project Files/Drawings", family="spreadsheet").tolist() == [1]
+
+
+# Test: the access bitmap restricts the rows and is not modified, it is shared by later searches
+def test_allowed_bitmap_restricts_and_is_not_modified():
+    allowed = np.array([True, False, True, True])
+    assert search_index.filter_rows(SHARD, allowed=allowed).tolist() == [0, 2, 3]
+    assert search_index.filter_rows(SHARD, family="drawing", allowed=allowed).tolist() == [0, 3]
+    assert allowed.tolist() == [True, False, True, True]
+
+
+# Function to build a snapshot stand-in of the given shards, candidate_rows only reads the manifest and the shards
+def make_snapshot(*shards):
+    return SimpleNamespace(shards=list(shards), manifest=[shard["meta"] for shard in shards], version="test")
+
+
+# Shard of a second project, and the legacy unscoped shard whose rows belong to both projects
+OTHER = make_shard([record("B-101 Site Plan.pdf", "Project Files/Drawings")], project_id="b.project-2", project_name="Tower B")
+LEGACY = make_shard([dict(record("Old A.pdf", "Drawings"), project_id="b.project-1"),
+                     dict(record("Old B.pdf", "Drawings"), project_id="b.project-2")], project_id=None, project_name=None)
+
+
+# Function to list the candidates as (project id of the shard, row ids)
+def candidates(snapshot, **filters):
+    return [(shard["meta"]["project_id"], None if row_ids is None else row_ids.tolist())
+            for shard, row_ids in search_index.candidate_rows(snapshot, **filters)]
+
+
+# Test: without an access map every shard in scope is scored whole
+def test_candidates_unrestricted():
+    assert candidates(make_snapshot(SHARD, OTHER)) == [("b.project-1", None), ("b.project-2", None)]
+
+
+# Test: the project scope prunes shards, the facets pick rows, shards without a matching row are left out
+def test_candidates_scope_and_facets():
+    assert candidates(make_snapshot(SHARD, OTHER), project_name="tower b") == [("b.project-2", None)]
+    assert candidates(make_snapshot(SHARD, OTHER), extension="xlsx") == [("b.project-1", [1])]
+
+
+# Test: an access map keeps only the shards the user can open, and the allowed rows of the unscoped shard
+def test_candidates_with_access_map():
+    snapshot = make_snapshot(SHARD, OTHER, LEGACY)
+    access = access_scope.build_access(snapshot, {"b.project-2"})
+    assert candidates(snapshot, access=access) == [("b.project-2", None), (None, [1])]
+    assert candidates(snapshot, access=access, extension="xlsx") == []
+
+
+# Test: an empty access map, as for a rejected token, leaves nothing to score
+def test_candidates_with_empty_access_map():
+    assert candidates(make_snapshot(SHARD, OTHER, LEGACY), access={}) == []
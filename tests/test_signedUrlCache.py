@@ -0,0 +1,90 @@
+# Import statements
+import asyncio  # For running the background renewal
+import importlib  # For re-reading the settings from the environment
+import time  # For building signature times relative to now
+from datetime import datetime, timezone  # For writing X-Amz-Date values
+import tools.signedUrlCache as signed_url_cache  # Module under test
+
+# Signed URL without any expiry parameters
+PLAIN_URL = "https://cdn.derivative.autodesk.com/object.pdf?token=abc"
+
+
+# Function to build an S3 presigned URL signed the given number of seconds ago and valid for expires seconds
+def amz_url(signed_ago, expires):
+    amz_date = datetime.fromtimestamp(time.time() - signed_ago, timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return (f"https://s3.amazonaws.com/com.autodesk.oss-persistent/object.pdf?X-Amz-Algorithm=AWS4-HMAC-SHA256"
+            f"&X-Amz-Date={amz_date}&X-Amz-Expires={expires}&X-Amz-Signature=0f")
+
+
+# Test: without expiry parameters the requested lifetime counts from the signing time
+def test_requested_lifetime_without_parameters():
+    assert signed_url_cache.url_expiry(PLAIN_URL, 1000.0) == 1000.0 + signed_url_cache.SIGNED_URL_MINUTES * 60
+
+
+# Test: a shorter S3 signature wins over the requested lifetime, converted to the monotonic clock
+def test_amz_signature_shortens_the_expiry():
+    now = time.monotonic()
+    expires = signed_url_cache.url_expiry(amz_url(signed_ago=60, expires=600), now)
+    assert abs(expires - (now + 540)) < 2
+
+
+# Test: a longer S3 signature does not extend the requested lifetime
+def test_amz_signature_never_extends_the_lifetime():
+    now = time.monotonic()
+    expires = signed_url_cache.url_expiry(amz_url(signed_ago=0, expires=7 * 24 * 3600), now)
+    assert expires == now + signed_url_cache.SIGNED_URL_MINUTES * 60
+
+
+# Test: an Expires parameter in epoch seconds is honoured as well
+def test_epoch_expires_parameter():
+    now = time.monotonic()
+    expires = signed_url_cache.url_expiry(f"{PLAIN_URL}&Expires={int(time.time()) + 120}", now)
+    assert abs(expires - (now + 120)) < 2
+
+
+# Test: a URL is not handed out within the safety margin of its expiry
+def test_lookup_respects_the_safety_margin(monkeypatch):
+    monkeypatch.setattr(signed_url_cache, "entries", signed_url_cache.OrderedDict())
+    signed_url_cache.put(("bucket", "fresh", "user"), amz_url(signed_ago=0, expires=3600))
+    signed_url_cache.put(("bucket", "stale", "user"), amz_url(signed_ago=0, expires=signed_url_cache.SAFETY_MARGIN - 10))
+    assert signed_url_cache.lookup(("bucket", "fresh", "user"))["hits"] == 1
+    assert signed_url_cache.lookup(("bucket", "stale", "user")) is None
+
+
+# Test: a hot URL close to its safety margin is still served while a renewal runs in the background and replaces it
+def test_hot_entry_is_renewed_in_the_background(monkeypatch):
+    monkeypatch.setattr(signed_url_cache, "entries", signed_url_cache.OrderedDict())
+    monkeypatch.setattr(signed_url_cache, "refresh_tasks", set())
+    monkeypatch.setattr(signed_url_cache, "stats", dict.fromkeys(signed_url_cache.stats, 0))
+    href = "https://developer.api.autodesk.com/oss/v2/buckets/bucket/objects/object.pdf"
+    old_url = amz_url(signed_ago=0, expires=signed_url_cache.SAFETY_MARGIN + 60)
+    new_url = amz_url(signed_ago=0, expires=3600)
+    requested = []
+
+    async def get_json(group, endpoint, access_token, parse=None):
+        requested.append(endpoint)
+        return 200, {"url": new_url}
+    monkeypatch.setattr(signed_url_cache.single_flight, "get_json", get_json)
+    signed_url_cache.put(("bucket", "object.pdf", signed_url_cache.single_flight.token_fingerprint("token")), old_url)
+
+    async def run():
+        served = [await signed_url_cache.get_signed_url("token", href) for _ in range(signed_url_cache.HOT_HITS + 1)]
+        tasks = set(signed_url_cache.refresh_tasks)
+        await asyncio.gather(*tasks)
+        return served, tasks
+    served, tasks = asyncio.run(run())
+    assert served == [(200, old_url)] * (signed_url_cache.HOT_HITS + 1)
+    assert len(tasks) == 1 and len(requested) == 1 and signed_url_cache.stats["refreshes"] == 1
+    assert not signed_url_cache.refresh_tasks and not signed_url_cache.refreshing
+    assert asyncio.run(signed_url_cache.get_signed_url("token", href)) == (200, new_url)
+
+
+# Test: a safety margin as long as the URL lifetime is clamped, otherwise no URL would ever be served
+def test_safety_margin_is_clamped(monkeypatch):
+    monkeypatch.setenv("SIGNED_URL_MINUTES", "5")
+    monkeypatch.setenv("SIGNED_URL_SAFETY_MARGIN", "300")
+    try:
+        assert importlib.reload(signed_url_cache).SAFETY_MARGIN == 150
+    finally:
+        monkeypatch.undo()
+        importlib.reload(signed_url_cache)
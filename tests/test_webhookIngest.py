@@ -0,0 +1,185 @@
+# Import statements
+import asyncio  # For applying batches
+import hashlib  # For signing test bodies
+import hmac  # For signing test bodies
+import json  # For writing the test index
+from collections import OrderedDict  # For fresh pending and seen queues
+import pytest  # For fixtures and the parametrised cases
+import tools.searchExecutor as search_executor  # Worker search of the snapshots swapped in by the batches
+import tools.searchIndex as search_index  # Snapshots swapped in by the batches
+import tools.webhookIngest as webhook_ingest  # Module under test
+
+# Project of the test index, and the storage href of every version
+PROJECT_ID = "b.project-1"
+HREF = "https://developer.api.autodesk.com/oss/v2/buckets/wip.dm.prod/objects/{}.pdf"
+
+
+# Fixture: an index directory with a manifest and one shard holding version 1 of item-1
+@pytest.fixture
+def index_dir(tmp_path):
+    (tmp_path / "shards").mkdir()
+    row = {"file_name": "A-101.pdf", "href": HREF.format("item-1-v1"), "hub_id": "b.hub", "hub_name": "Hub", "project_id": PROJECT_ID,
+           "project_name": "Tower A", "folder_id": "folder-1", "folder_path": "Project Files", "item_id": "item-1", "version": 1,
+           "extension": "pdf", "file_name_embedding": [1.0, 0.0]}
+    (tmp_path / "shards" / "b.project-1.json").write_text(json.dumps([row]))
+    manifest = {"shards": [{"shard": "shards/b.project-1.json", "hub_id": "b.hub", "hub_name": "Hub", "project_id": PROJECT_ID,
+                            "project_name": "Tower A", "file_count": 1, "extensions": ["pdf"]}]}
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+    return str(tmp_path)
+
+
+# Function to build a change as parse_event() does
+def change(op, item_id, version, file_name="A-101.pdf", folder_path="Project Files", event_time=None):
+    return {"op": op, "item_id": item_id, "version": version, "file_name": file_name, "source": None,
+            "href": HREF.format(f"{item_id}-v{version}"), "hub_id": "b.hub", "project_id": PROJECT_ID, "folder_id": "folder-1",
+            "folder_path": folder_path, "event_time": event_time, "received": 0.0}
+
+
+# Function to plan and write one batch, new rows get a placeholder embedding; returns the counts and the rows after the batch
+def apply(index_dir, *changes):
+    manifest, shards, tombstones, to_embed, counts = webhook_ingest.plan_batch(list(changes), index_dir)
+    for row in to_embed:
+        row["file_name_embedding"] = [0.0, 1.0]
+    webhook_ingest.write_batch(manifest, shards, tombstones, index_dir)
+    with open(f"{index_dir}/shards/b.project-1.json") as file:
+        return counts, {row["item_id"]: row for row in json.load(file)}
+
+
+# Test: a new file is added and embedded, applying it again changes nothing
+def test_upsert_is_idempotent(index_dir):
+    counts, rows = apply(index_dir, change("upsert", "item-2", 1, "S-201.pdf"))
+    assert counts == {"upserts": 1, "deletes": 0, "unchanged": 0} and rows["item-2"]["file_name_embedding"] == [0.0, 1.0]
+    counts, _ = apply(index_dir, change("upsert", "item-2", 1, "S-201.pdf"))
+    assert counts == {"upserts": 0, "deletes": 0, "unchanged": 1}
+
+
+# Test: a new version keeps the previous tip as an older version and reuses the embedding of the unchanged name
+def test_new_version_keeps_history(index_dir):
+    _, rows = apply(index_dir, change("upsert", "item-1", 2))
+    assert rows["item-1"]["version"] == 2 and rows["item-1"]["file_name_embedding"] == [1.0, 0.0]
+    assert rows["item-1"]["versions"] == [{"version": 1, "file_name": "A-101.pdf", "href": HREF.format("item-1-v1")}]
+
+
+# Test: a move changes the folder of the row, an older version arriving late does not replace the tip
+def test_move_and_late_older_version(index_dir):
+    _, rows = apply(index_dir, change("upsert", "item-1", 1, folder_path="Project Files/Moved"))
+    assert rows["item-1"]["folder_path"] == "Project Files/Moved"
+    apply(index_dir, change("upsert", "item-1", 3))
+    counts, rows = apply(index_dir, change("upsert", "item-1", 2))
+    assert counts["unchanged"] == 1 and rows["item-1"]["version"] == 3
+
+
+# Test: a deleted item stays deleted when an upsert of the deleted or an older version arrives late
+def test_late_upsert_after_delete(index_dir):
+    counts, rows = apply(index_dir, change("delete", "item-1", 2), change("upsert", "item-2", 1, "S-201.pdf"))
+    assert counts["deletes"] == 1 and "item-1" not in rows
+    for version in (1, 2):
+        counts, rows = apply(index_dir, change("upsert", "item-1", version))
+        assert counts["unchanged"] == 1 and "item-1" not in rows
+
+
+# Test: a deletion that arrives before the item was indexed still stops its late upsert, a newer version restores the item
+def test_delete_before_upsert(index_dir):
+    apply(index_dir, change("delete", "item-3", 1))
+    counts, rows = apply(index_dir, change("upsert", "item-3", 1, "M-301.pdf"))
+    assert counts["unchanged"] == 1 and "item-3" not in rows
+    counts, rows = apply(index_dir, change("upsert", "item-3", 2, "M-301.pdf"))
+    assert counts["upserts"] == 1 and rows["item-3"]["version"] == 2
+    assert "item-3" not in webhook_ingest.load_tombstones(index_dir)
+
+
+# Test: a deletion older than the version in the index changes nothing
+def test_stale_delete(index_dir):
+    apply(index_dir, change("upsert", "item-1", 3))
+    counts, rows = apply(index_dir, change("delete", "item-1", 2))
+    assert counts["unchanged"] == 1 and rows["item-1"]["version"] == 3
+
+
+# Test: batches applied back to back swap in new snapshots while a search still holds an older one, its shared memory
+# stays attached and the workers score it as before
+def test_batches_while_a_search_holds_the_old_snapshot(index_dir, monkeypatch):
+    async def embed_queries(texts):
+        return [[0.0, 1.0] for _ in texts]
+    monkeypatch.setattr(webhook_ingest.embeddings, "embed_queries", embed_queries)
+    monkeypatch.setattr(webhook_ingest.folder_tree, "add_file", lambda row: None)
+    monkeypatch.setattr(webhook_ingest.folder_tree, "remove_file", lambda item_id: None)
+    monkeypatch.setattr(webhook_ingest, "stats", dict(webhook_ingest.stats))
+    monkeypatch.setattr(search_index, "current_snapshot", None)
+    monkeypatch.setattr(search_executor, "MIN_PARALLEL_ROWS", 0)
+
+    search_executor.start(2)
+    try:
+        search_index.refresh_index(index_dir)
+        held = search_index.current_snapshot
+        for number in (2, 3):
+            asyncio.run(webhook_ingest.apply_batch([change("upsert", f"item-{number}", 1, f"S-20{number}.pdf")], index_dir))
+        assert search_index.current_snapshot is not held and search_index.current_snapshot.file_count == 3
+
+        matches = asyncio.run(search_executor.search([1.0, 0.0], top_k=3, threshold=-1, snapshot=held))
+        assert [match["file_name"] for match in matches] == ["A-101.pdf"]
+        matches = asyncio.run(search_executor.search([0.0, 1.0], top_k=3, threshold=-1))
+        assert sorted(match["file_name"] for match in matches) == ["A-101.pdf", "S-202.pdf", "S-203.pdf"]
+    finally:
+        search_executor.shutdown()
+
+
+# Fixture: empty queues and counters for accept()
+@pytest.fixture
+def queues(monkeypatch):
+    monkeypatch.setattr(webhook_ingest, "pending", OrderedDict())
+    monkeypatch.setattr(webhook_ingest, "seen", OrderedDict())
+    monkeypatch.setattr(webhook_ingest, "stats", dict(webhook_ingest.stats, received=0, duplicates=0, ignored=0))
+    monkeypatch.setattr(webhook_ingest, "wakeup", None)
+    monkeypatch.setattr(webhook_ingest, "ALLOW_UNSIGNED", True)
+
+
+# Function to build a webhook event of one version
+def event(name, item_id, version, time="2026-10-19T10:00:00+0000"):
+    return {"hook": {"event": name}, "payload": {"lineageUrn": item_id, "version": str(version), "name": "A-101.pdf", "project": "project-1",
+                                                 "tenant": "hub", "storage": HREF.format(f"{item_id}-v{version}"), "modifiedTime": time}}
+
+
+# Test: of two events of one item waiting in the same batch the newer one is applied, whatever order they arrived in
+@pytest.mark.parametrize("first, second, op, version", [
+    (event("dm.version.added", "item-1", 2), event("dm.version.deleted", "item-1", 1), "upsert", 2),
+    (event("dm.version.deleted", "item-1", 2), event("dm.version.added", "item-1", 1), "delete", 2),
+    (event("dm.version.deleted", "item-1", 2), event("dm.version.added", "item-1", 3), "upsert", 3),
+    (event("dm.version.moved", "item-1", 2, "2026-10-19T10:05:00+0000"), event("dm.version.added", "item-1", 2), "upsert", 2),
+    (event("dm.version.added", "item-1", 2), event("dm.version.deleted", "item-1", 2), "delete", 2),
+])
+def test_accept_orders_by_version_and_time(queues, first, second, op, version):
+    webhook_ingest.accept([first, second])
+    queued = webhook_ingest.pending["item-1"]
+    assert (queued["op"], queued["version"]) == (op, version)
+    if first["hook"]["event"] == "dm.version.moved":
+        assert queued["event_time"] == webhook_ingest.event_time(first["payload"])
+
+
+# Test: a repeated delivery is dropped
+def test_accept_drops_repeated_deliveries(queues):
+    assert webhook_ingest.accept([event("dm.version.added", "item-1", 1)] * 2) == 1
+    assert webhook_ingest.stats["duplicates"] == 1
+
+
+# Test: without a secret only the local testing opt-in accepts calls, with a secret only correctly signed calls are accepted
+def test_verify_signature(monkeypatch):
+    body = b'{"hook": {}}'
+    monkeypatch.setattr(webhook_ingest, "WEBHOOK_SECRET", "")
+    monkeypatch.setattr(webhook_ingest, "ALLOW_UNSIGNED", False)
+    assert not webhook_ingest.verify_signature(body, None)
+    monkeypatch.setattr(webhook_ingest, "ALLOW_UNSIGNED", True)
+    assert webhook_ingest.verify_signature(body, None)
+
+    monkeypatch.setattr(webhook_ingest, "WEBHOOK_SECRET", "secret")
+    signature = "sha1hash=" + hmac.new(b"secret", body, hashlib.sha1).hexdigest()
+    assert webhook_ingest.verify_signature(body, signature)
+    assert not webhook_ingest.verify_signature(body, None)
+    assert not webhook_ingest.verify_signature(body + b" ", signature)
+
+
+# Test: the storage href of a payload is only trusted under the local testing opt-in
+def test_storage_only_trusted_under_the_opt_in(monkeypatch):
+    monkeypatch.setattr(webhook_ingest, "ALLOW_UNSIGNED", False)
+    assert webhook_ingest.parse_event(event("dm.version.added", "item-1", 1))["href"] is None
+    monkeypatch.setattr(webhook_ingest, "ALLOW_UNSIGNED", True)
+    assert webhook_ingest.parse_event(event("dm.version.added", "item-1", 1))["href"] == HREF.format("item-1-v1")
@@ -0,0 +1,140 @@
+# Import statements
+import asyncio  # For listing the projects of all hubs at the same time
+import os  # For reading the cache settings from environment variables
+import time  # For expiring the project lists of users
+import numpy as np  # For the per-user row bitmaps
+import tools.singleFlight as single_flight  # Coalesced Autodesk requests and access token fingerprints
+
+# Seconds the project list of a user is trusted before it is listed again, new project memberships show up after this
+ACCESS_TTL = int(os.getenv('ACCESS_TTL', '900'))
+
+# Number of users whose access is kept
+CACHE_SIZE = 256
+
+# Statuses of a failed listing that say nothing about the user's access (throttling and server errors)
+# Any other failure, above all 401 and 403 for an expired, revoked or bogus token, means no project can be opened
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+# Access of each user, least recently listed first:
+# token fingerprint -> {"projects": set of project ids, "listed": time, "version": index version of "access", "access": see build_access()}
+users = {}
+
+# Told to the user when the projects could not be listed and none were listed before, the search is refused until they can be
+UNVERIFIED_MESSAGE = "The projects you can open could not be verified right now, please try again in a moment."
+
+# Counters: access maps built for a user and index version, searches reusing one, searches using the last project list
+# because listing again failed transiently, searches refused because no project list could be had at all,
+# and searches of users who can open no project (or whose token was rejected or missing)
+stats = {"built": 0, "reused": 0, "stale": 0, "unverified": 0, "denied": 0}
+
+
+# Function to read every page of a Data Management listing, returns (status, data) with None as data when a page fails
+async def list_pages(group, endpoint, access_token):
+    data = []
+    while endpoint:
+        status, page = await single_flight.get_json(group, endpoint, access_token)
+        if status != 200:
+            return status, None
+        data.extend(page.get("data", []))
+        endpoint = page.get("links", {}).get("next", {}).get("href")
+    return 200, data
+
+
+# Function to list the ids of every project the user can open, over all hubs the user can list
+# None when a listing failed transiently, an empty set when the token was rejected
+async def list_projects(access_token):
+    status, hubs = await list_pages("hubs", 'https://developer.api.autodesk.com/project/v1/hubs', access_token)
+    if hubs is None:
+        return None if status in TRANSIENT_STATUSES else set()
+    listings = await asyncio.gather(*[
+        list_pages("projects", f'https://developer.api.autodesk.com/project/v1/hubs/{hub["id"]}/projects', access_token)
+        for hub in hubs
+    ])
+
+    projects = set()
+    for status, listing in listings:
+        if listing is None:
+            # A hub missing for a transient reason would hide files the user can open, so a partial listing is not used
+            if status in TRANSIENT_STATUSES:
+                return None
+            if status == 401:
+                return set()
+            # The user may not list the projects of this hub (403, 404), so none of them can be opened
+            continue
+        projects.update(project["id"] for project in listing)
+    return projects
+
+
+# Function to build the access map of a user for one snapshot: id(shard meta) -> None when every row of the shard is accessible,
+# or a row bitmap; shards the user cannot open are left out
+def build_access(snapshot, projects):
+    access = {}
+    for shard in snapshot.shards:
+        # Shards of one project are accessible as a whole or not at all
+        project_id = shard["meta"].get("project_id")
+        if project_id:
+            if project_id in projects:
+                access[id(shard["meta"])] = None
+            continue
+
+        # Unscoped shards (the legacy single-file index) hold rows of many projects, the project bitmaps pick the user's rows
+        # Rows without a project id carry no access information and stay searchable
+        allowed = np.zeros(len(shard["catalog"]), dtype=bool)
+        for row_project, bitmap in shard["facets"]["project"].items():
+            if not row_project or row_project in projects:
+                allowed |= bitmap
+        if allowed.all():
+            access[id(shard["meta"])] = None
+        elif allowed.any():
+            access[id(shard["meta"])] = allowed
+    return access
+
+
+# Function to get the ids of the projects the user can open, listed once per token and ACCESS_TTL
+# When listing again fails transiently the last list is used until a listing succeeds
+# None when they cannot be listed for now and were never listed, an empty set when the user can open no project
+# or the token was rejected
+async def get_projects(access_token):
+    if not access_token:
+        return set()
+    fingerprint = single_flight.token_fingerprint(access_token)
+    user = users.get(fingerprint)
+    if user is None or time.monotonic() - user["listed"] > ACCESS_TTL:
+        projects = await single_flight.run("access_projects", fingerprint, lambda: list_projects(access_token))
+        if projects is None:
+            # "listed" is left as it was, so the next search lists again
+            if user is not None:
+                stats["stale"] += 1
+                return user["projects"]
+            return None
+        users.pop(fingerprint, None)
+        user = users[fingerprint] = {"projects": projects, "listed": time.monotonic(), "version": None, "access": None}
+        while len(users) > CACHE_SIZE:
+            users.pop(next(iter(users)))
+    return user["projects"]
+
+
+# Function to get the access map of the user for a snapshot, an empty map when nothing may be searched;
+# the map is built once per token and index version
+# Raises PermissionError with UNVERIFIED_MESSAGE when the projects of the user could not be listed, the search is refused
+# rather than ranking files of projects the user may not open
+async def get_access(access_token, snapshot):
+    projects = await get_projects(access_token)
+    if projects is None:
+        stats["unverified"] += 1
+        raise PermissionError(UNVERIFIED_MESSAGE)
+    if not projects:
+        # Fail closed: a rejected or missing token must not see the files of every project, not even the unscoped rows
+        stats["denied"] += 1
+        return {}
+    if snapshot is None:
+        return {}
+
+    user = users[single_flight.token_fingerprint(access_token)]
+    if user["version"] != snapshot.version:
+        user["access"] = build_access(snapshot, projects)
+        user["version"] = snapshot.version
+        stats["built"] += 1
+    else:
+        stats["reused"] += 1
+    return user["access"]
@@ -0,0 +1,259 @@
+# Import statements
+import asyncio  # For running the listings and downloads concurrently
+import os  # For building download paths and reading the limits from environment variables
+import re  # For replacing characters that are not allowed in local file names
+import tempfile  # For spooling files that are added to a zip archive
+import time  # For the bandwidth budget and throughput figures
+import zipfile  # For the optional single archive of the whole subtree
+import tools.httpSession as http_session  # Shared connection pool, also used for the S3 downloads
+import tools.jsonStream as json_stream  # Streaming, field-projecting parser for folder listings
+import tools.rateLimiter as rate_limiter  # Rate-limited, retrying access to the Autodesk APIs
+import tools.signedUrlCache as signed_url_cache  # Signed download URLs shared with the single-file tools
+import tools.singleFlight as single_flight  # Coalesces identical concurrent listings
+
+# Files downloaded at the same time, and the total download bandwidth in bytes per second (0 for unlimited)
+DOWNLOAD_CONCURRENCY = int(os.getenv('DOWNLOAD_CONCURRENCY', '6'))
+DOWNLOAD_BANDWIDTH = int(os.getenv('DOWNLOAD_BANDWIDTH', '0'))
+
+# Folder listings running at the same time while the subtree is expanded
+LISTING_CONCURRENCY = 4
+
+# Objects per batch signed URL request, the OSS batch endpoint accepts up to 25
+SIGNED_URL_BATCH = 25
+
+# Attempts per file before it is reported as failed, and seconds between progress lines
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL = 2
+
+# Size of the chunks read from S3
+CHUNK_SIZE = 256 * 1024
+
+# Characters not allowed in a local file or folder name: path separators, characters Windows rejects and control characters
+UNSAFE_CHARACTERS = re.compile(r'[/\\:*?"<>|\x00-\x1f]')
+
+
+# Shared byte budget of all downloads of a job, a token bucket refilled at the allowed bandwidth
+class BandwidthBudget:
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self.tokens = float(bytes_per_second)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    # Wait until the given number of bytes may be read
+    async def consume(self, size):
+        if not self.rate:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= size
+            if self.tokens < 0:
+                await asyncio.sleep(-self.tokens / self.rate)
+
+
+# Function to turn a folder or file name from the API (or the user) into one safe path component
+# Separators are replaced and "." or ".." cannot remain, so no name can point outside the download folder
+def safe_name(name):
+    name = UNSAFE_CHARACTERS.sub("_", name or "").strip().rstrip(". ")
+    return name if name.strip(".") else "_"
+
+
+# Function to make the local paths of the files unique, a second "Plan.pdf" in the same folder becomes "Plan (2).pdf"
+# Paths are compared ignoring case, as Windows and macOS file systems do
+def make_paths_unique(files):
+    taken = set()
+    for file in files:
+        stem, extension = os.path.splitext(file["path"])
+        path, number = file["path"], 1
+        while path.lower() in taken:
+            number += 1
+            path = f"{stem} ({number}){extension}"
+        taken.add(path.lower())
+        file["path"] = path
+
+
+# Function to list every file below a folder, returns dicts with file_name, path (relative to the folder), size and href
+async def expand_subtree(access_token, project_id, folder_id):
+    semaphore = asyncio.Semaphore(LISTING_CONCURRENCY)
+    files, failed = {}, []
+
+    async def list_folder(current_id, path):
+        endpoint = f'https://developer.api.autodesk.com/data/v1/projects/{project_id}/folders/{current_id}/contents'
+        subfolders = []
+        while endpoint:
+            async with semaphore:
+                status, listing = await single_flight.get_json("folder_listing", endpoint, access_token, parse=json_stream.read_listing)
+            if status != 200:
+                failed.append(path or "/")
+                return
+            for item in listing["data"]:
+                if item["type"] == "folders":
+                    name = safe_name(item["name"] or item["display_name"] or "Unnamed Folder")
+                    subfolders.append(list_folder(item["id"], f"{path}/{name}" if path else name))
+
+            # One file per item, its newest version wins
+            for version in listing["included"]:
+                key = version["item_id"] or version["href"]
+                if version["href"] and (key not in files or (version["version"] or 0) > (files[key]["version"] or 0)):
+                    name = safe_name(version["file_name"])
+                    files[key] = {"file_name": version["file_name"], "path": f"{path}/{name}" if path else name,
+                                  "size": version["size"] or 0, "href": version["href"], "version": version["version"]}
+            endpoint = listing["next"]
+        await asyncio.gather(*subfolders)
+
+    await list_folder(folder_id, "")
+
+    # Listing order is not stable, sorting first gives every duplicate name the same suffix on every run
+    files = sorted(files.values(), key=lambda file: file["path"].lower())
+    make_paths_unique(files)
+    return files, failed
+
+
+# Function to request signed S3 URLs for many files at once, one batch request per SIGNED_URL_BATCH objects of a bucket
+# Files whose URL is still in tools/signedUrlCache.py are not signed again, new URLs are added to the cache
+async def sign_files(access_token, files):
+    fingerprint = single_flight.token_fingerprint(access_token)
+    by_bucket = {}
+    for file in files:
+        bucket_key, object_key = signed_url_cache.object_keys(file["href"])
+        entry = signed_url_cache.lookup((bucket_key, object_key, fingerprint))
+        if entry is not None:
+            file["url"] = entry["url"]
+            continue
+        by_bucket.setdefault(bucket_key, []).append((object_key, file))
+
+    async def sign_batch(bucket_key, batch):
+        endpoint = (f"https://developer.api.autodesk.com/oss/v2/buckets/{bucket_key}/objects/batchsigneds3download"
+                    f"?minutesExpiration={signed_url_cache.SIGNED_URL_MINUTES}")
+        body = {"requests": [{"objectKey": object_key} for object_key, _ in batch]}
+        headers = {'Authorization': f'Bearer {access_token}'}
+        signed_at = time.monotonic()
+        async with rate_limiter.request("POST", endpoint, json=body, headers=headers) as response:
+            results = (await response.json()).get("results", {}) if response.status == 200 else {}
+        for object_key, file in batch:
+            result = results.get(object_key, {})
+            file["url"] = result.get("url") if result.get("status") == "complete" else None
+            if file["url"]:
+                signed_url_cache.put((bucket_key, object_key, fingerprint), file["url"], signed_at)
+
+    await asyncio.gather(*[
+        sign_batch(bucket_key, entries[start:start + SIGNED_URL_BATCH])
+        for bucket_key, entries in by_bucket.items()
+        for start in range(0, len(entries), SIGNED_URL_BATCH)
+    ])
+
+
+# Function to download every file below a folder, smallest files first
+# Files are written under destination keeping the folder structure, or into destination/<folder name>.zip when zip_archive is set
+async def download_subtree(access_token, project_id, folder_id, folder_name, destination="downloads", zip_archive=False,
+                           concurrency=DOWNLOAD_CONCURRENCY, bandwidth=DOWNLOAD_BANDWIDTH):
+    start = time.perf_counter()
+    files, failed_listings = await expand_subtree(access_token, project_id, folder_id)
+    files.sort(key=lambda file: file["size"])
+    await sign_files(access_token, files)
+
+    total_bytes = sum(file["size"] for file in files)
+    progress = {"files": 0, "bytes": 0, "retries": 0, "failed": [], "printed": time.monotonic()}
+    budget = BandwidthBudget(bandwidth)
+    session = http_session.get_session()
+    os.makedirs(destination, exist_ok=True)
+    local_name = safe_name(folder_name)
+
+    # A single archive is written by one file at a time, downloads spool to temporary files until it is their turn
+    archive = zipfile.ZipFile(os.path.join(destination, f"{local_name}.zip"), "w", zipfile.ZIP_STORED) if zip_archive else None
+    archive_lock = asyncio.Lock()
+
+    def report(final=False):
+        elapsed = time.perf_counter() - start
+        print(f"[download] {progress['files']}/{len(files)} files, {progress['bytes'] / 2**20:.1f}/{total_bytes / 2**20:.1f} MB, "
+              f"{progress['bytes'] / 2**20 / elapsed if elapsed else 0:.2f} MB/s" + (f", {elapsed:.1f}s" if final else ""))
+
+    # Bytes are counted as they arrive for the progress line, received holds those of the current attempt
+    async def fetch(file, output, received):
+        async with session.get(file["url"]) as response:
+            if response.status != 200:
+                return response.status
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                await budget.consume(len(chunk))
+                await asyncio.to_thread(output.write, chunk)
+                progress["bytes"] += len(chunk)
+                received["bytes"] += len(chunk)
+        return 200
+
+    async def download(file, semaphore):
+        async with semaphore:
+            for attempt in range(MAX_ATTEMPTS):
+                received, status = {"bytes": 0}, None
+                try:
+                    # A missing or expired signed URL is requested again before retrying
+                    if not file.get("url") or attempt:
+                        signed_url_cache.forget(access_token, file["href"])
+                        await sign_files(access_token, [file])
+                    if file.get("url"):
+                        if archive is not None:
+                            with tempfile.SpooledTemporaryFile(max_size=8 * 2**20) as spool:
+                                status = await fetch(file, spool, received)
+                                if status == 200:
+                                    spool.seek(0)
+                                    async with archive_lock:
+                                        await asyncio.to_thread(write_to_archive, archive, file["path"], spool)
+                        else:
+                            path = os.path.join(destination, local_name, *file["path"].split("/"))
+                            os.makedirs(os.path.dirname(path), exist_ok=True)
+                            try:
+                                with open(path + ".part", "wb") as output:
+                                    status = await fetch(file, output, received)
+                                if status == 200:
+                                    os.replace(path + ".part", path)
+                            finally:
+                                # A failed attempt leaves no partial file behind
+                                if status != 200 and os.path.exists(path + ".part"):
+                                    os.remove(path + ".part")
+                        if status == 200:
+                            break
+                except Exception as e:
+                    print(f"[download] {file['path']}: {e}")
+
+                # The bytes of a failed attempt are downloaded again, only the successful attempt counts
+                progress["bytes"] -= received["bytes"]
+                progress["retries"] += 1
+                await asyncio.sleep(rate_limiter.backoff_delay(attempt))
+            else:
+                progress["failed"].append(file["path"])
+                progress["retries"] -= 1
+            progress["files"] += 1
+            if time.monotonic() - progress["printed"] > PROGRESS_INTERVAL:
+                progress["printed"] = time.monotonic()
+                report()
+
+    # Files are started in size order, so the many small files finish first and progress shows early
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        await asyncio.gather(*[download(file, semaphore) for file in files])
+    finally:
+        if archive is not None:
+            archive.close()
+    report(final=True)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "files": len(files) - len(progress["failed"]),
+        "failed": progress["failed"],
+        "failed_listings": failed_listings,
+        "retries": progress["retries"],
+        "bytes": progress["bytes"],
+        "seconds": elapsed,
+        "location": os.path.join(destination, f"{local_name}.zip" if zip_archive else local_name),
+    }
+
+
+# Function to copy a spooled download into the archive
+def write_to_archive(archive, name, spool):
+    with archive.open(name, "w", force_zip64=True) as entry:
+        while True:
+            chunk = spool.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            entry.write(chunk)
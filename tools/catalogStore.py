@@ -0,0 +1,213 @@
+# Import statements
+import os  # For deriving file extensions from file names
+import re  # For splitting OSS hrefs into a shared prefix, object key and scope suffix
+import uuid  # For storing the UUIDs inside object keys and item ids as 16 bytes
+from array import array  # Compact typed arrays for the per-row columns
+import numpy as np  # For zero-copy views of the code columns used when filtering
+
+# OSS hrefs look like https://developer.api.autodesk.com/oss/v2/buckets/<bucket>/objects/<key>?scopes=<project>,<tenant>
+# The prefix is shared by every file of a bucket and the suffix by every file of a project, so only the key is stored per row
+HREF_PATTERN = re.compile(r'^(.*/objects/)([^?]*)(\?.*)?$')
+
+
+# Column of repetitive strings stored once in a table, each row keeps a 4-byte code
+class CategoricalColumn:
+    __slots__ = ("strings", "ids", "codes")
+
+    def __init__(self):
+        self.strings = []  # code -> string
+        self.ids = {}  # string -> code
+        self.codes = array('I')  # row -> code
+
+    def append(self, value):
+        code = self.ids.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.ids[value] = code
+            self.strings.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, row_id):
+        return self.strings[self.codes[row_id]]
+
+    # Codes of all rows as a numpy array sharing the memory of the column
+    def code_array(self):
+        return np.frombuffer(self.codes, dtype=np.uint32) if len(self.codes) else np.zeros(0, dtype=np.uint32)
+
+
+# Column of mostly unique strings packed into one UTF-8 buffer with a 4-byte offset per row
+class PackedColumn:
+    __slots__ = ("buffer", "offsets")
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offsets = array('I', [0])
+
+    def append(self, value):
+        self.buffer += (value or "").encode("utf-8")
+        self.offsets.append(len(self.buffer))
+
+    def __getitem__(self, row_id):
+        return self.buffer[self.offsets[row_id]:self.offsets[row_id + 1]].decode("utf-8")
+
+
+# Column of identifiers built around a UUID, e.g. "<uuid>.pdf" object keys or "urn:adsk.wipprod:dm.lineage:<uuid>" item ids
+# The text around the UUID is shared between many rows and kept in tables, the UUID itself takes 16 bytes
+# Values without a UUID are kept as text
+class KeyColumn:
+    __slots__ = ("prefixes", "suffixes", "uuids", "text")
+
+    PATTERN = re.compile(r'^(.*?)([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})(.*)$')
+
+    def __init__(self):
+        self.prefixes = CategoricalColumn()
+        self.suffixes = CategoricalColumn()
+        self.uuids = bytearray()
+        self.text = {}  # row -> value, only for the rare values without a UUID
+
+    def append(self, value):
+        match = self.PATTERN.match(value or "")
+        if match:
+            self.prefixes.append(match.group(1))
+            self.suffixes.append(match.group(3))
+            self.uuids += uuid.UUID(match.group(2)).bytes
+        else:
+            # A None prefix marks a row stored as text
+            self.text[len(self.prefixes.codes)] = value
+            self.prefixes.append(None)
+            self.suffixes.append(None)
+            self.uuids += bytes(16)
+
+    def __getitem__(self, row_id):
+        prefix = self.prefixes[row_id]
+        if prefix is None:
+            return self.text[row_id]
+        return prefix + str(uuid.UUID(bytes=bytes(self.uuids[row_id * 16:row_id * 16 + 16]))) + self.suffixes[row_id]
+
+
+# Columnar store of catalog records, the row id of a record equals its row in the embedding matrix
+class CatalogStore:
+
+    # Fields that always change together share one categorical column, so each group costs one 4-byte code per row
+    GROUPS = {
+        "scope": ("hub_id", "hub_name", "project_id", "project_name", "href_prefix", "href_suffix"),
+        "folder": ("folder_id", "folder_path"),
+        "extension": ("extension",),
+    }
+    PACKED = ("file_name",)
+    KEYS = ("object_key", "item_id")
+
+    # Field -> (group, position of the field in the group's tuples)
+    FIELD_GROUPS = {field: (group, position) for group, fields in GROUPS.items() for position, field in enumerate(fields)}
+
+    def __init__(self):
+        self.columns = {name: CategoricalColumn() for name in self.GROUPS}
+        self.columns.update({name: PackedColumn() for name in self.PACKED})
+        self.columns.update({name: KeyColumn() for name in self.KEYS})
+        self.versions = array('i')
+
+        # Older versions of the rows that have any: row -> ((version, file_name, href), ...), newest first
+        # They are metadata only, the embedding matrix holds one row per document
+        self.history = {}
+
+    # Function to add one catalog record (the dict format written by extractFolderData.py) and return its row id
+    def append(self, record):
+        match = HREF_PATTERN.match(record["href"])
+        prefix, object_key, suffix = match.groups() if match else ("", record["href"], None)
+        extension = record.get("extension") or os.path.splitext(record["file_name"])[1].lstrip('.').lower()
+
+        values = dict(record, extension=extension, href_prefix=prefix, object_key=object_key, href_suffix=suffix or "")
+        for group, fields in self.GROUPS.items():
+            self.columns[group].append(tuple(values.get(field) for field in fields))
+        for name in self.PACKED + self.KEYS:
+            self.columns[name].append(values.get(name))
+        self.versions.append(record.get("version") or 0)
+        if record.get("versions"):
+            self.history[len(self.versions) - 1] = tuple(
+                (older.get("version") or 0, older["file_name"], older["href"]) for older in record["versions"]
+            )
+        return len(self.versions) - 1
+
+    def __len__(self):
+        return len(self.versions)
+
+    # Function to read one field of one row
+    def get(self, row_id, field):
+        if field == "href":
+            scope = self.columns["scope"][row_id]
+            return scope[4] + self.columns["object_key"][row_id] + scope[5]
+        if field == "version":
+            return self.versions[row_id] or None
+        if field in self.FIELD_GROUPS:
+            group, position = self.FIELD_GROUPS[field]
+            return self.columns[group][row_id][position]
+        return self.columns[field][row_id]
+
+    # Function to find the file name and href of one version of a row, None when the row has no such version
+    def get_version(self, row_id, version):
+        if self.versions[row_id] == version:
+            return self.get(row_id, "file_name"), self.get(row_id, "href")
+        for older_version, file_name, href in self.history.get(row_id, ()):
+            if older_version == version:
+                return file_name, href
+        return None
+
+    # Function to get a lightweight view of one row
+    def row(self, row_id):
+        return CatalogRow(self, row_id)
+
+
+# View of one catalog row, attributes are read from the columns on access so no per-row dict is kept
+class CatalogRow:
+    __slots__ = ("store", "row_id")
+
+    FIELDS = ("file_name", "href", "hub_id", "hub_name", "project_id", "project_name", "folder_id", "folder_path", "item_id", "version", "extension")
+
+    def __init__(self, store, row_id):
+        self.store = store
+        self.row_id = row_id
+
+    def __getattr__(self, field):
+        if field in CatalogRow.FIELDS:
+            return self.store.get(self.row_id, field)
+        raise AttributeError(field)
+
+    # Function to turn the row back into the dict format of the catalog files
+    def to_dict(self):
+        return {field: self.store.get(self.row_id, field) for field in CatalogRow.FIELDS}
+
+
+# Benchmark: memory per file of the catalog as a list of dicts versus the columnar store
+if __name__ == "__main__":
+    import tracemalloc
+
+    def synthetic_records(files=200000, projects=20, folders=400):
+        for i in range(files):
+            project = i % projects
+            yield {
+                "file_name": f"A-{i:06d} Level {i % 12} Floor Plan.pdf",
+                "href": f"https://developer.api.autodesk.com/oss/v2/buckets/wip.dm.prod/objects/{uuid.UUID(int=i)}.pdf?scopes=b360project.{uuid.UUID(int=project)},O2tenant.34579194",
+                "hub_id": "b.34579194", "hub_name": "Sunway Property",
+                "project_id": f"b.{uuid.UUID(int=project)}", "project_name": f"Project {project}",
+                "folder_id": f"urn:adsk.wipprod:fs.folder:co.{i % folders:022d}", "folder_path": f"Project Files/Area {i % folders // 20}/Folder {i % folders}",
+                "item_id": f"urn:adsk.wipprod:dm.lineage:{uuid.UUID(int=i)}", "version": 1 + i % 3, "extension": "pdf"
+            }
+
+    def measure(label, build):
+        tracemalloc.start()
+        catalog = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{label:<16} {size / 2**20:8.1f} MB  {size / len(catalog):7.1f} bytes per file")
+        return catalog
+
+    def build_store():
+        store = CatalogStore()
+        for record in synthetic_records():
+            store.append(record)
+        return store
+
+    # Both catalogs are built from the same generator; the dict version keeps every record as the JSON loader would
+    dicts = measure("list of dicts", lambda: [dict(record) for record in synthetic_records()])
+    store = measure("CatalogStore", build_store)
+    assert store.row(123456).to_dict() == dicts[123456]
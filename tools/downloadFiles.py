@@ -1,7 +1,15 @@
 # Import statements
 import os
-import aiohttp
-from urllib.parse import urlparse, unquote  # To parse URLs and decode URL-encoded strings
+import re  # For reading the listing ids out of the tool outputs the assistant passes back
+import tools.rateLimiter as rate_limiter  # Rate-limited, retrying access to the Autodesk and OpenAI APIs
+import tools.singleFlight as single_flight  # Coalesces identical concurrent requests into one upstream call
+import tools.prefetch as prefetch  # Prefetches the likely next listings while the user reads the current one
+import tools.jsonStream as json_stream  # Streaming, field-projecting parser for folder listings
+import tools.folderTree as folder_tree  # Locally cached folder tree for direct path navigation
+import tools.promptCache as prompt_cache  # Persistent cache of the answers to the id lookups below
+import tools.bulkDownload as bulk_download  # Concurrent download of whole folder subtrees
+import tools.signedUrlCache as signed_url_cache  # Signed download URLs reused until shortly before they expire
+import tools.accessScope as access_scope  # Projects the user can open, path matches are limited to them
 from dotenv import load_dotenv  # Load environment variables from a .env file.
 from langchain_core.tools import tool  # Import the @tool decorator and the tool functionality from Langchain.
 from openai import OpenAI  # Import the OpenAI client for interacting with the OpenAI API
@@ -11,7 +19,47 @@ load_dotenv()
 
 # Retrieve OpenAI API key from the .env file
 openai_api_key = os.getenv('OPENAI_API_KEY')
-client = OpenAI(api_key=openai_api_key)
+client = OpenAI(api_key=openai_api_key, max_retries=0)  # Retries are handled by tools/rateLimiter.py
+
+# Model answering the id lookups
+LOOKUP_MODEL = "gpt-4o-mini"
+
+
+# Function to ask the LLM to pick one value out of a listing, e.g. the id of the hub with a given name
+# The answer only depends on the prompt, so repeated lookups are answered from tools/promptCache.py without calling the LLM
+# listing identifies the listing asked about, see listing_id()
+async def ask_llm(template, query, listing, prompt, max_tokens=300):
+    key = prompt_cache.make_key(LOOKUP_MODEL, max_tokens, prompt)
+    answer = prompt_cache.get(key)
+    if answer is not None:
+        return answer
+
+    response = await rate_limiter.call_openai(
+        "openai:chat",
+        client.chat.completions.create,
+        model=LOOKUP_MODEL,
+        messages=[
+            {"role": "system", "content": "You are an assistant."},
+            {"role": "user", "content": prompt},
+        ],
+        max_tokens=max_tokens
+    )
+    answer = response.choices[0].message.content
+    prompt_cache.put(key, template, query, listing, answer, response.usage.total_tokens if response.usage else 0)
+    return answer
+
+
+# Function to identify the listing a tool output describes by the hub or folder id the tool wrote into it, e.g. "folder:urn:..."
+# Falls back to a hash of the output when the id is missing, e.g. because the assistant passed on only part of it
+def listing_id(kind, data):
+    match = re.search(rf"'{kind}_id': '([^']+)'", data)
+    return f"{kind}:{match.group(1)}" if match else f"{kind}:{prompt_cache.digest(data)}"
+
+
+# Function to drop the cached answer to a prompt once the Autodesk request built from it failed,
+# otherwise a wrong or made-up id would fail the same way on every repeat of the lookup
+def forget_answer(prompt, max_tokens=300):
+    prompt_cache.forget(prompt_cache.make_key(LOOKUP_MODEL, max_tokens, prompt))
 
 
 # Tool to retrieve a list of hubs from ACC using the the Data Management API
@@ -30,34 +78,32 @@ async def agent_get_hubs(access_token: str):
     # Endpoint URL to fetch the hubs.
     endpoint = 'https://developer.api.autodesk.com/project/v1/hubs'
 
-    # Set the authorization header for the HTTP request using the provided access token.
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-    }
-
     # Asynchronously make a GET request to the Autodesk API to fetch all the hubs.
-    async with aiohttp.ClientSession() as session:
-        async with session.get(endpoint, headers=headers) as response:
-            if response.status == 200:
-                hubs_list = await response.json()
-
-                # Compress the response data to only include type, id, and name
-                compressed_data = {
-                    "hubs": [
-                        {
-                            "type": hub.get("type"),
-                            "id": hub.get("id"),
-                            "name": hub.get("attributes", {}).get("name", "Unnamed Hub")
-                        }
-                        for hub in hubs_list.get("data", [])
-                    ]
+    status, hubs_list = await single_flight.get_json("hubs", endpoint, access_token)
+    if status == 200:
+        # Compress the response data to only include type, id, and name
+        compressed_data = {
+            "hubs": [
+                {
+                    "type": hub.get("type"),
+                    "id": hub.get("id"),
+                    "name": hub.get("attributes", {}).get("name", "Unnamed Hub")
                 }
-
-                # Return a formatted string with compressed hub list
-                return f"list of available hubs, please choose one so I may proceed: \n {', '.join([hub['name'] for hub in compressed_data['hubs']])}" \
-                       f"\n\n\n\n\n{compressed_data}"
-            else:
-                return f"Error: Failed to retrieve hubs: " + str(response.status)
+                for hub in hubs_list.get("data", [])
+            ]
+        }
+
+        # Prefetch the projects of the likely hubs while the user chooses
+        prefetch.schedule(access_token, [
+            ("projects", f'https://developer.api.autodesk.com/project/v1/hubs/{hub["id"]}/projects', None)
+            for hub in compressed_data['hubs']
+        ])
+
+        # Return a formatted string with compressed hub list
+        return f"list of available hubs, please choose one so I may proceed: \n {', '.join([hub['name'] for hub in compressed_data['hubs']])}" \
+               f"\n\n\n\n\n{compressed_data}"
+    else:
+        return f"Error: Failed to retrieve hubs: " + str(status)
 
 # Tool to retrieve the contents of a specific hub from ACC using the the Data Management API
 @tool
@@ -84,51 +130,46 @@ async def agent_get_hubdata(access_token: str, hub_name: str, hubs_list: str) ->
     )
 
     # Query GPT to extract hub_id
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an assistant."},
-            {"role": "user", "content": prompt},
-        ],
-        max_tokens=500
-    )
-
-    # Access the response from GPT and retrieve the hub_id
-    hub_id = response.choices[0].message.content
+    # The hubs listing is the one of this user
+    hub_id = await ask_llm("hub_id", hub_name, f"hubs:{single_flight.token_fingerprint(access_token)}", prompt, max_tokens=500)
 
     # Endpoint URL to fetch the contents of the hub using the hub ID.
     endpoint = f'https://developer.api.autodesk.com/project/v1/hubs/{hub_id}/projects'
 
-    # Set the authorization header for the HTTP request using the provided access token.
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-
     # Asynchronously make a GET request to the Autodesk API to fetch hub contents.
-    async with aiohttp.ClientSession() as session:
-        async with session.get(endpoint, headers=headers) as response:
-            if response.status == 200:
-                hubs_data = await response.json()
-
-                # Compress the data to only include type, id, and name for each project
-                compressed_data = {
-                    "projects": [
-                        {
-                            "type": project.get("type"),
-                            "id": project.get("id"),
-                            "name": project.get("attributes", {}).get("name", "Unnamed Project"),
-                            "projectid": project.get("relationships", {}).get("rootFolder", {}).get("data", {}).get("id")
-                        }
-                        for project in hubs_data.get("data", [])
-                    ]
+    status, hubs_data = await prefetch.get_json("projects", endpoint, access_token)
+    if status == 200:
+        # Compress the data to only include type, id, and name for each project
+        compressed_data = {
+            "hub_id": hub_id,
+            "projects": [
+                {
+                    "type": project.get("type"),
+                    "id": project.get("id"),
+                    "name": project.get("attributes", {}).get("name", "Unnamed Project"),
+                    "projectid": project.get("relationships", {}).get("rootFolder", {}).get("data", {}).get("id")
                 }
-
-                # Return a formatted string with compressed project data
-                project_names = [project['name'] for project in compressed_data['projects']]
-                return f"list of available projects currently within the hub {hub_name}, please choose one so I may proceed: \n {', '.join(project_names)}" \
-                       f"\n\n\n\n\n{compressed_data}"
-            else:
-                return f"error: Failed to retrieve hub data: {response.status}"
+                for project in hubs_data.get("data", [])
+            ]
+        }
+
+        # Remember the projects and their root folders for direct path navigation
+        for project in compressed_data['projects']:
+            folder_tree.add_project(project['id'], project['name'], project['projectid'])
+
+        # Prefetch the root folders of the likely projects while the user chooses
+        prefetch.schedule(access_token, [
+            ("folder_listing", f'https://developer.api.autodesk.com/data/v1/projects/{project["id"]}/folders/{project["projectid"]}/contents', json_stream.read_listing)
+            for project in compressed_data['projects'] if project['projectid']
+        ])
+
+        # Return a formatted string with compressed project data
+        project_names = [project['name'] for project in compressed_data['projects']]
+        return f"list of available projects currently within the hub {hub_name}, please choose one so I may proceed: \n {', '.join(project_names)}" \
+               f"\n\n\n\n\n{compressed_data}"
+    else:
+        forget_answer(prompt, max_tokens=500)
+        return f"error: Failed to retrieve hub data: {status}"
 
 # Tool to retrieve the list of root folders from ACC using the the Data Management API
 @tool
@@ -155,16 +196,7 @@ async def agent_get_rootfolder(access_token: str, project_name: str, hubs_data:
     )
 
     # Query the LLM for the project id based on the provided project name.
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an assistant."},
-            {"role": "user", "content": prompt1},
-        ],
-        max_tokens=300
-    )
-    # Access the response and retrieve the project id from the LLM output.
-    project_id = response.choices[0].message.content
+    project_id = await ask_llm("project_id", project_name, listing_id("hub", hubs_data), prompt1)
 
     # The prompt asks the model to extract the 'projectid' value based on the 'project_id' extracted in the first step.
     prompt2 = (
@@ -175,59 +207,116 @@ async def agent_get_rootfolder(access_token: str, project_name: str, hubs_data:
     )
 
     # Query the LLM again to retrieve the 'projectid' value for the specific project id.
-    response1 = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an assistant."},
-            {"role": "user", "content": prompt2},
-        ],
-        max_tokens=300
-    )
-    # Access the response and retrieve the root folder id based on the project id.
-    root_folder_id = response1.choices[0].message.content
+    root_folder_id = await ask_llm("root_folder_id", project_id, listing_id("hub", hubs_data), prompt2)
 
     # Endpoint URL to fetch the contents of the root folder using the project and root folder IDs.
     endpoint = f'https://developer.api.autodesk.com/data/v1/projects/{project_id}/folders/{root_folder_id}/contents'
 
-    # Set the authorization header for the HTTP request using the provided access token.
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-
     # Asynchronously make a GET request to the Autodesk API to fetch root folder contents.
-    async with aiohttp.ClientSession() as session:
-        async with session.get(endpoint, headers=headers) as response:
-            if response.status == 200:
-                folder_data = await response.json()
-
-                # Compress the folder data to include only necessary fields: type, id, folder name, and parent folder id.
-                compressed_data = {
-                    "folders": [
-                        {
-                            "type": folder.get("type"),
-                            "id": folder.get("id"),
-                            "folder_name": folder.get("attributes", {}).get("name", "Unnamed Folder"),
-                            "parent_id": folder.get("relationships", {}).get("parent", {}).get("data", {}).get("id")
-                        }
-                        for folder in folder_data.get("data", [])
-                    ]
+    # The listing is projected onto the needed fields while it is decoded, see tools/jsonStream.py
+    status, folder_data = await prefetch.get_json("folder_listing", endpoint, access_token, parse=json_stream.read_listing)
+    if status == 200:
+        # Compress the folder data to include only necessary fields: type, id, folder name, and parent folder id.
+        compressed_data = {
+            "folder_id": root_folder_id,
+            "folders": [
+                {
+                    "type": folder["type"],
+                    "id": folder["id"],
+                    "folder_name": folder["name"] or "Unnamed Folder",
+                    "parent_id": folder["parent_id"]
                 }
+                for folder in folder_data["data"]
+            ]
+        }
+
+        # Remember the root folders for direct path navigation
+        folder_tree.add_listing(root_folder_id, folder_data)
+
+        # Prefetch the contents of the likely folders while the user chooses
+        prefetch.schedule(access_token, [
+            ("folder_listing", f'https://developer.api.autodesk.com/data/v1/projects/{project_id}/folders/{folder["id"]}/contents', json_stream.read_listing)
+            for folder in compressed_data['folders'] if folder['type'] == 'folders'
+        ])
+
+        # Extract folder names from the compressed data.
+        folder_names = [folder["folder_name"] for folder in compressed_data["folders"]]
+
+        # Join the folder names into a single string, separated by commas.
+        formatted_folder_names = ", ".join(folder_names)
+
+        # Return a formatted string with compressed folder data.
+        return (f"list of available Root Folders, please choose one from the list: \n{formatted_folder_names}"
+                f"\n \n \n \n \n{project_id}"
+                f"\n{compressed_data}")
+    else:
+        forget_answer(prompt1)
+        forget_answer(prompt2)
+        return f"error: Failed to retrieve root folder: {status}"
+
+# Function to list a folder by id and format its contents, shared by agent_get_foldercontents() and agent_find_path()
+async def list_folder(access_token, project_id, folder_id, folder_name):
+    # Endpoint URL to fetch the contents of the folder using the project and folder IDs.
+    endpoint = f'https://developer.api.autodesk.com/data/v1/projects/{project_id}/folders/{folder_id}/contents'
 
-                # Extract folder names from the 'data' section of the JSON response.
-                folder_names = [
-                    folder.get("attributes", {}).get("name", "Unnamed Folder")
-                    for folder in folder_data.get("data", [])
-                ]
-
-                # Join the folder names into a single string, separated by commas.
-                formatted_folder_names = ", ".join(folder_names)
+    # Asynchronously make a GET request to the Autodesk API to fetch folder contents.
+    # The listing is projected onto the needed fields while it is decoded, see tools/jsonStream.py
+    status, folder_contents = await prefetch.get_json("folder_listing", endpoint, access_token, parse=json_stream.read_listing)
+    if status == 200:
+        # Remember the subfolders and files for direct path navigation
+        folder_tree.add_listing(folder_id, folder_contents)
+
+        # Compress the response
+        compressed_data = {
+            "folder_id": folder_id,
+            "data": [
+                # Compress the folders section (only type, id, name)
+                {"type": item["type"], "id": item["id"], "name": item["name"]}
+                for item in folder_contents["data"]
+                if item["type"] == "folders"  # Only folders
+            ],
+            "included": [
+                # Compress the included section (only id, name, href under storage->meta->link)
+                {"id": item["id"], "file_name": item["file_name"], "href": item["href"] or "No link available"}
+                for item in folder_contents["included"]
+            ]
+        }
+
+        # Prefetch the contents of the likely subfolders while the user chooses
+        prefetch.schedule(access_token, [
+            ("folder_listing", f'https://developer.api.autodesk.com/data/v1/projects/{project_id}/folders/{folder["id"]}/contents', json_stream.read_listing)
+            for folder in compressed_data['data']
+        ])
+
+        # Process folder contents
+        contents = [
+            f"[{item['display_name'] or 'Unnamed'}, {'folder' if item['type'] == 'folders' else 'file'}]"
+            for item in folder_contents["data"]
+        ]
+
+        # Return a formatted string with compressed folder data.
+        return (
+            f"folder contents of {folder_name}, please choose the folder or file you wish to access: \n {', '.join(contents)}"
+            f"\n\n\n\n{compressed_data}")
+    else:
+        return f"error: Failed to retrieve root folder: {status}"
+
+# Function to find the id of a folder by name in a folder listing, shared by agent_get_foldercontents() and agent_download_folder()
+# Returns the id and the prompt that found it, so a rejected id can be dropped from the cache
+async def find_folder_id(folder_name, folder_data):
+    # The prompt asks the model to extract the 'id' of the folder based on the folder name.
+    prompt1 = (
+        f"The following is a JSON list of projects:\n"
+        f"{folder_data}\n\n"
+        f"{folder_name} can be similar or completely same with the actual hub name needed."
+        f"Find the project with the name {folder_name} and return its 'id'. No additional text, explanation, or formatting."
+        f"Return just the id value, e.g., urn:adsk.wipprod:fs.folder:co.Q04kD3-uT-usBOiCTSKggA."
+        f"Do not include curly braces or quotation marks in your response."
+    )
 
-                # Return a formatted string with compressed folder data.
-                return (f"list of available Root Folders, please choose one from the list: \n{formatted_folder_names}"
-                        f"\n \n \n \n \n{project_id}"
-                        f"\n{compressed_data}")
-            else:
-                return f"error: Failed to retrieve root folder: {response.status}"
+    # Query the LLM for the folder id based on the provided folder name.
+    folder_id = await ask_llm("folder_id", folder_name, listing_id("folder", folder_data), prompt1)
+    return folder_id, prompt1
 
 # Tool to retrieve the contents of a folder from ACC using the the Data Management API
 @tool
@@ -246,88 +335,98 @@ async def agent_get_foldercontents(access_token: str, project_id: str, folder_na
              "Contents of folder: [Name, FileType, ID], ..."
      """
 
-    # The prompt asks the model to extract the 'id' of the folder based on the folder name.
-    prompt1 = (
-        f"The following is a JSON list of projects:\n"
-        f"{folder_data}\n\n"
-        f"{folder_name} can be similar or completely same with the actual hub name needed."
-        f"Find the project with the name {folder_name} and return its 'id'. No additional text, explanation, or formatting."
-        f"Return just the id value, e.g., urn:adsk.wipprod:fs.folder:co.Q04kD3-uT-usBOiCTSKggA."
-        f"Do not include curly braces or quotation marks in your response."
-    )
-
-    # Query the LLM for the folder id based on the provided folder name.
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an assistant."},
-            {"role": "user", "content": prompt1},
-        ],
-        max_tokens=300
-    )
-
-    # Access the response and retrieve the folder id based on the folder name.
-    folder_id = response.choices[0].message.content
+    # Look up the folder id based on the provided folder name.
+    folder_id, prompt = await find_folder_id(folder_name, folder_data)
 
     # Debug statements to display project_id and folder_id to ensure LLM is returning correct responses
     # print("[DEBUG] project id: " + project_id)
     # print("[DEBUG] folder id: " + folder_id)
 
-    # Endpoint URL to fetch the contents of the folder using the project and folder IDs.
-    endpoint = f'https://developer.api.autodesk.com/data/v1/projects/{project_id}/folders/{folder_id}/contents'
+    # List the folder and format its contents
+    folder_contents = await list_folder(access_token, project_id, folder_id, folder_name)
+    if folder_contents.startswith("error:"):
+        forget_answer(prompt)
+    return folder_contents
 
-    # Set the authorization header for the HTTP request using the provided access token.
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
+# Tool to download every file below a folder from ACC in one job
+@tool
+async def agent_download_folder(access_token: str, project_id: str, folder_name: str, folder_data: str, zip_archive: bool = False) -> str:
+    """
+    Downloads every file inside a folder and all its subfolders in Autodesk Construction Cloud, as accessible by the current user.
+    Use this when the user wants everything under a folder instead of picking files one at a time.
 
-    # Asynchronously make a GET request to the Autodesk API to fetch folder contents.
-    async with aiohttp.ClientSession() as session:
-        async with session.get(endpoint, headers=headers) as response:
-            if response.status == 200:
-                folder_contents = await response.json()
-
-                # Compress the response
-                compressed_data = {
-                    "data": [
-                        # Compress the folders section (only type, id, name)
-                        {
-                            "type": item["type"],
-                            "id": item["id"],
-                            "name": item["attributes"]["name"]
-                        }
-                        for item in folder_contents.get("data", [])
-                        if item["type"] == "folders"  # Only folders
-                    ],
-                    "included": [
-                        # Compress the included section (only id, name, href under storage->meta->link)
-                        {
-                            "id": item["id"],
-                            "file_name": item["attributes"]["name"],
-                            "href": item["relationships"]["storage"]["meta"].get("link", "No link available")
-                            # Safely get href or fallback
-                        }
-                        for item in folder_contents.get("included", [])
-                        if "storage" in item["relationships"]  # Only items that have a storage field
-                    ]
-                }
+    Args:
+        access_token (str): The access token for Autodesk API authentication.
+        project_id (str): id of the project, obtained from get_rootfolder() .
+        folder_name (str): Name of the folder to be downloaded. obtained from user prompt.
+        folder_data (str): JSON-formatted string of folder information, the output of the tool that listed the folder.
+        zip_archive (bool): True to put all files into a single zip archive instead of separate files.
 
-                # Process folder contents
-                contents = []
-                for item in folder_contents.get("data", []):
-                    try:
-                        item_name = item["attributes"].get("displayName", "Unnamed")
-                        item_type = "folder" if item["type"] == "folders" else "file"
-                        contents.append(f"[{item_name}, {item_type}]")
-                    except KeyError as e:
-                        return f"Error processing item in folder: Missing key {e}"
-
-                # Return a formatted string with compressed folder data.
-                return (
-                    f"folder contents of {folder_name}, please choose the folder or file you wish to access: \n {', '.join(contents)}"
-                    f"\n\n\n\n{compressed_data}")
-            else:
-                return f"error: Failed to retrieve root folder: {response.status}"
+    Returns:
+        str: Where the files were saved, how many were downloaded, failed or retried, and the throughput.
+    """
+
+    # Look up the folder id based on the provided folder name.
+    folder_id, prompt = await find_folder_id(folder_name, folder_data)
+
+    # Expand the subtree, sign the files in batches and download them, smallest first
+    result = await bulk_download.download_subtree(access_token, project_id, folder_id, folder_name, zip_archive=zip_archive)
+    if "/" in result['failed_listings']:
+        # The folder itself could not be listed
+        forget_answer(prompt)
+
+    summary = (f"downloaded {result['files']} files ({result['bytes'] / 2**20:.1f} MB) from {folder_name} to {result['location']} "
+               f"in {result['seconds']:.1f}s ({result['bytes'] / 2**20 / result['seconds'] if result['seconds'] else 0:.2f} MB/s), "
+               f"{result['retries']} retries")
+    if result['failed']:
+        summary += f"\nfailed files: {', '.join(result['failed'])}"
+    if result['failed_listings']:
+        summary += f"\nfolders that could not be listed: {', '.join(result['failed_listings'])}"
+    return summary
+
+# Tool to find a folder or file directly from a full or partial path, using the locally cached folder tree
+@tool
+async def agent_find_path(access_token: str, path: str) -> str:
+    """
+    Finds a folder or file in Autodesk Construction Cloud directly from a full or partial path such as
+    "Project/Folder/Subfolder", "Subfolder/file.pdf" or a misspelt folder name, without navigating level by level.
+    The path is resolved in the locally cached folder tree, then the matching folder (or the folder containing the matching file)
+    is fetched once to confirm its current contents.
+
+    Args:
+        access_token (str): The access token for Autodesk API authentication.
+        path (str): Full or partial path of the folder or file, segments separated by "/".
+
+    Returns:
+        str: The contents of the matching folder in the same format as agent_get_foldercontents(), a list of candidate paths
+             if the path is ambiguous, or a message if nothing matched.
+    """
+
+    # Resolve the path locally, among the projects the user can open
+    projects = await access_scope.get_projects(access_token)
+    if projects is None:
+        return "results: The projects you can open could not be listed, please navigate with agent_get_hubs() instead."
+    matches = folder_tree.resolve(path, projects=projects)
+    if not matches:
+        return f"results: No folder or file matching {path} is known yet, please navigate with agent_get_hubs() instead."
+
+    # Ask the user to choose when several paths match about equally well
+    best_score, best = matches[0]
+    close = [node["path"] for score, node in matches if score >= best_score - 0.05]
+    if len(close) > 1:
+        return "several matching paths were found, please choose one: \n " + ", ".join(close)
+
+    # A file is confirmed by listing the folder that contains it
+    folder = best
+    if best["type"] == "file":
+        folder = folder_tree.get_node(best["path"].rsplit("/", 1)[0])
+    if folder is None or not folder["id"]:
+        return f"results: {best['path']} is known but its folder id is not, please navigate with agent_get_hubs() instead."
+
+    # One confirmation fetch of the folder's current contents
+    folder_contents = await list_folder(access_token, folder["project_id"], folder["id"], folder["path"])
+    found = f"matched path: {best['path']}\nproject id: {folder['project_id']}\n"
+    return found + folder_contents
 
 # Tool to retrieve a signed S3 URL of a file from ACC using the the Data Management API
 @tool
@@ -355,54 +454,16 @@ async def agent_get_url(access_token: str, folder_contents: str, file_name: str)
     )
 
     # Query the LLM for the 'href' value based on the provided file name.
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an assistant."},
-            {"role": "user", "content": prompt},
-        ],
-        max_tokens=300
-    )
-    # Access the response and retrieve the 'href' value.
-    file_url = response.choices[0].message.content
+    file_url = await ask_llm("file_href", file_name, listing_id("folder", folder_contents), prompt)
 
     # Debug statement to ensure the 'href' value is correctly retrieved
     # print("[DEBUG]File url: "+file_url)
 
-    #Parse the provided URL to break it into its components (e.g., scheme, host, path, etc.)
-    parsed_url = urlparse(file_url)
-
-    # Split the path of the URL into parts based on the '/' delimiter.
-    path_parts = parsed_url.path.split('/')
-
-    # Extract the 'bucket_key' from the URL path.
-    # In this case, it's located at the 4th index of the split path.
-    bucket_key = path_parts[4]
-
-    # Extract the 'object_key' from the URL path, starting from the 6th index onwards.
-    object_key = '/'.join(path_parts[6:])
-    object_key = unquote(object_key)
-
-    # Debug statements to ensure the URL is parsed correctly
-    # print("[DEBUG] Bucket Key: "+bucket_key)
-    # print("[DEBUG] Object Key: "+object_key)
-
-    # Endpoint URL to fetch the signed S3 URL of the file using the bucket and object keys.
-    endpoint = f"https://developer.api.autodesk.com/oss/v2/buckets/{bucket_key}/objects/{object_key}/signeds3download"
-
-    # Set the authorization header for the HTTP request using the provided access token.
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-
-    # Asynchronously make a GET request to the Autodesk API to fetch the signed S3 URL.
-    async with aiohttp.ClientSession() as session:
-        async with session.get(endpoint, headers=headers) as response:
-            if response.status == 200:
-                response_json = await response.json()
-                download_url = response_json.get('url', None)
-
-                # Return a formatted string.
-                return f"download URL for {file_name} : {download_url}"
-            else:
-                return f"error: Failed to generate signed download URL."
+    # Get the signed S3 URL of the file, a URL signed earlier and still valid is reused without a request
+    status, download_url = await signed_url_cache.get_signed_url(access_token, file_url)
+    if status == 200:
+        # Return a formatted string.
+        return f"download URL for {file_name} : {download_url}"
+    else:
+        forget_answer(prompt)
+        return f"error: Failed to generate signed download URL."
@@ -1,32 +1,118 @@
 # Import statements
-import json  # Import json to handle JSON data format
 import os  # For accessing environment variables and interacting with the operating system
-import aiohttp  # Import aiohttp for making asynchronous HTTP requests
-import numpy as np  # Import numpy for numerical operations
-from sklearn.metrics.pairwise import cosine_similarity  # Import cosine_similarity to measure similarity between vectors
-from urllib.parse import urlparse, unquote  # Import urlparse for parsing URLs and unquote for decoding URL-encoded strings
+import tools.rateLimiter as rate_limiter  # Rate-limited, retrying access to the Autodesk and OpenAI APIs
+import tools.singleFlight as single_flight  # Coalesces identical concurrent requests into one upstream call
 from dotenv import load_dotenv  # For loading environment variables from a .env file
 from langchain_core.tools import tool  # Import the @tool decorator and the tool functionality from Langchain.
 from openai import OpenAI  # Import the OpenAI client for interacting with the OpenAI API
+import tools.searchIndex as search_index  # Sharded embedding index with scoped search
+import tools.facets as facets  # Facet constraints read from the query text
+import tools.searchExecutor as search_executor  # Multi-process scan of the embedding index
+import tools.signedUrlCache as signed_url_cache  # Signed download URLs reused until shortly before they expire
+import tools.accessScope as access_scope  # Rows of the index each user can open
 
 # Load .env file
 load_dotenv()
 
 # Retrieve OpenAI API key from the .env file
 openai_api_key = os.getenv('OPENAI_API_KEY')
-client = OpenAI(api_key=openai_api_key)
+client = OpenAI(api_key=openai_api_key, max_retries=0)  # Retries are handled by tools/rateLimiter.py
+
+# Function to embed many queries with one API call, returns one embedding per query in the same order
+async def embed_queries(texts):
+    response = await rate_limiter.call_openai(
+        "openai:embeddings",
+        client.embeddings.create,
+        model="text-embedding-3-large",
+        input=[" ".join(text.split()) for text in texts],
+    )
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+# Function to embed a query and return the best matching files inside the requested scope, shared by agent_get_embeddings()
+# and the batch resolver (batch_resolve.py), which uses it without any chat LLM
+# embedding can be passed when the query was already embedded, e.g. by embed_queries()
+# With an access token only files in projects the user can open are scored
+async def find_files(text, hub_name="", project_name="", folder_path="", extension="", version=0, top_k=3, threshold=0.3, embedding=None,
+                     access_token=""):
+    if embedding is None:
+        # Call the OpenAI API to get embeddings for the provided file name, concurrent identical queries share one call
+        query = " ".join(text.split())
+        response = await single_flight.run(
+            "query_embedding",
+            ("text-embedding-3-large", query),
+            lambda: rate_limiter.call_openai(
+                "openai:embeddings",
+                client.embeddings.create,
+                model="text-embedding-3-large",
+                input=query,
+            )
+        )
+        # Extract the embedding vector from the response
+        embedding = response.data[0].embedding
+
+    # An extension, file-type family or folder named in the query restricts the rows that are scored,
+    # unless the same kind of filter was passed explicitly
+    snapshot = search_index.get_snapshot()
+    parsed = facets.parse_query(text, snapshot.extensions if snapshot else set())
+    query_facets = {
+        "extension": extension or parsed["extension"] or "",
+        "family": "" if extension else parsed["family"] or "",
+        "folder_name": "" if folder_path else parsed["folder_name"] or "",
+    }
+
+    # Files the user cannot open are removed before scoring, so they neither cost time nor push accessible files out of the top k
+    access = await access_scope.get_access(access_token, snapshot)
+
+    # Score the embedding against the shards and rows inside the requested scope only, spread over the search workers
+    matches = await search_executor.search(embedding, hub_name=hub_name, project_name=project_name, folder_path=folder_path,
+                                           version=version, top_k=top_k, threshold=threshold, snapshot=snapshot, access=access,
+                                           **query_facets)
+
+    # Facets read from the query text can be wrong, without any match the search falls back to the explicit filters only
+    if not matches and query_facets != {"extension": extension, "family": "", "folder_name": ""}:
+        matches = await search_executor.search(embedding, hub_name=hub_name, project_name=project_name, folder_path=folder_path,
+                                               extension=extension, version=version, top_k=top_k, threshold=threshold, snapshot=snapshot,
+                                               access=access)
+    return matches
+
+
+# Function to turn matches into the text shown to the user and kept in the conversation: one line per match, then the hrefs
+# Shared by agent_get_embeddings() and the fast path of tools/queryRouter.py
+def describe_matches(matches):
+    best_results = "best results found:\n"
+    hrefs = []
+
+    for match in matches:
+        location = "/".join(part for part in (match['project_name'], match['folder_path']) if part)
+        best_results += f"{match['file_name']}, Similarity: {match['similarity']:.4f}" + (f", Location: {location}" if location else "") \
+            + (f", Version: {match['version']}" if match['version'] else "") + "\n"
+        hrefs.append(f"{{{match['file_name']}, href={match['href']}}}")
+
+    # Combine everything into a single string
+    return f"{best_results}\n" + "\n\n\n\n".join(hrefs)
+
 
 # Function to compare user input embeddings with file name embeddings
 @tool
-async def agent_get_embeddings(file_name: str):
+async def agent_get_embeddings(file_name: str, hub_name: str = "", project_name: str = "", folder_path: str = "", extension: str = "", version: int = 0,
+                               access_token: str = ""):
     """
     Converts the file name or file extension specified by the user to a set of embeddings,
     Compares the embeddings generated from the user's input with the pre-existing embeddings of file names,
     calculates the cosine similarity, and returns the most similar file's download link or a message indicating
-    no similar file was found.
+    no similar file was found. The search can be restricted to a hub, project, folder path or file extension,
+    only files inside that scope are compared. Only the latest version of each file is searched unless a version is requested.
+    With the access token, only files in projects the current user can open are compared.
 
     Args:
         file_name (str): The file name specified by the user.
+        hub_name (str): Optional name or id of the hub to search in.
+        project_name (str): Optional name or id of the project to search in.
+        folder_path (str): Optional folder path to search under, e.g. "Project Files/Drawings".
+        extension (str): Optional file extension to restrict results to, e.g. "pdf".
+        version (int): Optional version number of the file, e.g. 2 for an older version; 0 for the latest version.
+        access_token (str): The access token for Autodesk API authentication, restricts results to files the user can open.
 
     Returns:
         str: JSON-formatted string of embeddings.
@@ -34,53 +120,18 @@ async def agent_get_embeddings(file_name: str):
 
     # Call the OpenAI API to get embeddings for the provided file name
     try:
-        # Call the OpenAI API to get embeddings for the provided file name
-        response = client.embeddings.create(
-            model="text-embedding-3-large",
-            input=file_name,
-        )
-        # Extract the embedding vector from the response
-        embedding = response.data[0].embedding
-
-        # Load pre-existing embeddings from the JSON file
-        embeddings_file_path = "D:/Desktop/CP2/embeddings/embeddings.json"  # Update path if needed
-        with open(embeddings_file_path, "r") as file:
-            embeddings_data = json.load(file)
-
-            # Initialize variables to track matches
-            matches = []
-
-            # Compare the user input's embedding with each stored embedding using cosine similarity
-            for entry in embeddings_data:
-                stored_embedding = np.array(entry["file_name_embedding"]).reshape(1, -1)
-                similarity = cosine_similarity([embedding], stored_embedding)[0][0]
-
-                # Only accept matches above a certain threshold
-                if similarity > 0.3:
-                    matches.append({
-                        'file_name': entry['file_name'],
-                        'href': entry['href'],
-                        'similarity': similarity
-                    })
-
-            # Sort matches by similarity score in descending order
-            matches = sorted(matches, key=lambda x: x['similarity'], reverse=True)
-
-            # If no good matches are found
-            if not matches:
-                return "results: Unfortunately, no file matching your query was found.."
-
-            # Construct response with best matches
-            best_results = "best results found:\n"
-            hrefs = []
-
-            for match in matches[:3]:  # Return top 3 matches
-                best_results += f"{match['file_name']}, Similarity: {match['similarity']:.4f}\n"
-                hrefs.append(f"{{{match['file_name']}, href={match['href']}}}")
-
-            # Combine everything into a single string
-            return f"{best_results}\n" + "\n\n\n\n".join(hrefs)
-
+        # Embed the query and score it against the rows inside the requested scope
+        matches = await find_files(file_name, hub_name=hub_name, project_name=project_name, folder_path=folder_path,
+                                   extension=extension, version=version, access_token=access_token)
+
+        # If no good matches are found
+        if not matches:
+            return "results: Unfortunately, no file matching your query was found.."
+        return describe_matches(matches)
+
+    except PermissionError as e:
+        # The projects of the user could not be verified, nothing is searched until they can be
+        return f"results: {e}"
     except Exception as e:
         return f"error messages: Error processing request: {str(e)}"
 
@@ -99,39 +150,9 @@ async def agent_get_url(access_token: str, href: str):
         str: Signed S3 URL of the file to be downloaded.
     """
 
-    #Parse the provided URL to break it into its components (e.g., scheme, host, path, etc.)
-    parsed_url = urlparse(href)
-
-    # Split the path of the URL into parts based on the '/' delimiter.
-    path_parts = parsed_url.path.split('/')
-
-    # Extract the 'bucket_key' from the URL path.
-    # In this case, it's located at the 4th index of the split path.
-    bucket_key = path_parts[4]
-
-    # Extract the 'object_key' from the URL path, starting from the 6th index onwards.
-    object_key = '/'.join(path_parts[6:])
-    object_key = unquote(object_key)
-
-    # Debug statements to ensure the URL is parsed correctly
-    # print("[DEBUG] Bucket Key: "+bucket_key)
-    # print("[DEBUG] Object Key: "+object_key)
-
-    # Endpoint URL to fetch the signed S3 URL of the file using the bucket and object keys.
-    endpoint = f"https://developer.api.autodesk.com/oss/v2/buckets/{bucket_key}/objects/{object_key}/signeds3download"
-
-    # Set the authorization header for the HTTP request using the provided access token.
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-
-    # Asynchronously make a GET request to the Autodesk API to fetch the signed S3 URL.
-    async with aiohttp.ClientSession() as session:
-        async with session.get(endpoint, headers=headers) as response:
-            if response.status == 200:
-                response_json = await response.json()
-                download_url = response_json.get('url', None)
-                # download_url = await response.text()
-                return f"download URLS: {download_url}"
-            else:
-                return f"errors: Failed to generate signed download URL."
+    # Ask Autodesk for a signed S3 URL of the file, a URL signed earlier and still valid is reused without a request
+    status, download_url = await signed_url_cache.get_signed_url(access_token, href)
+    if status == 200:
+        return f"download URLS: {download_url}"
+    else:
+        return f"errors: Failed to generate signed download URL."
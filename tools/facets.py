@@ -0,0 +1,93 @@
+# Import statements
+import re  # For pulling facet constraints out of the query text
+import numpy as np  # For the per-value row bitmaps
+
+# File-type families, a query for "models" or "spreadsheets" matches every extension of the family
+FAMILIES = {
+    "drawing": ("pdf", "dwg", "dxf", "dwf", "dwfx"),
+    "model": ("rvt", "rfa", "rte", "nwd", "nwc", "ifc", "skp", "3dm", "fbx", "obj"),
+    "document": ("doc", "docx", "txt", "rtf", "odt"),
+    "spreadsheet": ("xls", "xlsx", "xlsm", "csv", "ods"),
+    "presentation": ("ppt", "pptx", "key"),
+    "image": ("jpg", "jpeg", "png", "gif", "bmp", "tif", "tiff", "heic"),
+    "video": ("mp4", "mov", "avi", "wmv"),
+    "archive": ("zip", "rar", "7z"),
+}
+
+# Words of a query naming a family, e.g. "3d models of level 2" or "site photos"
+FAMILY_WORDS = {
+    "drawing": "drawing", "drawings": "drawing", "cad": "drawing",
+    "model": "model", "models": "model", "bim": "model",
+    "document": "document", "documents": "document", "docs": "document",
+    "spreadsheet": "spreadsheet", "spreadsheets": "spreadsheet", "excel": "spreadsheet",
+    "presentation": "presentation", "presentations": "presentation", "slides": "presentation",
+    "image": "image", "images": "image", "photo": "image", "photos": "image", "picture": "image", "pictures": "image",
+    "video": "video", "videos": "video",
+    "archive": "archive", "archives": "archive",
+}
+
+# Folder constraints written as folder:Name, folder "Name" or "in the Name folder"
+FOLDER_PATTERNS = (
+    re.compile(r'\bfolder:\s*"?([^"]+?)"?(?=$|\s)', re.IGNORECASE),
+    re.compile(r'\bfolder\s+"([^"]+)"', re.IGNORECASE),
+    re.compile(r'\b(?:in|under|inside)\s+(?:the\s+)?"?([\w\- ]+?)"?\s+folder\b', re.IGNORECASE),
+)
+
+
+# Function to find the family of an extension, None for extensions outside every family
+def family_of(extension):
+    for family, extensions in FAMILIES.items():
+        if extension in extensions:
+            return family
+    return None
+
+
+# Function to pull facet constraints out of a query, e.g. "pdf drawings in the Structural folder"
+# gives {"extension": "pdf", "family": None, "folder_name": "structural"}; extensions is the set of extensions in the index
+# An explicit extension wins over a family word, and the query text itself is left unchanged for the embedding
+def parse_query(query, extensions):
+    words = re.findall(r'\w+', query.lower())
+
+    extension = next((word for word in words if word in extensions), None)
+    family = None if extension else next((FAMILY_WORDS[word] for word in words if word in FAMILY_WORDS), None)
+
+    folder_name = None
+    for pattern in FOLDER_PATTERNS:
+        match = pattern.search(query)
+        if match:
+            folder_name = match.group(1).strip().lower()
+            break
+    return {"extension": extension, "family": family, "folder_name": folder_name}
+
+
+# Function to build the facets of one shard's catalog, once per index snapshot:
+# one row bitmap per extension, per family and per project (the access group of a row), and (folder path, row ids) for every folder
+def build_facets(catalog):
+    extension_codes = catalog.columns["extension"].code_array()
+    extensions = {}
+    for code, (value,) in enumerate(catalog.columns["extension"].strings):
+        extensions[(value or "").lower()] = extension_codes == code
+
+    families = {}
+    for extension, bitmap in extensions.items():
+        family = family_of(extension)
+        if family:
+            families[family] = families[family] | bitmap if family in families else bitmap.copy()
+
+    # Rows of one project share scope codes that differ only in their href prefix or suffix
+    scope_codes = catalog.columns["scope"].code_array()
+    projects = {}
+    for code, scope in enumerate(catalog.columns["scope"].strings):
+        bitmap = scope_codes == code
+        project_id = scope[2]
+        projects[project_id] = projects[project_id] | bitmap if project_id in projects else bitmap
+
+    # Folders are many, so they keep compact sorted row id lists instead of full bitmaps
+    folder_codes = catalog.columns["folder"].code_array()
+    order = np.argsort(folder_codes, kind="stable")
+    bounds = np.searchsorted(folder_codes[order], np.arange(len(catalog.columns["folder"].strings) + 1))
+    folders = [
+        (path, order[bounds[code]:bounds[code + 1]].astype(np.int32))
+        for code, (_, path) in enumerate(catalog.columns["folder"].strings)
+    ]
+    return {"extension": extensions, "family": families, "project": projects, "folder": folders}
@@ -0,0 +1,245 @@
+# Import statements
+import difflib  # For fuzzy matching of path segments
+import json  # Import json to persist the folder tree
+import os  # For building paths and reading environment variables
+import time  # For limiting how often the tree is written to disk
+from dotenv import load_dotenv  # For loading environment variables from a .env file
+
+# Load .env file
+load_dotenv()
+
+# Repository root, the tree is cached next to the embedding index
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# File the tree is persisted to between sessions
+TREE_FILE = os.getenv('FOLDER_TREE_FILE', os.path.join(REPO_DIR, 'embeddings', 'folder_tree.json'))
+
+# Crawl output used to seed the tree, written by extractFolderData.crawl_tenant()
+CATALOG_DIR = os.getenv('CATALOG_DIR', os.path.join(REPO_DIR, 'embeddings', 'convertFilesToEmbeddings'))
+
+# Minimum similarity for a fuzzy segment match, and minimum seconds between two writes of the tree
+FUZZY_CUTOFF = 0.6
+SAVE_INTERVAL = 30
+
+# The tree: projects at the top, then folders and files; every node is a dict
+# {"name", "path", "type": "project" | "folder" | "file", "id", "project_id", "href", "children": {lowercase name: node}}
+tree = None
+
+# Nodes by id, so listings of a known folder can be attached without knowing its path
+nodes_by_id = {}
+
+# Nodes by lowercase name, so a partial path can start at any level without walking the whole tree
+nodes_by_name = {}
+
+# Whether the tree changed since it was last written, and when that was
+dirty = False
+last_saved = 0.0
+
+
+# Function to create a node
+def make_node(name, path, node_type, project_id, node_id=None, href=None):
+    return {"name": name, "path": path, "type": node_type, "id": node_id, "project_id": project_id, "href": href, "children": {}}
+
+
+# Function to get the child of a node with the given name, creating it when missing and filling in ids learned later
+def get_child(parent, name, node_type, project_id, node_id=None, href=None):
+    global dirty
+    key = name.lower()
+    child = parent["children"].get(key)
+    if child is None:
+        path = f"{parent['path']}/{name}" if parent["path"] else name
+        child = make_node(name, path, node_type, project_id, node_id, href)
+        parent["children"][key] = child
+        nodes_by_name.setdefault(key, []).append(child)
+        dirty = True
+    elif (node_id and child["id"] != node_id) or (href and child["href"] != href):
+        child["id"] = node_id or child["id"]
+        child["href"] = href or child["href"]
+        dirty = True
+    if child["id"]:
+        nodes_by_id[child["id"]] = child
+    return child
+
+
+# Function to rebuild the id and name indexes after loading
+def index_nodes(node):
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if current.get("id"):
+            nodes_by_id[current["id"]] = current
+        for key, child in current["children"].items():
+            nodes_by_name.setdefault(key, []).append(child)
+            pending.append(child)
+
+
+# Function to add one project and its root folder
+def add_project(project_id, project_name, root_folder_id=None):
+    return get_child(get_tree(), project_name, "project", project_id, root_folder_id)
+
+
+# Function to walk (and create) the folders of a path below a project
+def add_folder_path(project_node, folder_path, folder_id=None):
+    node = project_node
+    segments = [segment for segment in (folder_path or "").split("/") if segment]
+    for position, segment in enumerate(segments):
+        last = position == len(segments) - 1
+        node = get_child(node, segment, "folder", project_node["project_id"], folder_id if last else None)
+    return node
+
+
+# Function to learn the contents of a listed folder, attached below the folder with that id when it is already known
+# folder_contents is the projected listing of tools/jsonStream.py: subfolders in "data", file versions in "included"
+def add_listing(folder_id, folder_contents):
+    parent = nodes_by_id.get(folder_id)
+    if parent is None:
+        return
+    for item in folder_contents.get("data", []):
+        if item["type"] == "folders":
+            get_child(parent, item["name"] or item["display_name"] or "Unnamed Folder", "folder", parent["project_id"], item["id"])
+    for item in folder_contents.get("included", []):
+        if item.get("file_name"):
+            get_child(parent, item["file_name"], "file", parent["project_id"], item.get("item_id"), item.get("href"))
+    save_tree()
+
+
+# Function to add, rename or move one file of the catalog, e.g. on a webhook event; files of unnamed projects are left out
+def add_file(record):
+    remove_file(record.get("item_id"))
+    if not record.get("project_name"):
+        return
+    project_node = add_project(record["project_id"], record["project_name"])
+    folder_node = add_folder_path(project_node, record.get("folder_path"), record.get("folder_id"))
+    get_child(folder_node, record["file_name"], "file", record["project_id"], record.get("item_id"), record.get("href"))
+    save_tree()
+
+
+# Function to remove a file by its item id
+def remove_file(item_id):
+    global dirty
+    get_tree()
+    node = nodes_by_id.get(item_id) if item_id else None
+    if node is None or node["type"] != "file":
+        return
+    del nodes_by_id[item_id]
+    key = node["name"].lower()
+    parent = get_node(node["path"].rsplit("/", 1)[0] if "/" in node["path"] else "")
+    if parent is not None and parent["children"].get(key) is node:
+        del parent["children"][key]
+    nodes_by_name[key] = [other for other in nodes_by_name.get(key, []) if other is not node]
+    dirty = True
+
+
+# Function to seed the tree from the crawl output (folder_info.json for every folder, file_info_with_hrefs.json for files)
+def seed_from_catalog(catalog_dir=CATALOG_DIR):
+    for name in ("folder_info.json", "file_info_with_hrefs.json"):
+        path = os.path.join(catalog_dir, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, "r") as file:
+            records = json.load(file)
+        for record in records:
+            if not record.get("project_name"):
+                continue
+            project_node = add_project(record["project_id"], record["project_name"])
+            folder_node = add_folder_path(project_node, record.get("folder_path"), record.get("folder_id"))
+
+            # The root folder is listed with an empty path, its id belongs to the project node
+            if not record.get("folder_path") and record.get("folder_id"):
+                project_node["id"] = record["folder_id"]
+                nodes_by_id[record["folder_id"]] = project_node
+            if record.get("file_name"):
+                get_child(folder_node, record["file_name"], "file", record["project_id"], record.get("item_id"), record.get("href"))
+
+
+# Function to get the tree, loaded from disk and seeded from the crawl output on first use
+def get_tree():
+    global tree
+    if tree is None:
+        tree = make_node("", "", "root", None)
+        if os.path.exists(TREE_FILE):
+            with open(TREE_FILE, "r") as file:
+                tree = json.load(file)
+        index_nodes(tree)
+        seed_from_catalog()
+    return tree
+
+
+# Function to write the tree to disk, at most once every SAVE_INTERVAL seconds unless forced
+def save_tree(force=False):
+    global dirty, last_saved
+    if tree is None or not dirty or (not force and time.monotonic() - last_saved < SAVE_INTERVAL):
+        return
+    os.makedirs(os.path.dirname(TREE_FILE), exist_ok=True)
+    with open(TREE_FILE + ".tmp", "w") as file:
+        json.dump(tree, file)
+    os.replace(TREE_FILE + ".tmp", TREE_FILE)
+    dirty = False
+    last_saved = time.monotonic()
+
+
+# Function to get the node at an exact path, e.g. the parent folder of a matched file
+def get_node(path):
+    node = get_tree()
+    for segment in [segment for segment in path.split("/") if segment]:
+        node = node["children"].get(segment.lower())
+        if node is None:
+            return None
+    return node
+
+
+# Function to score how well a node name matches one requested segment: exact 1.0, prefix 0.9, fuzzy by similarity
+def segment_score(segment, name):
+    segment, name = segment.lower(), name.lower()
+    if segment == name:
+        return 1.0
+    if name.startswith(segment):
+        return 0.9
+    ratio = difflib.SequenceMatcher(None, segment, name).ratio()
+    return ratio if ratio >= FUZZY_CUTOFF else 0.0
+
+
+# Function to find the nodes anywhere in the tree whose name matches a segment, trying exact, then prefix, then fuzzy matches
+def find_by_name(segment):
+    get_tree()
+    key = segment.lower()
+    if key in nodes_by_name:
+        return [(1.0, node) for node in nodes_by_name[key]]
+
+    matches = [(0.9, node) for name, nodes in nodes_by_name.items() if name.startswith(key) for node in nodes]
+    if matches:
+        return matches
+
+    # Fuzzy matching only compares against the distinct names, not every node
+    for name in difflib.get_close_matches(key, nodes_by_name.keys(), n=10, cutoff=FUZZY_CUTOFF):
+        ratio = difflib.SequenceMatcher(None, key, name).ratio()
+        matches.extend((ratio, node) for node in nodes_by_name[name])
+    return matches
+
+
+# Function to resolve a full or partial path such as "Project/Folder/Subfolder" or "Subfolder/file.pdf"
+# The segments have to match consecutive levels of the tree, starting at any level; returns (score, node) pairs, best first
+# projects is the set of project ids the caller can open, None for no restriction
+# The tree is shared by every user of the process, so in server mode it holds folders learned from other users' listings
+def resolve(path, limit=5, projects=None):
+    segments = [segment.strip() for segment in path.replace("\\", "/").split("/") if segment.strip()]
+    if not segments:
+        return []
+
+    # Candidate chains are extended level by level, each keeping the product of its segment scores
+    # Every node below a project carries its project id, so dropping the starting nodes of other projects drops their chains
+    candidates = find_by_name(segments[0])
+    if projects is not None:
+        candidates = [(score, node) for score, node in candidates if node["project_id"] in projects]
+    for segment in segments[1:]:
+        extended = []
+        for score, node in candidates:
+            for child in node["children"].values():
+                child_score = segment_score(segment, child["name"])
+                if child_score:
+                    extended.append((score * child_score, child))
+        candidates = extended
+
+    # Shorter paths win ties, a match close to the top of the tree is the more likely target
+    candidates.sort(key=lambda match: (-match[0], match[1]["path"].count("/")))
+    return candidates[:limit]
@@ -0,0 +1,26 @@
+# Import statements
+import asyncio  # For checking which event loop the shared session belongs to
+import aiohttp  # Import aiohttp for making asynchronous HTTP requests
+
+# Shared client session, one connection pool reused by every tool call and every chat session
+shared_session = None
+
+
+# Function to get the shared client session, created lazily on the running event loop
+def get_session() -> aiohttp.ClientSession:
+    global shared_session
+    loop = asyncio.get_running_loop()
+
+    # A session is bound to the loop it was created on, so a new one is made after the loop changes
+    if shared_session is None or shared_session.closed or shared_session._loop is not loop:
+        connector = aiohttp.TCPConnector(limit=100, limit_per_host=20)
+        shared_session = aiohttp.ClientSession(connector=connector)
+    return shared_session
+
+
+# Function to close the shared client session when the application shuts down
+async def close_session():
+    global shared_session
+    if shared_session is not None and not shared_session.closed:
+        await shared_session.close()
+    shared_session = None
@@ -0,0 +1,168 @@
+# Import statements
+import json  # Standard JSON decoder, used when no faster backend is installed
+import os  # For reading the streaming threshold from environment variables
+
+# Faster JSON backend, optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Incremental JSON decoder, optional, lets a listing be projected while it is still being downloaded
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Responses larger than this many bytes are decoded incrementally
+STREAM_THRESHOLD = int(os.getenv('JSON_STREAM_THRESHOLD', str(1024 * 1024)))
+
+# Fields kept from each entry of the "data" section (subfolders and items), keyed by their ijson path
+DATA_FIELDS = {
+    "data.item.type": "type",
+    "data.item.id": "id",
+    "data.item.attributes.name": "name",
+    "data.item.attributes.displayName": "display_name",
+    "data.item.relationships.parent.data.id": "parent_id",
+}
+
+# Fields kept from each entry of the "included" section (versions), keyed by their ijson path
+INCLUDED_FIELDS = {
+    "included.item.id": "id",
+    "included.item.attributes.name": "file_name",
+    "included.item.attributes.versionNumber": "version",
+    "included.item.attributes.storageSize": "size",
+    "included.item.relationships.item.data.id": "item_id",
+    "included.item.relationships.storage.meta.link.href": "href",
+}
+
+
+# Function to decode a complete JSON document with the fastest available backend
+def loads(payload):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+# Function to project an already decoded folder listing onto the fields the tools use
+def project_listing(folder_contents):
+    data = []
+    for item in folder_contents.get("data", []):
+        attributes = item.get("attributes", {})
+        data.append({
+            "type": item.get("type"),
+            "id": item.get("id"),
+            "name": attributes.get("name"),
+            "display_name": attributes.get("displayName"),
+            "parent_id": item.get("relationships", {}).get("parent", {}).get("data", {}).get("id"),
+        })
+
+    included = []
+    for item in folder_contents.get("included", []):
+        relationships = item.get("relationships", {})
+        # Only versions that have a storage field can be downloaded
+        if "storage" not in relationships:
+            continue
+        included.append({
+            "id": item.get("id"),
+            "file_name": item.get("attributes", {}).get("name"),
+            "version": item.get("attributes", {}).get("versionNumber"),
+            "size": item.get("attributes", {}).get("storageSize"),
+            "item_id": relationships.get("item", {}).get("data", {}).get("id"),
+            "href": (relationships["storage"] or {}).get("meta", {}).get("link", {}).get("href"),
+        })
+
+    return {"data": data, "included": included, "next": folder_contents.get("links", {}).get("next", {}).get("href")}
+
+
+# Function to project a folder listing while it streams in, only the projected fields are ever held in memory
+async def stream_listing(stream):
+    data, included, next_page = [], [], None
+    current, fields, has_storage = None, None, False
+
+    async for prefix, event, value in ijson.parse_async(stream):
+        if event == "start_map" and prefix in ("data.item", "included.item"):
+            current = {}
+            fields = DATA_FIELDS if prefix == "data.item" else INCLUDED_FIELDS
+            has_storage = False
+        elif event == "end_map" and prefix == "data.item":
+            data.append({name: current.get(name) for name in DATA_FIELDS.values()})
+            current = None
+        elif event == "end_map" and prefix == "included.item":
+            if has_storage:
+                included.append({name: current.get(name) for name in INCLUDED_FIELDS.values()})
+            current = None
+        elif current is not None:
+            if prefix == "included.item.relationships.storage":
+                has_storage = True
+            elif prefix in fields:
+                current[fields[prefix]] = value
+        elif prefix == "links.next.href":
+            next_page = value
+
+    return {"data": data, "included": included, "next": next_page}
+
+
+# Function to read a folder listing response: large or unsized bodies are decoded incrementally when ijson is installed,
+# small ones in one go with the fastest decoder, which costs less CPU and only briefly holds a small document
+async def read_listing(response):
+    if ijson is not None and (response.content_length is None or response.content_length > STREAM_THRESHOLD):
+        return await stream_listing(response.content)
+    return project_listing(loads(await response.read()))
+
+
+# Benchmark: peak memory and time of the full decode versus the streaming projection on a large synthetic folder
+if __name__ == "__main__":
+    import asyncio
+    import time
+    import tracemalloc
+
+    # Synthetic folder with many files, each with several heavy versions in the "included" section
+    def synthetic_listing(files=5000, versions=4):
+        data = [{
+            "type": "items", "id": f"urn:adsk.wipprod:dm.lineage:{i:08d}",
+            "attributes": {"displayName": f"Drawing {i}.pdf", "createTime": "2024-01-01T00:00:00.000Z", "extension": {"type": "items:autodesk.bim360:File", "version": "1.0", "data": {}}},
+            "relationships": {"parent": {"data": {"type": "folders", "id": "urn:adsk.wipprod:fs.folder:co.parent"}}, "tip": {"data": {"type": "versions", "id": f"urn:adsk.wipprod:fs.file:vf.{i:08d}?version={versions}"}}}
+        } for i in range(files)]
+        included = [{
+            "type": "versions", "id": f"urn:adsk.wipprod:fs.file:vf.{i:08d}?version={v}",
+            "attributes": {"name": f"Drawing {i}.pdf", "versionNumber": v, "storageSize": 123456, "mimeType": "application/pdf",
+                           "extension": {"type": "versions:autodesk.bim360:File", "version": "1.0", "data": {"sourceFileName": f"Drawing {i}.pdf", "processState": "PROCESSING_COMPLETE", "description": "x" * 200}}},
+            "relationships": {"item": {"data": {"type": "items", "id": f"urn:adsk.wipprod:dm.lineage:{i:08d}"}},
+                              "storage": {"data": {"type": "objects", "id": f"urn:adsk.objects:os.object:wip.dm.prod/{i:08d}-{v}.pdf"},
+                                          "meta": {"link": {"href": f"https://developer.api.autodesk.com/oss/v2/buckets/wip.dm.prod/objects/{i:08d}-{v}.pdf?scopes=b360project.abad486a-ecf6-43b6-81c8-5b6c2efd8936,O2tenant.34579194"}}}}
+        } for i in range(files) for v in range(1, versions + 1)]
+        return json.dumps({"jsonapi": {"version": "1.0"}, "data": data, "included": included}).encode("utf-8")
+
+    # Stand-in for aiohttp's response.content, handing out the payload in network-sized chunks
+    class ChunkedStream:
+        def __init__(self, payload, chunk_size=65536):
+            self.payload, self.position, self.chunk_size = payload, 0, chunk_size
+
+        async def read(self, size=-1):
+            size = self.chunk_size if size is None or size < 0 else min(size, self.chunk_size)
+            chunk = self.payload[self.position:self.position + size]
+            self.position += len(chunk)
+            return chunk
+
+    # Time and peak memory are measured in separate runs, tracing allocations slows the parsers down unevenly
+    def measure(label, run):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label:<28} {elapsed * 1000:8.1f} ms  peak {peak / 2**20:7.1f} MB  ({len(result['included'])} versions kept)")
+
+    payload = synthetic_listing()
+    print(f"Synthetic listing: {len(payload) / 2**20:.1f} MB")
+
+    # The payload is generated before measuring, so every peak below excludes the downloaded bytes themselves
+    measure("json.loads + projection", lambda: project_listing(json.loads(payload)))
+    if orjson is not None:
+        measure("orjson.loads + projection", lambda: project_listing(orjson.loads(payload)))
+    if ijson is not None:
+        measure("ijson streaming projection", lambda: asyncio.run(stream_listing(ChunkedStream(payload))))
@@ -0,0 +1,148 @@
+# Import statements
+import asyncio  # For running prefetches in the background while the user reads a list
+import os  # For reading the prefetch limits from environment variables
+import time  # For expiring prefetched results and accounting the prefetch budget
+from collections import deque  # Timestamps of recent prefetches, per user
+import tools.singleFlight as single_flight  # Uncoalesced fetches and access token fingerprints
+
+# Number of entries of a list whose children are prefetched, most often chosen entries first
+PREFETCH_TOP_N = int(os.getenv('PREFETCH_TOP_N', '3'))
+
+# Prefetches running at the same time, over all users
+PREFETCH_CONCURRENCY = int(os.getenv('PREFETCH_CONCURRENCY', '2'))
+
+# Prefetches one user may start per minute, so prefetching never eats much of the Autodesk quota
+PREFETCH_BUDGET = int(os.getenv('PREFETCH_BUDGET', '20'))
+
+# Seconds a prefetched result stays usable, and the number of results kept
+PREFETCH_TTL = int(os.getenv('PREFETCH_TTL', '120'))
+CACHE_SIZE = 256
+
+# Prefetched results, keyed by (group, endpoint, token fingerprint) -> (time fetched, (status, result))
+cache = {}
+
+# Prefetches still running for each user (token fingerprint -> {key: task}), replaced when the user moves on
+batches = {}
+
+# Number of times each user really opened each (group, endpoint): token fingerprint -> {(group, endpoint): count},
+# used to rank the candidates of that user
+history = {}
+
+# Start times of the prefetches of each user during the last minute
+spent = {}
+
+# Counters: prefetches scheduled, finished and cancelled, and real requests served from the cache,
+# served by joining a prefetch still in flight, or fetched normally
+stats = {"scheduled": 0, "fetched": 0, "cancelled": 0, "over_budget": 0, "hits": 0, "joined": 0, "misses": 0}
+
+# Semaphore bounding the concurrent prefetches, created on first use inside the running event loop
+semaphore = None
+
+
+# Function to cancel the prefetches of a user that are still running
+def cancel_batch(fingerprint):
+    for task in batches.pop(fingerprint, {}).values():
+        if not task.done():
+            task.cancel()
+            stats["cancelled"] += 1
+
+
+# Function to cancel every running prefetch, e.g. on exit
+def cancel_all():
+    for fingerprint in list(batches):
+        cancel_batch(fingerprint)
+
+
+# Function to check and spend one unit of a user's prefetch budget
+def take_budget(fingerprint):
+    now = time.monotonic()
+    started = spent.setdefault(fingerprint, deque())
+    while started and now - started[0] > 60:
+        started.popleft()
+    if len(started) >= PREFETCH_BUDGET:
+        stats["over_budget"] += 1
+        return False
+    started.append(now)
+    return True
+
+
+# Function to run one prefetch and keep its result for the next real request
+async def prefetch(key, endpoint, access_token, parse):
+    global semaphore
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+    try:
+        async with semaphore:
+            status, result = await single_flight.fetch_json(endpoint, access_token, parse)
+    except Exception:
+        # A failed prefetch is left to the real request, which reports its own error
+        return None, None
+    stats["fetched"] += 1
+
+    # Only successful listings are kept, the oldest entries make room for new ones
+    if status == 200:
+        cache[key] = (time.monotonic(), (status, result))
+        while len(cache) > CACHE_SIZE:
+            del cache[next(iter(cache))]
+    return status, result
+
+
+# Function to start prefetching the most likely next requests after a list was shown to the user
+# candidates is a list of (group, endpoint, parse) in the order the entries were listed
+def schedule(access_token, candidates):
+    fingerprint = single_flight.token_fingerprint(access_token)
+
+    # A new list replaces whatever was still being prefetched for the previous one
+    cancel_batch(fingerprint)
+
+    # Entries the user opened before come first, the others keep their listed order
+    opened = history.get(fingerprint, {})
+    ranked = sorted(candidates, key=lambda candidate: -opened.get(candidate[:2], 0))
+
+    batch = {}
+    for group, endpoint, parse in ranked[:PREFETCH_TOP_N]:
+        key = (group, endpoint, fingerprint)
+        entry = cache.get(key)
+        if entry and time.monotonic() - entry[0] < PREFETCH_TTL:
+            continue
+        if not take_budget(fingerprint):
+            break
+        batch[key] = asyncio.ensure_future(prefetch(key, endpoint, access_token, parse))
+        stats["scheduled"] += 1
+    batches[fingerprint] = batch
+
+
+# Function to GET an Autodesk endpoint as JSON, served from a prefetch when one covered it
+# Opening anything stops the prefetches of the user's previous list, the choice has been made
+async def get_json(group, endpoint, access_token, parse=None):
+    fingerprint = single_flight.token_fingerprint(access_token)
+    key = (group, endpoint, fingerprint)
+    opened = history.setdefault(fingerprint, {})
+    opened[(group, endpoint)] = opened.get((group, endpoint), 0) + 1
+
+    task = batches.get(fingerprint, {}).pop(key, None)
+    cancel_batch(fingerprint)
+
+    entry = cache.pop(key, None)
+    if entry and time.monotonic() - entry[0] < PREFETCH_TTL:
+        stats["hits"] += 1
+        return entry[1]
+    if task is not None and not task.done():
+        # A prefetch that failed returns no status, the request is then made as if nothing had been prefetched
+        status, result = await task
+        if status is not None:
+            stats["joined"] += 1
+            return status, result
+
+    stats["misses"] += 1
+    return await single_flight.get_json(group, endpoint, access_token, parse)
+
+
+# Function to summarise how often the next step was served by a prefetch
+def report():
+    served = stats["hits"] + stats["joined"]
+    requests = served + stats["misses"]
+    hit_rate = served / requests * 100 if requests else 0.0
+    return (f"prefetch: {hit_rate:.0f}% of {requests} listings served by a prefetch "
+            f"({stats['hits']} cached, {stats['joined']} in flight), {stats['fetched']} fetched, "
+            f"{stats['cancelled']} cancelled, {stats['over_budget']} over budget")
@@ -0,0 +1,170 @@
+# Import statements
+import asyncio  # For the heartbeat that measures how long the event loop is held
+import collections  # For counting identical stacks
+import os  # For building the profile paths and reading the settings from environment variables
+import sys  # For reading the current stack of every thread
+import threading  # The sampler runs in its own thread so it keeps running while the event loop is blocked
+import time  # For timing samples, turns and stalls
+import traceback  # For the stack traces of stalls
+
+# Repository root, profiles are written to profiles/<session start> below it
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(REPO_DIR, 'profiles'))
+
+# Seconds between two samples of every thread
+SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
+
+# A callback holding the event loop for longer than this many milliseconds is reported as a stall
+STALL_MS = int(os.getenv('PROFILE_STALL_MS', '100'))
+
+# Seconds between two heartbeats of the event loop
+HEARTBEAT_INTERVAL = 0.01
+
+# Threads whose innermost frame is in one of these files are waiting for work, they are left out of the profile
+IDLE_FILES = ("threading.py", "queue.py", "thread.py", "selectors.py")
+
+# State of the profiling session, None when profiling is off
+# {"directory", "stop", "thread", "heartbeat", "beat", "stall", "stalls", "turn", "turns", "samples", "session_samples"}
+session = None
+
+
+# Function to turn a frame and its callers into one line of the collapsed stack format, outermost frame first
+def collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+# Function to check whether a thread is idle, i.e. waiting in a lock, queue or selector
+def is_idle(frame):
+    return os.path.basename(frame.f_code.co_filename) in IDLE_FILES
+
+
+# Function run by the sampler thread: counts the stacks of all threads during a turn and watches the heartbeat of the loop
+# Every sample is weighted with the microseconds since the previous one, a busy interpreter wakes the sampler late
+# and unweighted counts would understate exactly the code that holds the GIL
+def sample(loop_thread_id, stop):
+    own_id = threading.get_ident()
+    names = {}
+    previous = time.monotonic()
+    while not stop.wait(SAMPLE_INTERVAL):
+        now = time.monotonic()
+        weight, previous = max(1, int((now - previous) * 1e6)), now
+        frames = sys._current_frames()
+        watch_stall(now, frames.get(loop_thread_id))
+
+        if session["turn"] is None:
+            continue
+        for thread_id, frame in frames.items():
+            if thread_id == own_id or (thread_id != loop_thread_id and is_idle(frame)):
+                continue
+            if thread_id not in names:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            thread_name = "event loop" if thread_id == loop_thread_id else names.get(thread_id, str(thread_id))
+            session["samples"][f"{thread_name};{collapse(frame)}"] += weight
+
+
+# Function to report the loop as stalled when its last heartbeat is older than the threshold
+# The stack is taken while the loop is still blocked, so it shows the callback that holds it
+def watch_stall(now, loop_frame):
+    lag = now - session["beat"] - HEARTBEAT_INTERVAL
+    stall = session["stall"]
+    if stall is None and lag * 1000 > STALL_MS and loop_frame is not None:
+        session["stall"] = {"started": session["beat"], "stack": "".join(traceback.format_stack(loop_frame))}
+    elif stall is not None and session["beat"] > stall["started"]:
+        session["stall"] = None
+        end_stall(stall, session["beat"] - stall["started"] - HEARTBEAT_INTERVAL)
+
+
+# Function to print and log a stall once the loop runs again
+def end_stall(stall, duration):
+    session["stalls"] += 1
+    turn = session["turn"]["number"] if session["turn"] else "between turns"
+    print(f"[profile] event loop blocked for {duration * 1000:.0f} ms (turn {turn}), stack when detected:\n{stall['stack']}")
+    with open(os.path.join(session["directory"], "stalls.log"), "a") as file:
+        file.write(f"--- {time.strftime('%H:%M:%S')} turn {turn}: event loop blocked for {duration * 1000:.0f} ms\n{stall['stack']}\n")
+
+
+# Coroutine marking the event loop as alive, a late heartbeat means a callback held the loop
+async def heartbeat():
+    while True:
+        session["beat"] = time.monotonic()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+
+# Function to write the stacks in the collapsed stack format read by flamegraph.pl, speedscope and inferno, weights in microseconds
+def write_folded(path, samples):
+    with open(path, "w") as file:
+        for stack, count in samples.most_common():
+            file.write(f"{stack} {count}\n")
+
+
+# Function to start profiling, called from inside the running event loop
+def start(stall_ms=None):
+    global session, STALL_MS
+    if session is not None:
+        return
+    STALL_MS = stall_ms or STALL_MS
+    directory = os.path.join(PROFILE_DIR, time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(directory, exist_ok=True)
+
+    stop = threading.Event()
+    session = {"directory": directory, "stop": stop, "beat": time.monotonic(), "stall": None, "stalls": 0, "turn": None,
+               "samples": collections.Counter(), "session_samples": collections.Counter(), "turns": 0}
+    session["heartbeat"] = asyncio.ensure_future(heartbeat())
+    session["thread"] = threading.Thread(target=sample, args=(threading.get_ident(), stop), name="profiler", daemon=True)
+    session["thread"].start()
+    print(f"[profile] sampling every {SAMPLE_INTERVAL * 1000:.0f} ms, stalls over {STALL_MS} ms reported, profiles in {directory}")
+
+
+# Function to start the profile of one turn
+def begin_turn(user_input):
+    if session is None:
+        return
+    session["turns"] += 1
+    session["samples"] = collections.Counter()
+    session["turn"] = {"number": session["turns"], "input": user_input, "started": time.perf_counter(), "stalls": session["stalls"]}
+
+
+# Function to end the profile of a turn, write it to disk and print a short summary
+def end_turn():
+    if session is None or session["turn"] is None:
+        return
+    turn, samples = session["turn"], session["samples"]
+    session["turn"] = None
+    session["session_samples"].update(samples)
+
+    path = os.path.join(session["directory"], f"turn-{turn['number']:03d}.folded")
+    write_folded(path, samples)
+
+    # Self time of the event loop thread shows which functions held it, waiting in the selector is idle time
+    elapsed = time.perf_counter() - turn["started"]
+    leaves = collections.Counter()
+    for stack, microseconds in samples.items():
+        leaf = stack.rsplit(";", 1)[-1]
+        if stack.startswith("event loop;") and not leaf.startswith("select (selectors.py"):
+            leaves[leaf] += microseconds
+    top = ", ".join(f"{leaf} {microseconds / 1000:.0f} ms" for leaf, microseconds in leaves.most_common(3))
+
+    print(f"[profile] turn {turn['number']}: {elapsed:.2f}s, event loop busy for {sum(leaves.values()) / 1e6:.2f}s, "
+          f"{session['stalls'] - turn['stalls']} stalls, written to {path}")
+    if top:
+        print(f"[profile] top of the event loop: {top}")
+
+
+# Function to stop profiling and write the profile of the whole session
+def stop():
+    global session
+    if session is None:
+        return
+    end_turn()
+    session["stop"].set()
+    session["thread"].join()
+    session["heartbeat"].cancel()
+    path = os.path.join(session["directory"], "session.folded")
+    write_folded(path, session["session_samples"])
+    print(f"[profile] {session['turns']} turns, {session['stalls']} stalls, session profile written to {path}")
+    session = None
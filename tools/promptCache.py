@@ -0,0 +1,125 @@
+# Import statements
+import hashlib  # For keying answers by a hash of the model, prompt template and inputs
+import json  # Import json to persist the cache
+import os  # For building paths and reading environment variables
+import time  # For limiting how often the cache is written to disk
+from collections import OrderedDict  # Least recently used order of the cached answers
+from dotenv import load_dotenv  # For loading environment variables from a .env file
+
+# Load .env file
+load_dotenv()
+
+# Repository root, the cache is kept next to the folder tree and the embedding index
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# File the cache is persisted to between sessions, and the number of answers kept
+CACHE_FILE = os.getenv('PROMPT_CACHE_FILE', os.path.join(REPO_DIR, 'embeddings', 'prompt_cache.json'))
+CACHE_SIZE = int(os.getenv('PROMPT_CACHE_SIZE', '2000'))
+
+# Minimum seconds between two writes of the cache
+SAVE_INTERVAL = 30
+
+# Cached answers, least recently used first: key -> {"scope", "answer", "tokens"}
+entries = None
+
+# Key of the current answer of each scope, a scope being one question (template and requested name) about one listing,
+# e.g. the id of folder "Drawings" among the subfolders of one folder; the same question about another listing has its own scope
+scopes = {}
+
+# Counters: answers served from the cache, prompts sent to the LLM, tokens the hits did not spend,
+# and cached answers dropped because the request built from them failed
+stats = {"hits": 0, "misses": 0, "tokens_saved": 0, "forgotten": 0}
+
+# Whether the cache changed since it was last written, and when that was
+dirty = False
+last_saved = 0.0
+
+
+# Function to hash a string
+def digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Function to build the key of a prompt, the rendered prompt holds both the template and its inputs
+def make_key(model, max_tokens, prompt):
+    return digest(f"{model}\0{max_tokens}\0{prompt}")
+
+
+# Function to get the cache, loaded from disk on first use
+def get_entries():
+    global entries
+    if entries is None:
+        entries = OrderedDict()
+        if os.path.exists(CACHE_FILE):
+            with open(CACHE_FILE, "r") as file:
+                entries.update(json.load(file))
+        for key, entry in entries.items():
+            scopes[entry["scope"]] = key
+    return entries
+
+
+# Function to look up the answer to a prompt, None when it was never asked
+def get(key):
+    entry = get_entries().get(key)
+    if entry is None:
+        stats["misses"] += 1
+        return None
+    entries.move_to_end(key)
+    stats["hits"] += 1
+    stats["tokens_saved"] += entry["tokens"]
+    return entry["answer"]
+
+
+# Function to store the answer to a prompt, listing identifies the listing the question was about (e.g. "folder:<folder id>")
+# An answer about a changed version of a listing replaces the one about the previous version, which can never be asked again
+def put(key, template, query, listing, answer, tokens=0):
+    global dirty
+    get_entries()
+    scope = digest(f"{listing}\0{template}\0{query}")
+    previous = scopes.get(scope)
+    if previous is not None and previous != key:
+        entries.pop(previous, None)
+    scopes[scope] = key
+    entries[key] = {"scope": scope, "answer": answer, "tokens": tokens}
+
+    # The least recently used answers make room for new ones
+    while len(entries) > CACHE_SIZE:
+        evicted_key, evicted = entries.popitem(last=False)
+        if scopes.get(evicted["scope"]) == evicted_key:
+            del scopes[evicted["scope"]]
+    dirty = True
+    save_cache()
+
+
+# Function to drop the answer to a prompt, e.g. a wrong or made-up id the Autodesk API rejected, so the next lookup asks the LLM again
+def forget(key):
+    global dirty
+    entry = get_entries().pop(key, None)
+    if entry is None:
+        return
+    if scopes.get(entry["scope"]) == key:
+        del scopes[entry["scope"]]
+    stats["forgotten"] += 1
+    dirty = True
+    save_cache()
+
+
+# Function to write the cache to disk, at most once every SAVE_INTERVAL seconds unless forced
+def save_cache(force=False):
+    global dirty, last_saved
+    if entries is None or not dirty or (not force and time.monotonic() - last_saved < SAVE_INTERVAL):
+        return
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    with open(CACHE_FILE + ".tmp", "w") as file:
+        json.dump(entries, file)
+    os.replace(CACHE_FILE + ".tmp", CACHE_FILE)
+    dirty = False
+    last_saved = time.monotonic()
+
+
+# Function to summarise the hit rate and the tokens saved
+def report():
+    asked = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / asked * 100 if asked else 0.0
+    return (f"prompt cache: {hit_rate:.0f}% of {asked} lookups answered from the cache, {stats['tokens_saved']} tokens saved, "
+            f"{stats['forgotten']} rejected answers dropped")
@@ -0,0 +1,186 @@
+# Import statements
+import json  # Import json to append routing decisions to the log
+import os  # For building the log path and reading the router settings from environment variables
+import re  # For recognising direct lookup and download requests
+import time  # For measuring the latency of every turn
+from dotenv import load_dotenv  # For loading environment variables from a .env file
+import tools.embeddings as embeddings  # Search of the embedding index and formatting of its matches
+import tools.facets as facets  # Known file extensions, a named extension marks a file reference
+import tools.signedUrlCache as signed_url_cache  # Signed download URLs of the matched files
+
+# Load .env file
+load_dotenv()
+
+# Repository root, the routing log is kept next to the embedding index
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# File every routing decision is appended to, one JSON object per line
+ROUTER_LOG = os.getenv('ROUTER_LOG', os.path.join(REPO_DIR, 'embeddings', 'router_log.jsonl'))
+
+# A fast-path answer needs a best match at least this similar, weaker matches go to the LLM
+MIN_SIMILARITY = float(os.getenv('ROUTER_MIN_SIMILARITY', '0.45'))
+
+# A download is only signed straight away when the best match leads the next one by this much, otherwise the matches are listed
+CONFIDENT_MARGIN = float(os.getenv('ROUTER_CONFIDENT_MARGIN', '0.05'))
+
+# Longer requests are rarely a bare file name and go to the LLM
+MAX_QUERY_WORDS = 12
+
+# Requests opening with a download or lookup verb, e.g. "get me A-101 floor plan.pdf" or "where is the fire strategy report?"
+REQUEST_PATTERN = re.compile(
+    r"^\s*(?:(?:please|pls|can you|could you|would you)\s+)?"
+    r"(?P<verb>download|get|send|give|fetch|grab|pull|find|search(?:\s+for)?|look\s+for|locate|show|where\s+is|where's|i\s+need|i\s+want)"
+    r"\s+(?:me\s+|us\s+)?(?P<rest>.+?)[\s?.!]*(?:please)?[\s?.!]*$",
+    re.IGNORECASE,
+)
+
+# Verbs asking for the file itself, the others only ask where it is
+DOWNLOAD_VERBS = {"download", "get", "send", "give", "fetch", "grab", "pull", "i need", "i want"}
+
+# Verbs just as common in conversation ("I need help", "give me a summary of the project", "get started"),
+# a request with one of them only goes to the fast path when it names a file
+CONVERSATIONAL_VERBS = {"get", "give", "send", "show", "i need", "i want"}
+
+# Signs that a request names a file: a quoted name, a file extension ("floor plan.pdf", "the dwg") or a drawing number ("A-101", "S201")
+FILE_REFERENCE_PATTERN = re.compile(
+    r"\"[^\"]+\"|'[^']+'|\.[A-Za-z0-9]{2,5}\b"
+    r"|\b(?:" + "|".join(sorted({extension for extensions in facets.FAMILIES.values() for extension in extensions})) + r")\b"
+    r"|\b[A-Za-z]{1,4}[-_.]?\d{2,}[\w.-]*",
+    re.IGNORECASE,
+)
+
+# Words around the file name that are not part of it
+FILLER_PATTERN = re.compile(r"^(?:(?:the|a|an)\s+)?(?:(?:download\s+)?(?:link|url)\s+(?:for|to|of)\s+)?(?:(?:the|a|an)\s+)?|\s+(?:for me|file|please)$",
+                            re.IGNORECASE)
+
+# Requests pointing back at earlier results ("download the second one", "download the file") need the conversation and go to the LLM
+REFERENCE_PATTERN = re.compile(r"^(?:it|that|this|them|those|these|one|file|the\s+(?:first|second|third|last|other|same|previous)\b.*)$|\bone\b$",
+                               re.IGNORECASE)
+
+# Questions and requests about the assistant itself ("show me how this works") are conversational
+CONVERSATION_PATTERN = re.compile(r"^(?:how|what|why|which|who|when|whether|if)\b|\byou\b", re.IGNORECASE)
+
+# Version and project written into the request, e.g. "version 2", "v3", "in project Tower B"
+VERSION_PATTERN = re.compile(r"\b(?:version|v)\s*(\d+)(?:\s+of\b)?", re.IGNORECASE)
+PROJECT_PATTERN = re.compile(r"\b(?:in|from)\s+(?:the\s+)?project\s+\"?([^\"]+?)\"?$", re.IGNORECASE)
+
+# Counters per route: turns answered on the fast path or by the LLM and their total seconds, and the reasons for LLM turns
+stats = {"fast": 0, "llm": 0, "fast_seconds": 0.0, "llm_seconds": 0.0, "reasons": {}}
+
+
+# Function to recognise a direct lookup or download request
+# Returns {"intent": "download" | "lookup", "query", "version", "project_name"}, or None and the reason the LLM is needed
+def parse_request(text):
+    match = REQUEST_PATTERN.match(text)
+    if not match:
+        return None, "no lookup or download verb"
+    verb = " ".join(match.group("verb").lower().split())
+    query = match.group("rest")
+
+    version = 0
+    version_match = VERSION_PATTERN.search(query)
+    if version_match:
+        version = int(version_match.group(1))
+        query = (query[:version_match.start()] + query[version_match.end():]).strip()
+    project_name = ""
+    project_match = PROJECT_PATTERN.search(query)
+    if project_match:
+        project_name = project_match.group(1).strip()
+        query = query[:project_match.start()].strip()
+
+    query = FILLER_PATTERN.sub("", query).strip(" ,")
+    if not query:
+        return None, "no file named"
+    if REFERENCE_PATTERN.search(query):
+        return None, "refers to earlier results"
+    if CONVERSATION_PATTERN.search(query):
+        return None, "conversational"
+    if len(query.split()) > MAX_QUERY_WORDS:
+        return None, "too long for a file name"
+    if verb in CONVERSATIONAL_VERBS and not FILE_REFERENCE_PATTERN.search(query):
+        return None, "no file reference"
+    intent = "download" if verb in DOWNLOAD_VERBS else "lookup"
+
+    # Quotes only mark the name, the embedding is of the name itself
+    query = " ".join(query.replace('"', " ").split())
+    return {"intent": intent, "query": query, "version": version, "project_name": project_name}, None
+
+
+# Function to start the routing decision of a turn, it goes to the LLM unless a direct answer is found
+def new_decision(text, reason=None):
+    return {"started": time.perf_counter(), "input": text, "route": "llm", "intent": None, "reason": reason, "similarity": None,
+            "answer": None, "content": None}
+
+
+# Function to try to answer a turn without the chat LLM
+# Returns the routing decision; its "answer" is the reply for the user and "content" the message kept in the conversation,
+# both None when the turn has to go to the LLM
+async def answer(text, access_token):
+    decision = new_decision(text)
+    request, decision["reason"] = parse_request(text)
+    if request is None:
+        return decision
+    decision["intent"] = request["intent"]
+
+    try:
+        matches = await embeddings.find_files(request["query"], project_name=request["project_name"], version=request["version"],
+                                              access_token=access_token)
+    except PermissionError as e:
+        # The projects of the user could not be verified, the assistant could not search either
+        decision["answer"] = str(e)
+        decision["content"] = f"results: {e}"
+        decision["route"], decision["reason"] = "fast", "access unverified"
+        return decision
+    if not matches or matches[0]["similarity"] < MIN_SIMILARITY:
+        decision["reason"] = "no confident match"
+        decision["similarity"] = matches[0]["similarity"] if matches else None
+        return decision
+    best = matches[0]
+    decision["similarity"] = best["similarity"]
+
+    # A clear download is signed right away, anything else lists the matches so the user can pick one
+    confident = len(matches) == 1 or best["similarity"] - matches[1]["similarity"] >= CONFIDENT_MARGIN
+    if request["intent"] == "download" and confident:
+        status, url = await signed_url_cache.get_signed_url(access_token, best["href"])
+        if status == 200:
+            location = "/".join(part for part in (best['project_name'], best['folder_path']) if part)
+            decision["answer"] = f"Here is the download link for {best['file_name']}" + (f" ({location})" if location else "") \
+                + (f", version {best['version']}" if best['version'] else "") + f":\n{url}"
+            decision["content"] = f"{embeddings.describe_matches([best])}\n\ndownload URLS: {url}"
+        else:
+            decision["reason"] = f"signed URL failed ({status})"
+            return decision
+    else:
+        decision["content"] = embeddings.describe_matches(matches)
+        decision["answer"] = "\n".join(decision["content"].split("\n")[:len(matches) + 1]) + "\nWhich file would you like to download?"
+    decision["route"], decision["reason"] = "fast", request["intent"]
+    return decision
+
+
+# Function to record a finished turn: counters and one line in the routing log
+def log(decision):
+    if decision is None:
+        return
+    seconds = time.perf_counter() - decision["started"]
+    route = decision["route"]
+    stats[route] += 1
+    stats[f"{route}_seconds"] += seconds
+    if route == "llm":
+        stats["reasons"][decision["reason"]] = stats["reasons"].get(decision["reason"], 0) + 1
+
+    os.makedirs(os.path.dirname(ROUTER_LOG), exist_ok=True)
+    with open(ROUTER_LOG, "a") as file:
+        file.write(json.dumps({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "input": decision["input"], "route": route,
+                               "intent": decision["intent"], "reason": decision["reason"], "similarity": decision["similarity"],
+                               "seconds": round(seconds, 3)}) + "\n")
+
+
+# Function to summarise the routing: coverage of the fast path and the mean latency of both routes
+def report():
+    turns = stats["fast"] + stats["llm"]
+    if not turns:
+        return "router: no turns"
+    coverage = stats["fast"] / turns * 100
+    fast_mean = stats["fast_seconds"] / stats["fast"] if stats["fast"] else 0.0
+    llm_mean = stats["llm_seconds"] / stats["llm"] if stats["llm"] else 0.0
+    return f"router: {stats['fast']} of {turns} turns on the fast path ({coverage:.0f}%), mean {fast_mean:.2f}s fast vs {llm_mean:.2f}s LLM"
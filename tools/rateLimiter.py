@@ -0,0 +1,219 @@
+# Import statements
+import asyncio  # For sleeping between retries and capping concurrency
+import contextlib  # For turning the rate-limited request into an async context manager
+import os  # For reading the retry settings from environment variables
+import random  # For adding jitter to the backoff delays
+import sys  # For finding the tools package when this file is run as a script
+import time  # For refilling the token buckets
+from email.utils import parsedate_to_datetime  # For parsing Retry-After headers given as an HTTP date
+from urllib.parse import urlparse  # For classifying Autodesk endpoints by their path
+import openai  # For recognising throttling and server errors raised by the OpenAI client
+
+# Run as python tools/rateLimiter.py the repository root is not on the import path yet
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tools.httpSession as http_session  # Shared aiohttp session for Autodesk API requests
+
+# Requests per second, burst size and concurrent requests allowed for each upstream and endpoint class
+# Autodesk quotas are per minute and per endpoint family, OpenAI quotas are per model
+LIMITS = {
+    "autodesk:project": (5, 10, 10),  # hubs and projects listings
+    "autodesk:data": (5, 10, 10),  # folder contents
+    "autodesk:oss": (3, 5, 5),  # signed download URLs
+    "autodesk:other": (5, 10, 10),
+    "openai:chat": (8, 16, 8),
+    "openai:embeddings": (20, 40, 16),
+}
+
+# Retry settings for throttled (429) and failed (5xx) requests
+MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '5'))
+BASE_DELAY = float(os.getenv('RATE_LIMIT_BASE_DELAY', '0.5'))
+MAX_DELAY = float(os.getenv('RATE_LIMIT_MAX_DELAY', '30'))
+
+# Status codes worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Token bucket whose rate adapts to throttling: halved on every 429, then slowly raised back to the configured rate
+class TokenBucket:
+
+    def __init__(self, rate, capacity, concurrency):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # Set from Retry-After so every caller waits, not only the throttled one
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.lock = asyncio.Lock()
+        self.throttled = 0
+
+    # Wait until a token is available (and any Retry-After pause is over), then take it
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    # Slow the bucket down after the upstream throttled us, and pause it for the Retry-After period
+    def penalise(self, retry_after=None):
+        self.throttled += 1
+        self.rate = max(self.max_rate / 20, self.rate / 2)
+        self.tokens = 0
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    # Raise the rate back towards the configured limit after a successful request
+    def reward(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+# Buckets are created on first use and shared by the whole process
+buckets = {}
+
+
+# Function to get the bucket of an endpoint class
+def get_bucket(endpoint_class):
+    if endpoint_class not in buckets:
+        buckets[endpoint_class] = TokenBucket(*LIMITS.get(endpoint_class, LIMITS["autodesk:other"]))
+    return buckets[endpoint_class]
+
+
+# Function to classify an Autodesk URL into the endpoint class its quota applies to
+def classify(url):
+    path = urlparse(url).path
+    if path.startswith("/oss/"):
+        return "autodesk:oss"
+    if path.startswith("/data/"):
+        return "autodesk:data"
+    if path.startswith("/project/"):
+        return "autodesk:project"
+    return "autodesk:other"
+
+
+# Function to read a Retry-After header, given either in seconds or as an HTTP date
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+# Function to compute the delay before the next attempt: Retry-After when given, otherwise exponential backoff with full jitter
+def backoff_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        return min(MAX_DELAY, retry_after)
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+# Rate-limited replacement for session.request(), yields the final response after throttling and server errors were retried
+@contextlib.asynccontextmanager
+async def request(method, url, endpoint_class=None, **kwargs):
+    bucket = get_bucket(endpoint_class or classify(url))
+    session = http_session.get_session()
+
+    for attempt in range(MAX_RETRIES + 1):
+        await bucket.acquire()
+
+        # The concurrency slot is held until the caller has read the response, but not while backing off
+        await bucket.semaphore.acquire()
+        try:
+            response = await session.request(method, url, **kwargs)
+
+            if response.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                if response.status < 400:
+                    bucket.reward()
+                try:
+                    yield response
+                finally:
+                    response.release()
+                return
+
+            # Throttled or failed: free the connection, back off and try again
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status == 429:
+                bucket.penalise(retry_after)
+            response.release()
+        finally:
+            bucket.semaphore.release()
+        await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+
+# Rate-limited GET, used like session.get()
+def get(url, endpoint_class=None, **kwargs):
+    return request("GET", url, endpoint_class, **kwargs)
+
+
+# Function to call the synchronous OpenAI client through the limiter, the call runs in a worker thread so the event loop is not blocked
+async def call_openai(endpoint_class, function, **kwargs):
+    bucket = get_bucket(endpoint_class)
+    for attempt in range(MAX_RETRIES + 1):
+        await bucket.acquire()
+        try:
+            async with bucket.semaphore:
+                result = await asyncio.to_thread(function, **kwargs)
+            bucket.reward()
+            return result
+        except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            response = getattr(e, "response", None)
+            retry_after = parse_retry_after(response.headers.get("retry-after")) if response is not None else None
+            if isinstance(e, openai.RateLimitError):
+                bucket.penalise(retry_after)
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+
+# Local check: a server that throttles above its quota, hammered by many concurrent requests through the limiter
+if __name__ == "__main__":
+    from aiohttp import web
+
+    async def main(requests_total=200, quota_per_second=20):
+        served = []
+
+        # Throttling server: answers 429 with Retry-After once more than quota_per_second requests arrived in the last second
+        async def handle(request):
+            now = time.monotonic()
+            served[:] = [moment for moment in served if now - moment < 1]
+            if len(served) >= quota_per_second:
+                return web.Response(status=429, headers={"Retry-After": "1"})
+            served.append(now)
+            return web.json_response({"ok": True})
+
+        app = web.Application()
+        app.router.add_get("/data/v1/test", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 8765).start()
+
+        # Configure the limiter slightly above the quota so it has to adapt to the 429 responses
+        LIMITS["autodesk:data"] = (quota_per_second * 1.5, quota_per_second, 50)
+
+        async def one():
+            async with get("http://127.0.0.1:8765/data/v1/test") as response:
+                return response.status
+
+        start = time.monotonic()
+        statuses = await asyncio.gather(*[one() for _ in range(requests_total)])
+        elapsed = time.monotonic() - start
+        print(f"{statuses.count(200)}/{requests_total} succeeded in {elapsed:.1f}s "
+              f"({statuses.count(200) / elapsed:.1f} req/s against a quota of {quota_per_second} req/s), "
+              f"{get_bucket('autodesk:data').throttled} throttled responses retried")
+
+        await http_session.close_session()
+        await runner.cleanup()
+
+    asyncio.run(main())
@@ -0,0 +1,298 @@
+# Import statements
+import asyncio  # For merging the partial results of the workers off the event loop
+import os  # For reading the number of workers from environment variables
+import sys  # For finding the tools package when this file is run as a script
+import threading  # For publishing and releasing blocks from the refresh thread and the garbage collector
+import weakref  # For releasing the blocks of a snapshot once it is gone
+import numpy as np  # For scoring the rows of each partition
+from concurrent.futures import ProcessPoolExecutor  # Pool of worker processes scanning the embedding matrix
+from multiprocessing import get_context, shared_memory  # Shared memory holding the matrix once for all workers
+
+# Run as python tools/searchExecutor.py the repository root is not on the import path yet
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tools.searchIndex as search_index  # Snapshots, facet filtering and formatting of matches
+
+# Number of worker processes, one per core by default; 0 or 1 keeps every search in a thread of this process
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', str(os.cpu_count() or 1)))
+
+# Searches scoring fewer rows than this run in a thread, splitting them costs more than it saves
+MIN_PARALLEL_ROWS = int(os.getenv('SEARCH_MIN_PARALLEL_ROWS', '200000'))
+
+# Names of released blocks a task carries, a worker that missed more releases than this detaches every block it does not need
+RELEASED_KEPT = 256
+
+# Pool of worker processes, None until start() is called
+pool = None
+
+# Shared memory block of every published shard matrix: name -> {"block", "snapshots": number of live snapshots using it,
+# "linked": False once unlinked by shutdown()}; a shard reused by a new snapshot keeps its block
+# A block is closed once no snapshot using it is alive, numpy views do not keep the memory of a closed block mapped
+blocks = {}
+
+# Held while blocks are published or released, releases run when a snapshot is garbage collected, in any thread
+blocks_lock = threading.RLock()
+
+# Names of the unlinked blocks, oldest first, and the number of blocks unlinked before the first of them
+released = []
+released_before = 0
+
+# Shared memory blocks attached by a worker process: name -> (block, matrix), and the number of releases the worker has seen
+attached = {}
+worker_released = 0
+
+
+# Function to move the shard matrices of a snapshot into shared memory, called before the snapshot is swapped in
+# Every shard gets its own block, so a shard reused from the previous snapshot keeps the block it already has and only
+# the rewritten shards are copied; the shard matrix becomes a view of its block, nothing is copied per query
+def publish(snapshot):
+    names = []
+    with blocks_lock:
+        for shard in snapshot.shards:
+            if not len(shard["matrix"]):
+                shard["shared"] = None
+                continue
+            shared = shard.get("shared")
+            if shared is None or shared[0] not in blocks or not blocks[shared[0]]["linked"]:
+                block = shared_memory.SharedMemory(create=True, size=shard["matrix"].nbytes)
+                matrix = np.ndarray(shard["matrix"].shape, dtype=np.float32, buffer=block.buf)
+                matrix[:] = shard["matrix"]
+                shard["matrix"] = matrix
+                shared = shard["shared"] = (block.name, matrix.shape)
+                blocks[block.name] = {"block": block, "snapshots": 0, "linked": True}
+            blocks[shared[0]]["snapshots"] += 1
+            names.append(shared[0])
+    snapshot.shared = names
+
+    # The blocks stay linked for as long as the snapshot can be searched, also by a search that started before the next swap
+    weakref.finalize(snapshot, release, names)
+
+
+# Function to unlink a block, workers attached to it detach when their next task lists it
+def unlink(name):
+    global released_before
+    blocks[name]["block"].unlink()
+    blocks[name]["linked"] = False
+    released.append(name)
+    if len(released) > RELEASED_KEPT:
+        released_before += len(released) - RELEASED_KEPT
+        del released[:len(released) - RELEASED_KEPT]
+
+
+# Function to release the blocks of a snapshot that is gone, blocks no other snapshot uses are unlinked and closed
+def release(names):
+    with blocks_lock:
+        for name in names:
+            entry = blocks[name]
+            entry["snapshots"] -= 1
+            if entry["snapshots"] == 0:
+                if entry["linked"]:
+                    unlink(name)
+                entry["block"].close()
+                del blocks[name]
+
+
+# Function to attach a worker process to the shared matrices a task needs, once per block
+# Blocks released since the previous task are closed first; when the worker missed more releases than the task lists,
+# every block the task does not need is closed, a block that is needed again is attached again
+def attach(shared, released_count, recent):
+    global worker_released
+    missed = released_count - worker_released
+    if missed > 0:
+        needed = {name for name, _ in shared.values()}
+        stale = list(attached) if missed > len(recent) else recent[len(recent) - missed:]
+        for name in stale:
+            if name in attached and name not in needed:
+                attached.pop(name)[0].close()
+        worker_released = released_count
+
+    matrices = {}
+    for position, (name, shape) in shared.items():
+        if name not in attached:
+            block = shared_memory.SharedMemory(name=name)
+            attached[name] = (block, np.ndarray(shape, dtype=np.float32, buffer=block.buf))
+        matrices[position] = attached[name][1]
+    return matrices
+
+
+# Function run in a worker process: score one partition of the candidate rows and return its best k rows
+# A partition is a list of (candidate position, rows) pieces, rows being a (start, end) range of an unfiltered shard
+# or an array of row ids of a filtered one; shared maps each candidate position to the (name, shape) of its block
+def score_partition(shared, partition, query, top_k, released_count=0, recent=()):
+    matrices = attach(shared, released_count, recent)
+    similarities, positions, row_ids = [], [], []
+    for position, rows in partition:
+        if isinstance(rows, tuple):
+            scores = matrices[position][rows[0]:rows[1]] @ query
+            ids = np.arange(rows[0], rows[1])
+        else:
+            scores = matrices[position][rows] @ query
+            ids = rows
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        similarities.append(scores[best])
+        positions.append(np.full(k, position))
+        row_ids.append(ids[best])
+    return np.concatenate(similarities), np.concatenate(positions), np.concatenate(row_ids)
+
+
+# Function to split the candidate rows of a query into one partition per worker with about the same number of rows
+def partition_rows(candidates, workers):
+    pieces = []
+    for position, (shard, row_ids) in enumerate(candidates):
+        pieces.append((position, (0, len(shard["catalog"])) if row_ids is None else row_ids.astype(np.int64)))
+    total = sum(rows[1] - rows[0] if isinstance(rows, tuple) else len(rows) for _, rows in pieces)
+    quota = -(-total // workers)
+
+    partitions, current, filled = [], [], 0
+    for position, rows in pieces:
+        while True:
+            size = rows[1] - rows[0] if isinstance(rows, tuple) else len(rows)
+            take = min(size, quota - filled)
+            if take == size:
+                current.append((position, rows))
+                filled += size
+                break
+            # Cut the piece where the partition is full, the rest goes to the next partition
+            current.append((position, (rows[0], rows[0] + take) if isinstance(rows, tuple) else rows[:take]))
+            rows = (rows[0] + take, rows[1]) if isinstance(rows, tuple) else rows[take:]
+            partitions.append(current)
+            current, filled = [], 0
+        if filled == quota:
+            partitions.append(current)
+            current, filled = [], 0
+    if current:
+        partitions.append(current)
+    return partitions, total
+
+
+# Function to search like search_index.search(), with the scan spread over the worker processes
+# The event loop only waits for the partial top k of every worker, small searches run in a thread instead
+async def search(query_embedding, hub_name="", project_name="", folder_path="", extension="", version=0, family="", folder_name="",
+                 top_k=3, threshold=0.3, snapshot=None, access=None):
+    snapshot = snapshot or search_index.get_snapshot()
+    if snapshot is None:
+        return []
+    filters = dict(hub_name=hub_name, project_name=project_name, folder_path=folder_path, extension=extension, version=version,
+                   family=family, folder_name=folder_name, access=access)
+
+    candidates = search_index.candidate_rows(snapshot, **filters)
+    partitions, total = partition_rows(candidates, SEARCH_WORKERS) if pool and getattr(snapshot, "shared", None) else ([], 0)
+    if not total or total < MIN_PARALLEL_ROWS:
+        return await asyncio.to_thread(search_index.search, query_embedding, top_k=top_k, threshold=threshold, snapshot=snapshot, **filters)
+
+    query = search_index.normalise_query(query_embedding)
+    with blocks_lock:
+        released_count, recent = released_before + len(released), tuple(released)
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*[
+        loop.run_in_executor(pool, score_partition, {position: candidates[position][0]["shared"] for position, _ in partition},
+                             partition, query, top_k, released_count, recent)
+        for partition in partitions
+    ])
+
+    # Merge the partial results and map them back to the rows of their shards
+    similarities = np.concatenate([result[0] for result in results])
+    positions = np.concatenate([result[1] for result in results])
+    row_ids = np.concatenate([result[2] for result in results])
+    scored = []
+    for best in np.argsort(-similarities)[:top_k]:
+        if similarities[best] > threshold:
+            shard = candidates[int(positions[best])][0]
+            scored.append((float(similarities[best]), shard["catalog"].row(int(row_ids[best]))))
+    return search_index.format_matches(scored, version, top_k)
+
+
+# Function to start the worker processes and publish the current and every future snapshot to shared memory
+def start(workers=SEARCH_WORKERS):
+    global pool, SEARCH_WORKERS
+    if pool is not None or workers <= 1:
+        return
+    SEARCH_WORKERS = workers
+
+    # Spawned workers import only this module, not the event loop and threads of the parent
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+    search_index.snapshot_listeners.append(publish)
+    if search_index.current_snapshot is not None:
+        publish(search_index.current_snapshot)
+
+
+# Function to stop the worker processes and unlink the shared memory, snapshots still alive keep their views
+# and are searched in threads, their blocks are closed once they are gone
+def shutdown():
+    global pool
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+        pool = None
+        search_index.snapshot_listeners.remove(publish)
+    with blocks_lock:
+        for name, entry in blocks.items():
+            if entry["linked"]:
+                unlink(name)
+
+
+# Benchmark: queries per second of the single-process scan versus the worker pool on a large synthetic catalog
+if __name__ == "__main__":
+    import argparse
+    import time
+    from types import SimpleNamespace
+
+    parser = argparse.ArgumentParser(description="Benchmark of the multi-process search executor")
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--dims", type=int, default=256, help="The index uses 3072, fewer keep the benchmark in memory")
+    parser.add_argument("--shards", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    # Catalog stand-in, the benchmark only needs rows to format the matches
+    class SyntheticCatalog:
+        def __init__(self, rows):
+            self.rows = rows
+
+        def __len__(self):
+            return self.rows
+
+        def row(self, row_id):
+            return SimpleNamespace(file_name=f"file {row_id}.pdf", href="", project_name="", folder_path="", version=1)
+
+    # Snapshot stand-in, publish() releases the blocks once it is gone so it has to be a class instance
+    class SyntheticSnapshot:
+        def __init__(self):
+            self.shards = []
+            self.manifest = []
+
+    # Snapshot of random unit vectors split into shards
+    rng = np.random.default_rng(0)
+    snapshot = SyntheticSnapshot()
+    for rows in np.array_split(np.arange(args.rows), args.shards):
+        matrix = rng.standard_normal((len(rows), args.dims), dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        meta = {"shard": f"shards/{len(snapshot.shards)}.json", "extensions": None}
+        snapshot.shards.append({"meta": meta, "catalog": SyntheticCatalog(len(rows)), "matrix": matrix, "facets": None})
+        snapshot.manifest.append(meta)
+    queries = rng.standard_normal((args.queries, args.dims), dtype=np.float32)
+    print(f"Synthetic catalog: {args.rows} vectors x {args.dims} dims in {args.shards} shards "
+          f"({args.rows * args.dims * 4 / 2**30:.1f} GB), {os.cpu_count()} cores")
+
+    async def run_queries():
+        start_time = time.perf_counter()
+        await asyncio.gather(*[search(query, top_k=3, threshold=-1, snapshot=snapshot) for query in queries])
+        return args.queries / (time.perf_counter() - start_time)
+
+    # Baseline: every search is one scan in a thread of this process
+    print(f"{'single process':<16} {asyncio.run(run_queries()):8.1f} queries/s")
+
+    publish(snapshot)
+    for workers in args.workers:
+        if workers <= 1:
+            continue
+        start(workers)
+        MIN_PARALLEL_ROWS = 0
+
+        # Warm-up attaches every worker to the shared matrix
+        asyncio.run(run_queries())
+        print(f"{f'{workers} workers':<16} {asyncio.run(run_queries()):8.1f} queries/s")
+        shutdown()
+        publish(snapshot)
+    shutdown()
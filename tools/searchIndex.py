@@ -0,0 +1,333 @@
+# Import statements
+import asyncio  # For running the background index refresher
+import json  # Import json to read the index manifest and shard files
+import os  # For building paths to the index directory and reading environment variables
+import threading  # For serialising index refreshes started by the refresher and by webhook ingestion
+import time  # For measuring how long loading and swapping the index takes
+import numpy as np  # Import numpy for vectorised similarity scoring
+from dotenv import load_dotenv  # For loading environment variables from a .env file
+from tools.catalogStore import CatalogStore  # Columnar in-memory catalog of the indexed files
+import tools.facets as facets  # Facet bitmaps of the catalog and facet parsing of queries
+
+# Load .env file
+load_dotenv()
+
+# Directory holding the embedding index, defaults to the embeddings folder of this repository
+INDEX_DIR = os.getenv('EMBEDDINGS_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'embeddings'))
+
+# Manifest listing one shard per project, written by convertToEmbeddings.py
+MANIFEST_FILE = 'manifest.json'
+
+# Single unsharded index used before the index was split per project
+LEGACY_FILE = 'embeddings.json'
+
+
+# Function to normalise a folder path so that "Project Files/Drawings/" and "project files\drawings" compare equal
+def normalise_path(folder_path):
+    parts = [part.strip() for part in folder_path.replace('\\', '/').split('/')]
+    return '/'.join(part for part in parts if part).lower()
+
+
+# Function to normalise a file extension so that ".PDF", "pdf" and "*.pdf" compare equal
+def normalise_extension(extension):
+    return extension.strip().lstrip('*').lstrip('.').lower()
+
+
+# Function to check whether a name or id matches the requested filter value (case insensitive, partial names allowed)
+def matches_name(requested, name, identifier=None):
+    requested = requested.strip().lower()
+    if identifier and requested == str(identifier).lower():
+        return True
+    return bool(name) and requested in name.lower()
+
+
+# Function to load the shard manifest, falling back to the legacy single-file index when no manifest exists
+def load_manifest(index_dir=INDEX_DIR):
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as file:
+            return json.load(file).get('shards', [])
+
+    # The legacy index carries no hub or project metadata, so it is exposed as one unscoped shard
+    legacy_path = os.path.join(index_dir, LEGACY_FILE)
+    if os.path.exists(legacy_path):
+        return [{"shard": LEGACY_FILE, "hub_id": None, "hub_name": None, "project_id": None, "project_name": None, "extensions": None}]
+    return []
+
+
+# Function to choose the shards a scoped query has to look at, using only the manifest (no shard is opened here)
+def select_shards(manifest, hub_name="", project_name="", extension="", family=""):
+    selected = []
+    for shard in manifest:
+        # Prune shards belonging to other hubs or projects
+        if hub_name and not matches_name(hub_name, shard.get("hub_name"), shard.get("hub_id")):
+            continue
+        if project_name and not matches_name(project_name, shard.get("project_name"), shard.get("project_id")):
+            continue
+
+        # Prune shards that hold no file with the requested extension (None means the shard did not record its extensions)
+        extensions = shard.get("extensions")
+        if extension and extensions is not None and normalise_extension(extension) not in extensions:
+            continue
+        if family and extensions is not None and not set(facets.FAMILIES.get(family, ())) & set(extensions):
+            continue
+        selected.append(shard)
+    return selected
+
+
+# Function to identify the contents of a shard file, shards are replaced atomically so a new file means new contents
+def shard_signature(shard, index_dir=INDEX_DIR):
+    stat = os.stat(os.path.join(index_dir, shard["shard"]))
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Function to read the rows of a single shard file
+def load_shard(shard, index_dir=INDEX_DIR):
+    with open(os.path.join(index_dir, shard["shard"]), 'r') as file:
+        return json.load(file)
+
+
+# Function to check whether a folder lies inside the requested subtree (the folder itself or anything below it,
+# but not sibling folders sharing a name prefix)
+def in_subtree(row_path, folder_prefix):
+    row_path = normalise_path(row_path or "")
+    return row_path == folder_prefix or row_path.startswith(folder_prefix + '/')
+
+
+# Function to check whether a folder path contains the requested folder name as one of its levels, e.g. "Structural"
+# matches "Project Files/Drawings/Structural" and "Structural/Level 3"
+def has_folder(row_path, folder_name):
+    row_path = '/' + normalise_path(row_path or "") + '/'
+    return '/' + normalise_path(folder_name) + '/' in row_path
+
+
+# Function to return the row ids of a shard that match every requested facet, None when unfiltered:
+# inside the folder subtree or a folder of the given name, with the extension or an extension of the family, and, when a
+# version is requested, having that version as tip or as an older version
+# allowed is the row bitmap of the rows the user can open (tools/accessScope.py), None when every row is allowed
+# The facet bitmaps are built once per snapshot, a query only combines them
+def filter_rows(shard, folder_path="", extension="", version=0, family="", folder_name="", allowed=None):
+    if not folder_path and not extension and not version and not family and not folder_name and allowed is None:
+        return None
+
+    catalog, shard_facets = shard["catalog"], shard["facets"]
+    mask = np.ones(len(catalog), dtype=bool) if allowed is None else allowed.copy()
+    if extension:
+        bitmap = shard_facets["extension"].get(normalise_extension(extension))
+        if bitmap is None:
+            return np.zeros(0, dtype=np.int64)
+        mask &= bitmap
+    if family:
+        bitmap = shard_facets["family"].get(family)
+        if bitmap is None:
+            return np.zeros(0, dtype=np.int64)
+        mask &= bitmap
+    if folder_path or folder_name:
+        folder_prefix = normalise_path(folder_path)
+        in_folders = np.zeros(len(catalog), dtype=bool)
+        for path, row_ids in shard_facets["folder"]:
+            if (not folder_path or in_subtree(path, folder_prefix)) and (not folder_name or has_folder(path, folder_name)):
+                in_folders[row_ids] = True
+        mask &= in_folders
+    if version:
+        has_version = np.frombuffer(catalog.versions, dtype=np.int32) == version if len(catalog) else np.zeros(0, dtype=bool)
+        older = [row_id for row_id, versions in catalog.history.items() if any(older[0] == version for older in versions)]
+        has_version[older] = True
+        mask &= has_version
+    return np.flatnonzero(mask)
+
+
+# Function to identify the version of the index on disk, convertToEmbeddings.py replaces the manifest last so its timestamp marks a complete index
+def index_version(index_dir=INDEX_DIR):
+    for name in (MANIFEST_FILE, LEGACY_FILE):
+        path = os.path.join(index_dir, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            return f"{name}:{stat.st_mtime_ns}:{stat.st_size}"
+    return None
+
+
+# Immutable, fully built view of the index; searches hold on to one snapshot for their whole duration
+class IndexSnapshot:
+
+    # Build the snapshot from the manifest and the shard files, embeddings are stacked and normalised once here
+    # Shards whose file is unchanged since the previous snapshot are shared with it instead of being loaded again
+    def __init__(self, version, manifest, index_dir=INDEX_DIR, previous=None):
+        self.version = version
+        self.shards = []
+        self.reused = 0
+        unchanged = {shard["meta"]["shard"]: shard for shard in previous.shards} if previous is not None else {}
+        for shard in manifest:
+            signature = shard_signature(shard, index_dir)
+            old = unchanged.get(shard["shard"])
+            if old is not None and old["signature"] == signature:
+                # A copy of the shard dict with the new manifest entry, the matrix and its shared memory block are kept
+                self.shards.append(dict(old, meta=shard))
+                self.reused += 1
+                continue
+            rows = load_shard(shard, index_dir)
+
+            # Records go into a columnar catalog, row i of the catalog is row i of the embedding matrix
+            catalog = CatalogStore()
+            matrix = np.empty((len(rows), len(rows[0]["file_name_embedding"]) if rows else 0), dtype=np.float32)
+            for row_id, row in enumerate(rows):
+                matrix[row_id] = row.pop("file_name_embedding")
+                catalog.append(row)
+            del rows
+
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1, norms)
+            self.shards.append({"meta": shard, "catalog": catalog, "matrix": matrix, "facets": facets.build_facets(catalog),
+                                "signature": signature})
+        self.manifest = [shard["meta"] for shard in self.shards]
+
+    # Number of files in the snapshot
+    @property
+    def file_count(self):
+        return sum(len(shard["catalog"]) for shard in self.shards)
+
+    # Extensions present in the snapshot, used to recognise extensions named in a query
+    @property
+    def extensions(self):
+        return {extension for shard in self.shards for extension in shard["facets"]["extension"] if extension}
+
+    # Approximate memory held by the embedding matrices of the snapshot
+    @property
+    def nbytes(self):
+        return sum(shard["matrix"].nbytes for shard in self.shards)
+
+
+# The snapshot currently served, replaced by a single reference assignment so readers never see a half-built index
+current_snapshot = None
+
+# Functions called with every new snapshot before it is swapped in, e.g. to move its matrices into shared memory
+snapshot_listeners = []
+
+# Held while a snapshot is built, so two refreshes never build and swap at the same time
+refresh_lock = threading.Lock()
+
+
+# Function to load the index on disk into a new snapshot and swap it in when its version differs from the served one
+def refresh_index(index_dir=INDEX_DIR):
+    with refresh_lock:
+        return swap_index(index_dir)
+
+
+# Function to build and swap in the new snapshot, called with the refresh lock held
+def swap_index(index_dir):
+    global current_snapshot
+    version = index_version(index_dir)
+    previous = current_snapshot
+    if version is None or (previous is not None and previous.version == version):
+        return False
+
+    # Build the new snapshot completely before it becomes visible
+    start = time.perf_counter()
+    snapshot = IndexSnapshot(version, load_manifest(index_dir), index_dir, previous)
+    for listener in snapshot_listeners:
+        listener(snapshot)
+    loaded = time.perf_counter()
+
+    # Read-copy-update: in-flight searches keep using the snapshot they already hold
+    current_snapshot = snapshot
+    swapped = time.perf_counter()
+
+    # Both snapshots are alive until the searches holding the old one finish
+    overlap = snapshot.nbytes + (previous.nbytes if previous is not None else 0)
+    print(f"[index] loaded version {version} with {snapshot.file_count} files ({snapshot.reused} of {len(snapshot.shards)} shards unchanged) "
+          f"in {loaded - start:.2f}s, "
+          f"swap took {(swapped - loaded) * 1e6:.1f}us, peak overlap {overlap / 2**20:.1f} MB "
+          f"(old {(previous.nbytes if previous is not None else 0) / 2**20:.1f} MB + new {snapshot.nbytes / 2**20:.1f} MB)")
+    return True
+
+
+# Function to get the snapshot to search, the very first call loads the index synchronously
+def get_snapshot():
+    if current_snapshot is None:
+        refresh_index()
+    return current_snapshot
+
+
+# Background task that picks up new index versions off the request path
+async def run_refresher(interval=30, index_dir=INDEX_DIR):
+    while True:
+        try:
+            # Loading runs in a worker thread so the event loop keeps serving queries
+            await asyncio.to_thread(refresh_index, index_dir)
+        except Exception as e:
+            print(f"[index] refresh failed, keeping the current index: {e}")
+        await asyncio.sleep(interval)
+
+
+# Function to normalise a query embedding to unit length, the stored rows are normalised when a snapshot is built
+def normalise_query(query_embedding):
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    return query / (query_norm if query_norm else 1)
+
+
+# Function to list the rows a query has to score: (shard, row ids) for every shard inside the requested scope,
+# with None as row ids when the whole shard is scored; shards without a matching row are left out
+# access is the access map of the user (tools/accessScope.py), None for an unrestricted search
+def candidate_rows(snapshot, hub_name="", project_name="", folder_path="", extension="", version=0, family="", folder_name="",
+                   access=None):
+    # Only the shards inside the requested scope, and that the user can open, are scored
+    selected = {id(shard) for shard in select_shards(snapshot.manifest, hub_name, project_name, extension, family)}
+    if access is not None:
+        selected &= access.keys()
+
+    candidates = []
+    for shard in snapshot.shards:
+        if id(shard["meta"]) not in selected or not len(shard["catalog"]):
+            continue
+        allowed = access[id(shard["meta"])] if access is not None else None
+        row_ids = filter_rows(shard, folder_path, extension, version, family, folder_name, allowed)
+        if row_ids is None or len(row_ids):
+            candidates.append((shard, row_ids))
+    return candidates
+
+
+# Function to turn scored rows, (similarity, CatalogRow) pairs, into the best k matches, best first
+def format_matches(scored, version=0, top_k=3):
+    scored.sort(key=lambda match: match[0], reverse=True)
+    matches = []
+    for similarity, row in scored[:top_k]:
+        file_name, href = row.store.get_version(row.row_id, version) if version else (row.file_name, row.href)
+        matches.append({
+            'file_name': file_name,
+            'href': href,
+            'project_name': row.project_name,
+            'folder_path': row.folder_path,
+            'version': version or row.version,
+            'similarity': similarity
+        })
+    return matches
+
+
+# Function to score the query embedding against the rows of the selected shards and return the best matches
+# Matches are the tip versions of the documents unless a version is requested, and only files the user can open when access is given
+def search(query_embedding, hub_name="", project_name="", folder_path="", extension="", version=0, family="", folder_name="",
+           top_k=3, threshold=0.3, snapshot=None, access=None):
+    # Take one reference to the snapshot so the whole search sees the same index version
+    snapshot = snapshot or get_snapshot()
+    if snapshot is None:
+        return []
+    query = normalise_query(query_embedding)
+
+    # Score the rows that survive the facet filters of every selected shard
+    scored = []
+    for shard, row_ids in candidate_rows(snapshot, hub_name, project_name, folder_path, extension, version, family, folder_name, access):
+        if row_ids is None:
+            row_ids = np.arange(len(shard["catalog"]))
+            similarities = shard["matrix"] @ query
+        else:
+            similarities = shard["matrix"][row_ids] @ query
+
+        # Only the best k rows of each shard can make it into the overall top k
+        best = np.argsort(-similarities)[:top_k]
+        for position in best:
+            if similarities[position] > threshold:
+                scored.append((float(similarities[position]), shard["catalog"].row(int(row_ids[position]))))
+
+    # Keep the top k rows above the similarity threshold, best first
+    return format_matches(scored, version, top_k)
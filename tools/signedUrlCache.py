@@ -0,0 +1,131 @@
+# Import statements
+import asyncio  # For refreshing hot entries in the background
+import os  # For reading the cache settings from environment variables
+import time  # For tracking when signed URLs expire
+from collections import OrderedDict  # Least recently used order of the cached URLs
+from urllib.parse import urlparse, parse_qs, unquote  # To read the expiry out of a signed URL and the keys out of an href
+from datetime import datetime, timezone  # To parse the signing time of a signed URL
+import tools.singleFlight as single_flight  # Coalesces identical concurrent signing requests
+
+# Lifetime requested for every signed URL, OSS accepts 1 to 60 minutes
+SIGNED_URL_MINUTES = int(os.getenv('SIGNED_URL_MINUTES', '60'))
+
+# A URL is no longer handed out this many seconds before it expires, so a download started with it has time to finish
+# A margin as long as the lifetime would mean no URL is ever served, it is clamped to half the lifetime
+SAFETY_MARGIN = int(os.getenv('SIGNED_URL_SAFETY_MARGIN', '300'))
+if SAFETY_MARGIN >= SIGNED_URL_MINUTES * 60:
+    SAFETY_MARGIN = SIGNED_URL_MINUTES * 30
+
+# Hot URLs (served at least HOT_HITS times) are renewed in the background once they are this close to the safety margin
+REFRESH_WINDOW = 300
+HOT_HITS = 3
+
+# Number of URLs kept
+CACHE_SIZE = 10000
+
+# Cached URLs, least recently used first: (bucket key, object key, token fingerprint) -> {"url", "expires", "hits"}
+# The user is part of the key, a URL is only handed to users who were allowed to sign it themselves
+entries = OrderedDict()
+
+# Keys being renewed in the background
+refreshing = set()
+
+# Background renewals still running, referenced here so the event loop does not drop them before they finish
+refresh_tasks = set()
+
+# Counters: requests served from the cache, requests that had to sign, and background renewals
+stats = {"hits": 0, "misses": 0, "refreshes": 0}
+
+
+# Function to split a storage href into its bucket and object keys
+def object_keys(href):
+    path_parts = urlparse(href).path.split('/')
+    return path_parts[4], unquote('/'.join(path_parts[6:]))
+
+
+# Function to work out when a signed URL expires: the S3 signature parameters when present, otherwise the requested lifetime
+def url_expiry(url, signed_at):
+    expires = signed_at + SIGNED_URL_MINUTES * 60
+    query = parse_qs(urlparse(url).query)
+    if "X-Amz-Date" in query and "X-Amz-Expires" in query:
+        amz_date = datetime.strptime(query["X-Amz-Date"][0], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        # The signature is in wall-clock time, the cache runs on the monotonic clock
+        remaining = amz_date.timestamp() + int(query["X-Amz-Expires"][0]) - time.time()
+        expires = min(expires, time.monotonic() + remaining)
+    elif "Expires" in query:
+        expires = min(expires, time.monotonic() + int(query["Expires"][0]) - time.time())
+    return expires
+
+
+# Function to store a signed URL
+def put(key, url, signed_at=None):
+    entry = entries.pop(key, None)
+    entries[key] = {"url": url, "expires": url_expiry(url, signed_at or time.monotonic()), "hits": entry["hits"] if entry else 0}
+    while len(entries) > CACHE_SIZE:
+        entries.popitem(last=False)
+
+
+# Function to look up a cached URL that is still valid for at least the safety margin, None otherwise
+def lookup(key):
+    entry = entries.get(key)
+    if entry is None or time.monotonic() > entry["expires"] - SAFETY_MARGIN:
+        return None
+    entries.move_to_end(key)
+    entry["hits"] += 1
+    return entry
+
+
+# Function to drop the cached URL of a file, e.g. after S3 rejected it
+def forget(access_token, href):
+    entries.pop((*object_keys(href), single_flight.token_fingerprint(access_token)), None)
+
+
+# Function to sign one object with OSS, returns (status, url)
+async def sign(access_token, bucket_key, object_key):
+    endpoint = (f"https://developer.api.autodesk.com/oss/v2/buckets/{bucket_key}/objects/{object_key}/signeds3download"
+                f"?minutesExpiration={SIGNED_URL_MINUTES}")
+    signed_at = time.monotonic()
+    status, response_json = await single_flight.get_json("signed_url", endpoint, access_token)
+    if status != 200 or not response_json.get('url'):
+        return status, None
+    put((bucket_key, object_key, single_flight.token_fingerprint(access_token)), response_json['url'], signed_at)
+    return status, response_json['url']
+
+
+# Function to renew a hot URL before it stops being served
+async def refresh(access_token, bucket_key, object_key, key):
+    try:
+        await sign(access_token, bucket_key, object_key)
+        stats["refreshes"] += 1
+    except Exception:
+        pass
+    finally:
+        refreshing.discard(key)
+
+
+# Function to get a signed download URL for the href of a file, returns (status, url) with url None on failure
+# Repeated requests for the same file are answered from the cache without any network round trip
+async def get_signed_url(access_token, href):
+    bucket_key, object_key = object_keys(href)
+    key = (bucket_key, object_key, single_flight.token_fingerprint(access_token))
+
+    entry = lookup(key)
+    if entry is None:
+        stats["misses"] += 1
+        return await sign(access_token, bucket_key, object_key)
+    stats["hits"] += 1
+
+    # A hot URL close to the end of its served life is renewed in the background, the current one is still good meanwhile
+    if entry["hits"] >= HOT_HITS and time.monotonic() > entry["expires"] - SAFETY_MARGIN - REFRESH_WINDOW and key not in refreshing:
+        refreshing.add(key)
+        task = asyncio.ensure_future(refresh(access_token, bucket_key, object_key, key))
+        refresh_tasks.add(task)
+        task.add_done_callback(refresh_tasks.discard)
+    return 200, entry["url"]
+
+
+# Function to summarise the cache counters
+def report():
+    requests = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / requests * 100 if requests else 0.0
+    return f"signed URL cache: {hit_rate:.0f}% of {requests} requests served from the cache, {stats['refreshes']} renewed in the background"
@@ -0,0 +1,58 @@
+# Import statements
+import asyncio  # For sharing one in-flight task between concurrent callers
+import hashlib  # For fingerprinting access tokens inside request keys
+import tools.rateLimiter as rate_limiter  # Rate-limited, retrying access to the Autodesk and OpenAI APIs
+
+# Upstream calls currently in flight, keyed by (group, normalised request identity)
+in_flight = {}
+
+# Per group counters: calls made by callers, calls that really went upstream, and calls saved by joining one in flight
+stats = {}
+
+
+# Function to fingerprint an access token, Autodesk results depend on the user's permissions so the user is part of the key
+def token_fingerprint(access_token):
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:16]
+
+
+# Function to run fetch() once for all concurrent callers asking for the same key, every caller gets the same result
+async def run(group, key, fetch):
+    counters = stats.setdefault(group, {"calls": 0, "upstream": 0, "saved": 0})
+    counters["calls"] += 1
+
+    task = in_flight.get((group, key))
+    if task is None:
+        counters["upstream"] += 1
+        task = asyncio.ensure_future(fetch())
+        in_flight[(group, key)] = task
+        task.add_done_callback(lambda _: in_flight.pop((group, key), None))
+    else:
+        counters["saved"] += 1
+
+    # Shielded so that a caller giving up does not cancel the call the other callers are waiting on
+    return await asyncio.shield(task)
+
+
+# Function to GET an Autodesk endpoint as JSON without coalescing, returns (status, result) with result None on failure
+# parse(response) replaces the default full decode, e.g. with the streaming projection of tools/jsonStream.py
+async def fetch_json(endpoint, access_token, parse=None):
+    headers = {
+        'Authorization': f'Bearer {access_token}'
+    }
+    async with rate_limiter.get(endpoint, headers=headers) as response:
+        if response.status == 200:
+            return response.status, await (parse(response) if parse else response.json())
+        return response.status, None
+
+
+# Function to GET an Autodesk endpoint as JSON, coalescing identical concurrent requests of the same user
+async def get_json(group, endpoint, access_token, parse=None):
+    return await run(group, (endpoint, token_fingerprint(access_token)), lambda: fetch_json(endpoint, access_token, parse))
+
+
+# Function to summarise the counters, e.g. "folder_listing: 40 calls, 12 upstream, 28 saved"
+def report():
+    return "\n".join(
+        f"{group}: {counters['calls']} calls, {counters['upstream']} upstream, {counters['saved']} saved"
+        for group, counters in sorted(stats.items())
+    )
@@ -0,0 +1,406 @@
+# Import statements
+import asyncio  # For the background task applying batches of events
+import hashlib  # For the delivery keys used to drop repeated deliveries
+import hmac  # For checking the signature Autodesk puts on every webhook call
+import json  # Import json to read and write the shard files and the manifest
+import os  # For building paths and reading the ingest settings from environment variables
+import re  # For building shard file names
+import time  # For measuring how long an event takes to become searchable
+from collections import OrderedDict, deque  # Pending changes in arrival order, recent delivery keys and latencies
+from datetime import datetime  # To parse the event times of the payloads
+from urllib.parse import quote  # To put version urns into Data Management URLs
+import numpy as np  # For the latency percentiles
+import tools.searchIndex as search_index  # The index on disk and the snapshot served to searches
+import tools.embeddings as embeddings  # Embeddings of new and renamed files
+import tools.folderTree as folder_tree  # Folder tree used for path navigation, kept in step with the catalog
+import tools.singleFlight as single_flight  # Coalesced Data Management requests
+
+# Secret the webhooks were registered with, every call is signed with it; calls are rejected while it is not set
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+
+# Local testing with webhook_sender.py only: accept unsigned calls, and storage hrefs carried by the payloads
+# Anyone who can reach the server could otherwise delete rows of the shared index or add rows pointing anywhere
+ALLOW_UNSIGNED = os.getenv('INGEST_ALLOW_UNSIGNED', '') == '1'
+
+# Token used to look up the storage of new versions, the webhook payloads do not carry it
+INGEST_ACCESS_TOKEN = os.getenv('INGEST_ACCESS_TOKEN', '')
+
+# Seconds events are collected before a batch is applied, and the most changes applied in one batch
+BATCH_WINDOW = float(os.getenv('INGEST_BATCH_WINDOW', '1.0'))
+BATCH_SIZE = 500
+
+# Number of recent delivery keys remembered to drop repeated deliveries, and of latencies kept for the percentiles
+SEEN_SIZE = 10000
+LATENCY_SAMPLES = 1000
+
+# Deleted items and the version they were deleted at, kept next to the manifest so a late event cannot bring them back
+TOMBSTONE_FILE = 'tombstones.json'
+TOMBSTONE_SIZE = 100000
+
+# Data Management events that add or change a file, and those that remove it; folder events are left to the scheduled sync
+UPSERT_EVENTS = {"dm.version.added", "dm.version.modified", "dm.version.moved", "dm.version.copied"}
+DELETE_EVENTS = {"dm.version.deleted"}
+
+# Changes waiting for the next batch, one per item: item id -> change; a later event of the same item replaces the earlier one
+pending = OrderedDict()
+
+# Delivery keys of recent events, Autodesk retries a delivery until it is acknowledged
+seen = OrderedDict()
+
+# Set when changes are pending, created on first use inside the running event loop
+wakeup = None
+
+# Seconds from receiving an event, and from the event itself, until its change was searchable
+receive_latencies = deque(maxlen=LATENCY_SAMPLES)
+event_latencies = deque(maxlen=LATENCY_SAMPLES)
+
+# Counters: events received, dropped as repeated deliveries, ignored (other events or stale versions), batches applied,
+# changes written, changes that were already in the index, changes that failed, changes waiting and being applied;
+# then the latency percentiles in seconds
+stats = {"received": 0, "duplicates": 0, "ignored": 0, "batches": 0, "upserts": 0, "deletes": 0, "unchanged": 0, "failed": 0,
+         "pending": 0, "applying": 0, "receive_p50": None, "receive_p95": None, "event_p50": None, "event_p95": None}
+
+
+# Function to check the x-adsk-signature header, an HMAC-SHA1 of the raw body with the webhook secret
+# Without a secret only the local testing opt-in accepts calls
+def verify_signature(body, header):
+    if not WEBHOOK_SECRET:
+        return ALLOW_UNSIGNED
+    expected = "sha1hash=" + hmac.new(WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha1).hexdigest()
+    return hmac.compare_digest(expected, header or "")
+
+
+# Function to parse the modifiedTime of a payload, e.g. "2024-05-17T21:10:58+0000", None when missing
+def event_time(payload):
+    value = payload.get("modifiedTime") or payload.get("createdTime")
+    for pattern in ("%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z"):
+        try:
+            return datetime.strptime(value, pattern).timestamp()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+# Function to turn a webhook event into a change of one catalog record, None for events that do not change the catalog
+def parse_event(event):
+    name = event.get("hook", {}).get("event") or event.get("event")
+    payload = event.get("payload", {})
+    if name not in UPSERT_EVENTS | DELETE_EVENTS or not payload.get("lineageUrn"):
+        return None
+
+    # Project and hub ids come without the "b." prefix of the Data Management API
+    project_id = payload.get("project")
+    if project_id and not project_id.startswith("b."):
+        project_id = "b." + project_id
+    hub_id = payload.get("tenant")
+    if hub_id and not hub_id.startswith("b."):
+        hub_id = "b." + hub_id
+
+    # Ancestors run from the project's root folder down to the parent folder, catalog paths start below the root folder
+    ancestors = payload.get("ancestors") or []
+    return {
+        "op": "delete" if name in DELETE_EVENTS else "upsert",
+        "item_id": payload["lineageUrn"],
+        "version": int(payload.get("version") or 0),
+        "file_name": payload.get("name"),
+        "source": payload.get("source"),
+        # Autodesk payloads carry no storage href, it is looked up when the batch is applied
+        # The local sender includes it, a payload is only trusted with it under the local testing opt-in
+        "href": payload.get("storage") if ALLOW_UNSIGNED else None,
+        "hub_id": hub_id,
+        "project_id": project_id,
+        "folder_id": payload.get("parentFolderUrn"),
+        "folder_path": "/".join(ancestor.get("name", "") for ancestor in ancestors[1:]),
+        "event_time": event_time(payload),
+        "received": time.time(),
+    }
+
+
+# Function to order two changes of the same item: the higher version is the newer change, then the later event,
+# and of a deletion and an upsert of the same version and time the deletion
+def change_order(change):
+    return change["version"], change["event_time"] or 0.0, change["op"] == "delete"
+
+
+# Function to accept a list of webhook events: repeated deliveries are dropped and the changes queued per item
+# Returns the number of events queued; the events are applied by run_ingester() in the background
+def accept(events):
+    global wakeup
+    queued = 0
+    for event in events:
+        stats["received"] += 1
+        delivery = json.dumps([event.get("hook", {}).get("event"), event.get("payload")], sort_keys=True)
+        delivery = hashlib.sha1(delivery.encode("utf-8")).hexdigest()
+        if delivery in seen:
+            stats["duplicates"] += 1
+            continue
+        seen[delivery] = None
+        while len(seen) > SEEN_SIZE:
+            seen.popitem(last=False)
+
+        change = parse_event(event)
+        if change is None:
+            stats["ignored"] += 1
+            continue
+
+        # Deliveries can arrive out of order, an older change never replaces a newer one waiting in the same batch
+        queued_change = pending.get(change["item_id"])
+        if queued_change is not None:
+            if change_order(change) < change_order(queued_change):
+                stats["ignored"] += 1
+                continue
+            change["received"] = min(change["received"], queued_change["received"])
+            del pending[change["item_id"]]
+        pending[change["item_id"]] = change
+        queued += 1
+
+    stats["pending"] = len(pending)
+    if queued:
+        wakeup = wakeup or asyncio.Event()
+        wakeup.set()
+    return queued
+
+
+# Function to look up the storage href, file name and version number of a new version
+async def resolve_version(change):
+    endpoint = f"https://developer.api.autodesk.com/data/v1/projects/{change['project_id']}/versions/{quote(change['source'], safe='')}"
+    status, version = await single_flight.get_json("ingest_version", endpoint, INGEST_ACCESS_TOKEN)
+    if status != 200:
+        return False
+    data = version.get("data", {})
+    attributes = data.get("attributes", {})
+    change["href"] = data.get("relationships", {}).get("storage", {}).get("meta", {}).get("link", {}).get("href")
+    change["file_name"] = attributes.get("name") or attributes.get("displayName") or change["file_name"]
+    change["version"] = attributes.get("versionNumber") or change["version"]
+    return bool(change["href"])
+
+
+# Function to build the shard file name of a project, the same names as convertToEmbeddings.shard_name()
+def shard_name(project_id):
+    return 'shards/' + re.sub(r'[^A-Za-z0-9_.-]', '_', project_id or 'unscoped') + '.json'
+
+
+# Function to read the deleted items of the index, item id -> version it was deleted at, oldest deletion first
+def load_tombstones(index_dir):
+    path = os.path.join(index_dir, TOMBSTONE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+# Function to read the manifest and the shards touched by a batch, and work out the new rows of those shards
+# Returns (manifest, shards, tombstones, to_embed, counts): shards maps project id -> {"meta", "rows": {item key: row}, "changed"},
+# tombstones the deleted items after the batch, to_embed lists the rows that need a new embedding,
+# counts the upserts, deletes and changes already in the index or older than it
+def plan_batch(changes, index_dir):
+    with open(os.path.join(index_dir, search_index.MANIFEST_FILE), "r") as file:
+        manifest = json.load(file).get("shards", [])
+    by_project = {shard.get("project_id"): shard for shard in manifest}
+    tombstones = load_tombstones(index_dir)
+
+    shards, to_embed = {}, []
+    counts = {"upserts": 0, "deletes": 0, "unchanged": 0}
+    for change in changes:
+        project_id = change["project_id"]
+        if project_id not in shards:
+            meta = by_project.get(project_id) or {"shard": shard_name(project_id), "hub_id": change["hub_id"], "hub_name": None,
+                                                   "project_id": project_id, "project_name": None}
+            path = os.path.join(index_dir, meta["shard"])
+            rows = []
+            if os.path.exists(path):
+                with open(path, "r") as file:
+                    rows = json.load(file)
+            shards[project_id] = {"meta": meta, "rows": {row.get("item_id") or row["href"]: row for row in rows}, "changed": False}
+        shard = shards[project_id]
+        existing = shard["rows"].get(change["item_id"])
+        existing_version = (existing.get("version") or 0) if existing is not None else 0
+
+        if change["op"] == "delete":
+            # A deletion older than the version in the index (the item was restored since) changes nothing
+            if existing is not None and existing_version > change["version"]:
+                counts["unchanged"] += 1
+                continue
+
+            # The tombstone is kept even when the item is not in the index yet, its upsert may still be on the way
+            tombstones.pop(change["item_id"], None)
+            tombstones[change["item_id"]] = max(change["version"], existing_version)
+            if existing is None:
+                counts["unchanged"] += 1
+                continue
+            del shard["rows"][change["item_id"]]
+            shard["changed"] = True
+            counts["deletes"] += 1
+            continue
+
+        # A version at or below the deleted one arrived late, the item stays deleted; a newer version restores it
+        if change["version"] <= tombstones.get(change["item_id"], -1):
+            counts["unchanged"] += 1
+            continue
+        tombstones.pop(change["item_id"], None)
+
+        # Applying the same or an older version again changes nothing, so replayed events are harmless
+        if existing is not None and (existing_version > change["version"] or (
+                existing.get("version") == change["version"] and existing["file_name"] == change["file_name"]
+                and existing["href"] == change["href"] and existing.get("folder_path") == change["folder_path"])):
+            counts["unchanged"] += 1
+            continue
+
+        meta = shard["meta"]
+        row = {
+            "file_name": change["file_name"],
+            "href": change["href"],
+            "hub_id": meta.get("hub_id") or change["hub_id"],
+            "hub_name": meta.get("hub_name"),
+            "project_id": project_id,
+            "project_name": meta.get("project_name"),
+            "folder_id": change["folder_id"],
+            "folder_path": change["folder_path"],
+            "item_id": change["item_id"],
+            "version": change["version"],
+            "extension": os.path.splitext(change["file_name"])[1].lstrip('.').lower(),
+        }
+
+        # A new version pushes the previous tip into the older versions, as collapse_versions() does for a crawl
+        if existing is not None:
+            older = existing.get("versions", [])
+            if change["version"] > (existing.get("version") or 0) and existing["href"] != change["href"]:
+                older = [{"version": existing.get("version"), "file_name": existing["file_name"], "href": existing["href"]}] + older
+            if older:
+                row["versions"] = older
+
+        # Moves and new versions keep their name, so only new and renamed files are embedded
+        if existing is not None and existing["file_name"] == change["file_name"]:
+            row["file_name_embedding"] = existing["file_name_embedding"]
+        else:
+            to_embed.append(row)
+        shard["rows"][change["item_id"]] = row
+        shard["changed"] = True
+        counts["upserts"] += 1
+
+    # The oldest deletions are forgotten first, an event that late is long overtaken by the scheduled sync
+    for item_id in list(tombstones)[:max(0, len(tombstones) - TOMBSTONE_SIZE)]:
+        del tombstones[item_id]
+    return manifest, shards, tombstones, to_embed, counts
+
+
+# Function to write the changed shards, the tombstones, then the manifest, each replaced atomically as
+# convertToEmbeddings.write_index() does
+def write_batch(manifest, shards, tombstones, index_dir):
+    by_shard = {shard["shard"]: position for position, shard in enumerate(manifest)}
+    for shard in shards.values():
+        if not shard["changed"]:
+            continue
+        meta, rows = shard["meta"], list(shard["rows"].values())
+        path = os.path.join(index_dir, meta["shard"])
+        if rows:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "w") as outfile:
+                json.dump(rows, outfile)
+            os.replace(path + ".tmp", path)
+            meta = dict(meta, file_count=len(rows), extensions=sorted({row["extension"] for row in rows}))
+            if meta["shard"] in by_shard:
+                manifest[by_shard[meta["shard"]]] = meta
+            else:
+                manifest.append(meta)
+        else:
+            # A project that lost all its files loses its shard
+            if os.path.exists(path):
+                os.remove(path)
+            if meta["shard"] in by_shard:
+                manifest[by_shard[meta["shard"]]] = None
+
+    tombstone_path = os.path.join(index_dir, TOMBSTONE_FILE)
+    with open(tombstone_path + ".tmp", "w") as outfile:
+        json.dump(tombstones, outfile)
+    os.replace(tombstone_path + ".tmp", tombstone_path)
+
+    # A batch that only recorded deletions of files not in the index leaves the manifest, and so the index version, as it was
+    if not any(shard["changed"] for shard in shards.values()):
+        return
+
+    manifest_path = os.path.join(index_dir, search_index.MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w") as outfile:
+        json.dump({"shards": [shard for shard in manifest if shard is not None]}, outfile, indent=4)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+# Function to apply one batch of changes to the shard files, the folder tree and the served snapshot
+async def apply_batch(changes, index_dir=search_index.INDEX_DIR):
+    # Changes are written into the per-project shards, an index without a manifest is rebuilt by convertToEmbeddings.py only
+    if not os.path.exists(os.path.join(index_dir, search_index.MANIFEST_FILE)):
+        print(f"[ingest] no sharded index in {index_dir}, {len(changes)} changes left to the next sync")
+        stats["failed"] += len(changes)
+        return
+
+    # Versions whose storage the event did not carry are looked up, a version that cannot be resolved waits for the next sync
+    upserts = [change for change in changes if change["op"] == "upsert" and not change["href"]]
+    resolved = await asyncio.gather(*[resolve_version(change) for change in upserts])
+    failed = {id(change) for change, ok in zip(upserts, resolved) if not ok}
+    stats["failed"] += len(failed)
+    changes = [change for change in changes if id(change) not in failed]
+
+    manifest, shards, tombstones, to_embed, counts = await asyncio.to_thread(plan_batch, changes, index_dir)
+
+    # All new names of the batch are embedded with one call
+    if to_embed:
+        for row, embedding in zip(to_embed, await embeddings.embed_queries([row["file_name"] for row in to_embed])):
+            row["file_name_embedding"] = embedding
+
+    # Deletions are written even when they removed nothing, their tombstones stop the late upserts of the items
+    changed = any(shard["changed"] for shard in shards.values())
+    if changed or any(change["op"] == "delete" for change in changes):
+        await asyncio.to_thread(write_batch, manifest, shards, tombstones, index_dir)
+    if changed:
+        # Only the rewritten shards are loaded again and copied to shared memory, the others are shared with the current snapshot
+        # Searches still holding an older snapshot keep its blocks until they finish (tools/searchExecutor.py)
+        await asyncio.to_thread(search_index.refresh_index, index_dir)
+        for change in changes:
+            row = shards[change["project_id"]]["rows"].get(change["item_id"])
+            if row is not None:
+                folder_tree.add_file(row)
+            else:
+                folder_tree.remove_file(change["item_id"])
+    for name, count in counts.items():
+        stats[name] += count
+
+    # The changes are searchable now, applied or not: unchanged ones already were
+    now = time.time()
+    for change in changes:
+        receive_latencies.append(now - change["received"])
+        if change["event_time"]:
+            event_latencies.append(now - change["event_time"])
+    for name, samples in (("receive", receive_latencies), ("event", event_latencies)):
+        if samples:
+            stats[f"{name}_p50"], stats[f"{name}_p95"] = (round(float(value), 3) for value in np.percentile(samples, [50, 95]))
+    stats["batches"] += 1
+
+
+# Background task applying the pending changes in batches, collecting events for BATCH_WINDOW seconds first
+async def run_ingester(index_dir=search_index.INDEX_DIR):
+    global wakeup
+    wakeup = wakeup or asyncio.Event()
+    while True:
+        await wakeup.wait()
+        await asyncio.sleep(BATCH_WINDOW)
+        wakeup.clear()
+
+        batch = []
+        while pending and len(batch) < BATCH_SIZE:
+            batch.append(pending.popitem(last=False)[1])
+        if pending:
+            wakeup.set()
+        stats["pending"], stats["applying"] = len(pending), len(batch)
+
+        try:
+            await apply_batch(batch, index_dir)
+            stats["applying"] = 0
+        except Exception as e:
+            # The batch is queued again, behind any newer event of the same items that arrived meanwhile
+            print(f"[ingest] applying {len(batch)} changes failed, retrying: {e}")
+            for change in batch:
+                if change["item_id"] not in pending:
+                    pending[change["item_id"]] = change
+            stats["pending"], stats["applying"] = len(pending), 0
+            wakeup.set()
+            await asyncio.sleep(5)
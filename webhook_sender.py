@@ -0,0 +1,127 @@
+# Import statements
+import argparse  # For reading the sender settings from the command line
+import asyncio  # To send events concurrently
+import hashlib  # For signing the events like Autodesk does
+import hmac  # For signing the events like Autodesk does
+import json  # Import json to encode the events
+import os  # For reading the webhook secret from environment variables
+import random  # For choosing which files are updated, moved, deleted or delivered twice
+import time  # For pacing the events and waiting for them to be applied
+import uuid  # For the lineage, version and storage ids of the synthetic files
+from datetime import datetime, timezone  # For the event times the server measures freshness from
+import aiohttp  # Import aiohttp for talking to the server
+
+
+# Function to build one Data Management webhook event in the shape Autodesk sends
+# The storage href is included so the server does not need to look the version up
+def make_event(name, file, project_id, hub_id):
+    return {
+        "version": "1.0",
+        "resourceUrn": file["source"],
+        "hook": {"event": name, "system": "data", "hookId": "local-sender"},
+        "payload": {
+            "name": file["name"],
+            "version": str(file["version"]),
+            "lineageUrn": file["lineage"],
+            "source": file["source"],
+            "storage": file["href"],
+            "parentFolderUrn": file["folder_id"],
+            "ancestors": [{"name": "root", "urn": "urn:adsk.wipprod:fs.folder:co.root"}] + [
+                {"name": folder, "urn": f"urn:adsk.wipprod:fs.folder:co.{folder}"} for folder in file["folder"].split("/")
+            ],
+            "project": project_id.removeprefix("b."),
+            "tenant": hub_id.removeprefix("b."),
+        },
+    }
+
+
+# Function to give a synthetic file a new version with its own storage object
+def new_version(file):
+    file["version"] += 1
+    object_id = uuid.uuid4()
+    file["source"] = f"urn:adsk.wipprod:fs.file:vf.{object_id}?version={file['version']}"
+    file["href"] = f"https://developer.api.autodesk.com/oss/v2/buckets/wip.dm.prod/objects/{object_id}.pdf"
+
+
+# Function to build the events of a run: new files, then new versions, moves and deletes of some of them
+def make_events(args):
+    files = []
+    for i in range(args.files):
+        file = {"name": f"Webhook Test {i:04d}.pdf", "version": 0, "lineage": f"urn:adsk.wipprod:dm.lineage:{uuid.uuid4()}",
+                "folder": "Project Files/Webhook Tests", "folder_id": "urn:adsk.wipprod:fs.folder:co.webhook-tests"}
+        new_version(file)
+        files.append(file)
+    events = [make_event("dm.version.added", file, args.project_id, args.hub_id) for file in files]
+
+    for file in random.sample(files, len(files) // 5):
+        new_version(file)
+        events.append(make_event("dm.version.added", file, args.project_id, args.hub_id))
+    for file in random.sample(files, len(files) // 10):
+        file["folder"], file["folder_id"] = "Project Files/Webhook Tests/Moved", "urn:adsk.wipprod:fs.folder:co.webhook-moved"
+        events.append(make_event("dm.version.moved", file, args.project_id, args.hub_id))
+    for file in random.sample(files, len(files) // 10):
+        events.append(make_event("dm.version.deleted", file, args.project_id, args.hub_id))
+
+    # Autodesk retries deliveries that were not acknowledged, some events arrive twice
+    events += random.sample(events, int(len(events) * args.duplicates))
+    return events
+
+
+# Function to send one event, signed with the webhook secret when one is set
+# The event time is set on the first delivery, a repeated delivery carries the same payload as Autodesk retries do
+async def send(http, url, event, secret):
+    event["payload"].setdefault("modifiedTime", datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f%z"))
+    body = json.dumps(event).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers["x-adsk-signature"] = "sha1hash=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha1).hexdigest()
+    async with http.post(f"{url}/webhooks/autodesk", data=body, headers=headers) as response:
+        return response.status
+
+
+# Function to send the events at the requested rate and wait until the server has applied all of them
+async def main(args):
+    events = make_events(args)
+    repeated = len(events) - len({id(event) for event in events})
+    async with aiohttp.ClientSession() as http:
+        async with http.get(f"{args.url}/stats") as response:
+            before = (await response.json())["ingest"]
+
+        start = time.perf_counter()
+        tasks = []
+        for position, event in enumerate(events):
+            # Events go out one per request as Autodesk sends them, paced to the requested rate
+            await asyncio.sleep(max(0.0, start + position / args.rate - time.perf_counter()))
+            tasks.append(asyncio.create_task(send(http, args.url, event, args.secret)))
+        statuses = await asyncio.gather(*tasks)
+        sent = time.perf_counter()
+
+        # Wait until no change is waiting or being applied
+        while True:
+            await asyncio.sleep(0.5)
+            async with http.get(f"{args.url}/stats") as response:
+                ingest = (await response.json())["ingest"]
+            if not ingest["pending"] and not ingest["applying"] and ingest["batches"] > before["batches"]:
+                break
+
+    print(f"Sent {len(events)} events ({repeated} repeated deliveries) in {sent - start:.1f}s, "
+          f"{sum(status != 200 for status in statuses)} rejected")
+    print(f"Server: {ingest['duplicates'] - before['duplicates']} duplicates dropped, {ingest['batches'] - before['batches']} batches, "
+          f"{ingest['upserts'] - before['upserts']} upserts, {ingest['deletes'] - before['deletes']} deletes, "
+          f"{ingest['unchanged'] - before['unchanged']} unchanged, {ingest['failed'] - before['failed']} failed")
+    print(f"Freshness from receipt p50: {ingest['receive_p50']}s, p95: {ingest['receive_p95']}s; "
+          f"from the event time p50: {ingest['event_p50']}s, p95: {ingest['event_p95']}s")
+
+
+# Main execution point, stand-in for Autodesk webhooks against a locally running server.py
+# The server must run with INGEST_ALLOW_UNSIGNED=1, otherwise the storage links of the synthetic files are looked up and not found
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send synthetic Data Management webhook events to server.py and report index freshness")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--project-id", required=True, help="Project the synthetic files are added to, e.g. b.1234abcd-...")
+    parser.add_argument("--hub-id", required=True, help="Hub of the project, e.g. b.34579194")
+    parser.add_argument("--files", type=int, default=100, help="Number of new files, some of them get new versions, moved or deleted")
+    parser.add_argument("--rate", type=float, default=50, help="Events per second")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="Share of events delivered twice")
+    parser.add_argument("--secret", default=os.getenv('WEBHOOK_SECRET', ''), help="Webhook secret the server checks signatures with")
+    asyncio.run(main(parser.parse_args()))